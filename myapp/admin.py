@@ -25,6 +25,21 @@ class ResearchPaperAdmin(admin.ModelAdmin):
     list_filter = ('published_date', 'journal')
     search_fields = ('title', 'authors', 'journal', 'doi')
 
+class TeacherSubjectContentAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'content_type', 'department', 'semester', 'section', 'teacher_name',
+                    'approval_status', 'possible_duplicate', 'uploaded_at')
+    list_filter = ('approval_status', ('duplicate_of', admin.EmptyFieldListFilter), 'content_type', 'department')
+    search_fields = ('subject', 'teacher_name', 'description')
+    list_select_related = ('duplicate_of',)
+    readonly_fields = ('duplicate_of', 'duplicate_similarity', 'image_variants')
+
+    @admin.display(description='Possible duplicate of', ordering='duplicate_similarity')
+    def possible_duplicate(self, obj):
+        # Flagged by near_duplicates.py from the file's text
+        if obj.duplicate_of is None:
+            return ''
+        return f"#{obj.duplicate_of_id} {obj.duplicate_of} ({obj.duplicate_similarity:.0%})"
+
 class QuizAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'total_questions', 'total_marks', 'time_limit', 'created_at')
     list_filter = ('course', 'created_at')
@@ -39,4 +54,4 @@ admin.site.register(TeacherProfile, TeacherProfileAdmin)
 admin.site.register(Assignment)
 admin.site.register(Note)
 admin.site.register(ResearchPaper, ResearchPaperAdmin)
-admin.site.register(TeacherSubjectContent)
+admin.site.register(TeacherSubjectContent, TeacherSubjectContentAdmin)
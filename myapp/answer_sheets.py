@@ -0,0 +1,183 @@
+"""
+Compact answer storage for quiz attempts.
+
+Each QuizAttempt keeps its answers in three packed columns instead of one
+UserAnswer row per question:
+
+    question_ids    "12,13,15"  ascending question ids
+    answer_vector   "AB-"       one character per question, '-' if unanswered
+    correct_bitmap  b'\\x01'     bit i set when question i was answered correctly
+
+The helpers below turn those back into per-question records so analytics
+code can keep thinking in (attempt, question, answer, is_correct) terms.
+"""
+from collections import namedtuple
+from itertools import groupby
+
+import numpy as np
+
+from .models import QuizAttempt, UserAnswer
+
+UNANSWERED = '-'
+PACKED_FIELDS = ['question_ids', 'answer_vector', 'correct_bitmap']
+
+AnswerRecord = namedtuple('AnswerRecord', 'attempt_id user_id quiz_id question_id answer is_correct')
+
+# attempt x question matrices for one quiz. answers holds 0 for unanswered (or a
+# question the attempt never saw) and 1-4 for options A-D; seen marks which
+# questions were part of each attempt.
+QuizMatrix = namedtuple('QuizMatrix', 'attempt_ids student_ids question_ids answers correct seen')
+
+# Byte value -> answer code, used to decode answer_vector without a Python loop
+_ANSWER_CODES = np.zeros(256, dtype=np.int8)
+for _code, _option in enumerate('ABCD', start=1):
+    _ANSWER_CODES[ord(_option)] = _code
+
+
+def pack_answers(results):
+    """Pack [(question_id, selected, is_correct), ...] in question id order into column values."""
+    question_ids = []
+    vector = []
+    bitmap = bytearray((len(results) + 7) // 8)
+    for index, (question_id, selected, is_correct) in enumerate(results):
+        question_ids.append(str(question_id))
+        vector.append(selected or UNANSWERED)
+        if is_correct:
+            bitmap[index // 8] |= 1 << (index % 8)
+    return {
+        'question_ids': ','.join(question_ids),
+        'answer_vector': ''.join(vector),
+        'correct_bitmap': bytes(bitmap),
+    }
+
+
+def unpack_answers(question_ids, answer_vector, correct_bitmap):
+    """Inverse of pack_answers: [(question_id, answer_or_None, is_correct), ...]."""
+    if not question_ids:
+        return []
+    bitmap = bytes(correct_bitmap or b'')
+    results = []
+    for index, question_id in enumerate(question_ids.split(',')):
+        answer = answer_vector[index]
+        results.append((
+            int(question_id),
+            None if answer == UNANSWERED else answer,
+            bool(bitmap[index // 8] & (1 << (index % 8))),
+        ))
+    return results
+
+
+def iter_answer_records(attempts):
+    """
+    Per-question records for the given attempts (a queryset or iterable).
+
+    Attempts recorded before answers were packed, or whose UserAnswer rows
+    were never compacted, fall back to their UserAnswer rows.
+    """
+    legacy = []
+    for attempt in attempts:
+        if attempt.question_ids:
+            for question_id, answer, is_correct in unpack_answers(attempt.question_ids, attempt.answer_vector, attempt.correct_bitmap):
+                yield AnswerRecord(attempt.id, attempt.student_id, attempt.quiz_id, question_id, answer, is_correct)
+        else:
+            legacy.append(attempt.id)
+    # Chunk the id list to stay under the database's bound-parameter limit
+    for start in range(0, len(legacy), 500):
+        rows = (UserAnswer.objects.filter(attempt_id__in=legacy[start:start + 500])
+                .order_by('attempt_id', 'question_id')
+                .values_list('attempt_id', 'user_id', 'quiz_id', 'question_id', 'answer', 'is_correct'))
+        for row in rows.iterator(chunk_size=2000):
+            yield AnswerRecord(*row)
+
+
+def load_quiz_matrix(quiz_id, attempt_ids=None):
+    """
+    Decode every attempt of a quiz straight from the packed columns into NumPy
+    matrices. Attempts that share a question list (the usual case) are decoded
+    together with one vectorised unpack per group.
+    """
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id)
+    if attempt_ids is not None:
+        attempts = attempts.filter(id__in=attempt_ids)
+    rows = list(attempts.order_by('id').values_list('id', 'student_id', 'question_ids', 'answer_vector', 'correct_bitmap'))
+
+    # Attempts recorded before packing come in through their UserAnswer rows
+    legacy = {row[0] for row in rows if not row[2]}
+    legacy_records = {}
+    if legacy:
+        for record in iter_answer_records(QuizAttempt.objects.filter(id__in=legacy).only('id', 'student_id', 'quiz_id', 'question_ids')):
+            legacy_records.setdefault(record.attempt_id, []).append(record)
+
+    question_ids = set()
+    for row in rows:
+        if row[2]:
+            question_ids.update(int(qid) for qid in row[2].split(','))
+    for records in legacy_records.values():
+        question_ids.update(record.question_id for record in records)
+    question_ids = np.array(sorted(question_ids), dtype=np.int64)
+    column = {qid: index for index, qid in enumerate(question_ids.tolist())}
+
+    shape = (len(rows), len(question_ids))
+    answers = np.zeros(shape, dtype=np.int8)
+    correct = np.zeros(shape, dtype=bool)
+    seen = np.zeros(shape, dtype=bool)
+
+    groups = {}
+    for index, row in enumerate(rows):
+        if row[2]:
+            groups.setdefault(row[2], []).append(index)
+        else:
+            for record in legacy_records.get(row[0], []):
+                col = column[record.question_id]
+                seen[index, col] = True
+                answers[index, col] = 'ABCD'.index(record.answer) + 1 if record.answer in ('A', 'B', 'C', 'D') else 0
+                correct[index, col] = record.is_correct
+    for packed_ids, indexes in groups.items():
+        cols = np.array([column[int(qid)] for qid in packed_ids.split(',')])
+        width = len(cols)
+        vectors = np.frombuffer(''.join(rows[i][3] for i in indexes).encode('ascii'), dtype=np.uint8).reshape(len(indexes), width)
+        byte_width = (width + 7) // 8
+        bitmaps = np.frombuffer(b''.join(bytes(rows[i][4]) for i in indexes), dtype=np.uint8).reshape(len(indexes), byte_width)
+        grid = np.ix_(indexes, cols)
+        answers[grid] = _ANSWER_CODES[vectors]
+        correct[grid] = np.unpackbits(bitmaps, axis=1, bitorder='little')[:, :width].astype(bool)
+        seen[grid] = True
+
+    return QuizMatrix(
+        attempt_ids=np.array([row[0] for row in rows], dtype=np.int64),
+        student_ids=np.array([row[1] for row in rows], dtype=np.int64),
+        question_ids=question_ids,
+        answers=answers,
+        correct=correct,
+        seen=seen,
+    )
+
+
+def answer_records_for_quiz(quiz_id):
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id).only(
+        'id', 'student_id', 'quiz_id', 'question_ids', 'answer_vector', 'correct_bitmap'
+    ).order_by('id')
+    return iter_answer_records(attempts.iterator(chunk_size=2000))
+
+
+def pack_legacy_attempts(batch_size=500):
+    """
+    Fill the packed columns from UserAnswer rows for attempts that don't have them yet.
+    Returns the number of attempts packed.
+    """
+    rows = (UserAnswer.objects.filter(attempt__isnull=False, attempt__question_ids='')
+            .order_by('attempt_id', 'question_id')
+            .values_list('attempt_id', 'question_id', 'answer', 'is_correct'))
+    packed = 0
+    pending = []
+    for attempt_id, group in groupby(rows.iterator(chunk_size=2000), key=lambda row: row[0]):
+        values = pack_answers([(question_id, answer, is_correct) for _, question_id, answer, is_correct in group])
+        pending.append(QuizAttempt(id=attempt_id, **values))
+        if len(pending) >= batch_size:
+            QuizAttempt.objects.bulk_update(pending, PACKED_FIELDS)
+            packed += len(pending)
+            pending = []
+    if pending:
+        QuizAttempt.objects.bulk_update(pending, PACKED_FIELDS)
+        packed += len(pending)
+    return packed
@@ -0,0 +1,214 @@
+"""
+Typo-tolerant autocomplete for subject, course and author names.
+
+Each process keeps a trigram index of the distinct values in memory, so a
+lookup never touches the database. Values are matched on their own
+trigrams and on their initials, so "dbms" finds "Data Base Management
+System" and "Compiler Desgin" finds "Compiler Design".
+
+The index picks up new rows every REFRESH_SECONDS (one query on the
+primary key per source). Editing or deleting a row changes a version stamp
+in Settings (value_changed()), and a refresh that sees a new stamp, or an
+index older than REBUILD_SECONDS, has the index rebuilt on
+autocomplete_rebuilder; lookups keep using the old index until the new one
+is swapped in. Saves in this process are added immediately via add_value().
+"""
+import heapq
+import re
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+
+from .background import BackgroundWorker
+from .models import Course, ResearchPaper, Settings, TeacherSubjectContent
+
+# field -> (model, column, splits one column value into names)
+SOURCES = {
+    'subject': (TeacherSubjectContent, 'subject', lambda value: [value]),
+    'course': (Course, 'title', lambda value: [value]),
+    'author': (ResearchPaper, 'authors', lambda value: value.split(',')),
+}
+REFRESH_SECONDS = 10
+REBUILD_SECONDS = 600
+MIN_SCORE = 0.2
+# Weight of "the query is contained in the value" against whole-string similarity
+CONTAINMENT_WEIGHT = 0.8
+WORD_RE = re.compile(r'\w+')
+
+
+def _normalise(text):
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind."""
+    grams = set()
+    for word in _normalise(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _initials(text):
+    words = _normalise(text).split()
+    return ''.join(word[0] for word in words) if len(words) > 1 else ''
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.values = []          # display value, by value id
+        self.keys = []            # normalised value, by value id
+        self.counts = Counter()   # value id -> number of rows using it
+        self.ids = {}             # normalised value -> value id
+        # A value is indexed as one or two forms: its text, and its initials if it has several words
+        self.form_values = []     # form id -> value id
+        self.form_sizes = []      # form id -> number of trigrams
+        self.postings = defaultdict(list)  # trigram -> form ids
+
+    def _add_form(self, value_id, grams):
+        form_id = len(self.form_values)
+        self.form_values.append(value_id)
+        self.form_sizes.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(form_id)
+
+    def add(self, value):
+        value = ' '.join(value.split())
+        key = _normalise(value)
+        if not key:
+            return
+        if key in self.ids:
+            self.counts[self.ids[key]] += 1
+            return
+        value_id = len(self.values)
+        self.values.append(value)
+        self.keys.append(key)
+        self.ids[key] = value_id
+        self.counts[value_id] = 1
+        self._add_form(value_id, trigrams(value))
+        initials = _initials(value)
+        if initials:
+            self._add_form(value_id, trigrams(initials))
+
+    def search(self, query, limit=10):
+        """[(value, score)] best first; score is trigram similarity in 0..1."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        size = len(query_grams)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+        # Neither similarity can reach MIN_SCORE below this many shared trigrams
+        needed = MIN_SCORE * size / CONTAINMENT_WEIGHT
+        key = _normalise(query)
+        best = {}
+        for form_id, count in shared.items():
+            if count < needed:
+                continue
+            value_id = self.form_values[form_id]
+            score = max(
+                count / (size + self.form_sizes[form_id] - count),  # similarity of the whole strings
+                CONTAINMENT_WEIGHT * count / size,  # how much of the query appears in the value
+            )
+            if self.keys[value_id].startswith(key):
+                # What's typed so far is a prefix: rank it as if the rest were there
+                score = max(score, 0.9)
+            if score > best.get(value_id, 0):
+                best[value_id] = score
+        ranked = heapq.nsmallest(limit, best.items(),
+                                 key=lambda item: (-item[1], -self.counts[item[0]], self.values[item[0]]))
+        return [(self.values[value_id], round(score, 3)) for value_id, score in ranked]
+
+
+def _version_key(field):
+    return f'autocomplete_version:{field}'
+
+
+def _version(field):
+    return Settings.objects.filter(key=_version_key(field)).values_list('value', flat=True).first()
+
+
+class _Source:
+    def __init__(self, field):
+        self.field = field
+        self.model, self.column, self.split = SOURCES[field]
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.last_id = 0
+        self.checked_at = self.built_at = 0.0
+        self.rebuilding = False
+
+    def _add_rows(self, index, rows):
+        """Add the rows' names to `index` and return the highest row id."""
+        last_id = 0
+        for row_id, value in rows:
+            for name in self.split(value or ''):
+                index.add(name)
+            last_id = max(last_id, row_id)
+        return last_id
+
+    def _build(self):
+        # Read the stamp first, so a change made during the build triggers another
+        version = _version(self.field)
+        index = TrigramIndex()
+        last_id = self._add_rows(index, self.model.objects.values_list('id', self.column).iterator())
+        return index, last_id, version
+
+    def get(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.index is None:
+                # Nothing to serve yet, so the first build can't wait for the worker
+                self.index, self.last_id, self.version = self._build()
+                self.built_at = self.checked_at = now
+            elif now - self.checked_at > REFRESH_SECONDS:
+                self.checked_at = now
+                if not self.rebuilding and (now - self.built_at > REBUILD_SECONDS
+                                            or _version(self.field) != self.version):
+                    self.rebuilding = True
+                    autocomplete_rebuilder.enqueue(self)
+                rows = self.model.objects.filter(id__gt=self.last_id).values_list('id', self.column)
+                self.last_id = max(self.last_id, self._add_rows(self.index, rows))
+            return self.index
+
+    def rebuild(self):
+        """Build a fresh index without holding the lock, then swap it in."""
+        try:
+            index, last_id, version = self._build()
+            with self.lock:
+                # Rows refreshed into the old index meanwhile are above last_id and get added again
+                self.index, self.last_id, self.version = index, last_id, version
+                self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.rebuilding = False
+
+    def add(self, row_id, value):
+        with self.lock:
+            if self.index is not None and row_id > self.last_id:
+                self.last_id = max(self.last_id, self._add_rows(self.index, [(row_id, value)]))
+
+
+autocomplete_rebuilder = BackgroundWorker('autocomplete-rebuild', _Source.rebuild)
+_sources = {field: _Source(field) for field in SOURCES}
+
+
+def suggest(field, query, limit=10):
+    return _sources[field].get().search(query, limit)
+
+
+def add_value(instance):
+    """Add a just-saved row's value to this process's index."""
+    for field, (model, column, split) in SOURCES.items():
+        if isinstance(instance, model):
+            _sources[field].add(instance.pk, getattr(instance, column))
+
+
+def value_changed(instance):
+    """Have every process rebuild the indexes an edited or deleted row's value is in."""
+    for field, (model, column, split) in SOURCES.items():
+        if isinstance(instance, model):
+            Settings.objects.update_or_create(key=_version_key(field), defaults={'value': secrets.token_hex(8)})
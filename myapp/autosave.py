@@ -0,0 +1,151 @@
+import secrets
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+
+from .background import BackgroundWorker
+from .models import QuizAttempt, QuizAttemptDraft
+
+ATTEMPT_TOKEN_SALT = 'myapp.quiz-attempt'
+# Extra seconds accepted after the time limit for network latency on the final submit
+ATTEMPT_GRACE_SECONDS = 30
+
+AUTOSAVE_INTERVAL = 10  # seconds between autosave calls from the quiz page
+FLUSH_INTERVAL = 15  # seconds an autosaved answer may wait in memory
+FLUSH_BATCH_SIZE = 50  # flush early once this many attempts are dirty
+
+
+def issue_attempt_token(user_id, quiz_id):
+    """Sign the attempt start time so it can't be reset by the browser."""
+    payload = {'u': user_id, 'q': quiz_id, 'n': secrets.token_hex(8), 't': int(time.time())}
+    return signing.dumps(payload, salt=ATTEMPT_TOKEN_SALT)
+
+
+def read_attempt_token(token, user_id, quiz_id):
+    """
+    Return the decoded token payload, or None if it is missing, tampered with
+    or belongs to another user or quiz.
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=ATTEMPT_TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    if payload.get('u') != user_id or payload.get('q') != quiz_id:
+        return None
+    return payload
+
+
+def elapsed_seconds(payload):
+    return max(0, int(time.time()) - payload['t'])
+
+
+def is_expired(payload, time_limit):
+    return elapsed_seconds(payload) > time_limit * 60 + ATTEMPT_GRACE_SECONDS
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for quiz autosaves.
+
+    Autosave calls only update memory. The answers changed since the last
+    flush are merged into QuizAttemptDraft in a single transaction once
+    FLUSH_BATCH_SIZE attempts are waiting, and draft_flusher writes whatever
+    is left FLUSH_INTERVAL seconds after the first change, so answers don't
+    sit in memory when autosaves stop. Only unflushed changes are kept here:
+    the draft row is the attempt's state, and every process's changes are
+    merged into it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._flush_scheduled = False
+
+    def add(self, payload, answers):
+        key = payload['n']
+        with self._lock:
+            entry = self._entries.setdefault(key, {
+                'student_id': payload['u'],
+                'quiz_id': payload['q'],
+                'started_at': payload['t'],
+                'answers': {},
+            })
+            entry['answers'].update(answers)
+            due = len(self._entries) >= FLUSH_BATCH_SIZE
+            schedule = not due and not self._flush_scheduled
+            self._flush_scheduled = self._flush_scheduled or schedule
+        if due:
+            self.flush()
+        elif schedule:
+            draft_flusher.enqueue(self)
+
+    def get(self, payload):
+        """This process's answers for the attempt that haven't been flushed yet."""
+        with self._lock:
+            entry = self._entries.get(payload['n'])
+            return dict(entry['answers']) if entry else {}
+
+    def discard(self, payload):
+        with self._lock:
+            self._entries.pop(payload['n'], None)
+
+    def flush_later(self):
+        time.sleep(FLUSH_INTERVAL)
+        with self._lock:
+            self._flush_scheduled = False
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._entries = self._entries, {}
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                # Attempts submitted meanwhile (possibly by another process) need no draft
+                submitted = set(QuizAttempt.objects.filter(attempt_key__in=list(batch))
+                                .values_list('attempt_key', flat=True))
+                stored = dict(QuizAttemptDraft.objects.filter(key__in=list(batch)).values_list('key', 'answers'))
+                drafts = [
+                    QuizAttemptDraft(
+                        key=key,
+                        student_id=entry['student_id'],
+                        quiz_id=entry['quiz_id'],
+                        started_at=datetime.fromtimestamp(entry['started_at'], tz=dt_timezone.utc),
+                        answers={**stored.get(key, {}), **entry['answers']},
+                        updated_at=timezone.now(),
+                    )
+                    for key, entry in batch.items() if key not in submitted
+                ]
+                QuizAttemptDraft.objects.bulk_create(
+                    drafts,
+                    update_conflicts=True,
+                    unique_fields=['key'],
+                    update_fields=['answers', 'updated_at'],
+                )
+        except Exception:
+            # Put the answers back, under any that arrived since, so the next flush retries them
+            with self._lock:
+                for key, entry in batch.items():
+                    newer = self._entries.setdefault(key, entry)
+                    if newer is not entry:
+                        newer['answers'] = {**entry['answers'], **newer['answers']}
+            raise
+        return len(drafts)
+
+
+answer_buffer = AnswerBuffer()
+draft_flusher = BackgroundWorker('quiz-draft-flush', AnswerBuffer.flush_later)
+
+
+def saved_answers(payload):
+    """Answers saved so far for an attempt: the last flushed draft, with this process's unflushed changes on top."""
+    answers = QuizAttemptDraft.objects.filter(key=payload['n']).values_list('answers', flat=True).first() or {}
+    answers.update(answer_buffer.get(payload))
+    return answers
@@ -0,0 +1,45 @@
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    A single daemon thread that runs `handler(*args)` for each queued job, so
+    slow work (text extraction, rendering) stays out of the request.
+
+    Jobs live in memory and are lost on restart; each job's owner keeps enough
+    state in the database for a management command to pick them up again.
+    """
+
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def enqueue(self, *args):
+        self._ensure_worker()
+        self._queue.put(args)
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            close_old_connections()
+            try:
+                self.handler(*args)
+            except Exception:
+                logger.exception('%s job %r failed', self.name, args)
+            finally:
+                close_old_connections()
@@ -0,0 +1,182 @@
+"""
+Resumable chunked uploads.
+
+    POST upload/chunked/                      filename, size, fingerprint -> upload state
+    PUT  upload/chunked/<id>/<index>/         raw chunk bytes, optional X-Chunk-SHA256
+    GET  upload/chunked/<id>/                 upload state, to resume
+
+Chunks must arrive in order; each is streamed straight into a partial file
+and its checksum verified before it counts. Starting the same file again
+(same user, name, size and fingerprint, a SHA-256 of the file's first and
+last MiB) resumes the unfinished upload; without a fingerprint an upload
+always starts afresh, so a different file of the same name and size is
+never appended to the wrong bytes. Once complete, the
+normal upload view is posted with upload_id instead of the file and attaches
+it through chunked_upload_files().
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .models import ChunkedUpload
+
+READ_SIZE = 64 * 1024
+FINGERPRINT_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ChunkedUploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.upload_id}.part')
+
+
+def upload_state(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'received': upload.received,
+        'next_chunk': upload.received // upload.chunk_size,
+        'complete': upload.received == upload.size,
+    }
+
+
+def start_upload(user, filename, size, fingerprint=''):
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise ChunkedUploadError('A file name is required.')
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise ChunkedUploadError(f'File size must be between 1 byte and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.')
+    fingerprint = (fingerprint or '').lower()
+    if not FINGERPRINT_RE.match(fingerprint):
+        fingerprint = ''
+    upload = None
+    if fingerprint:
+        upload = (ChunkedUpload.objects.filter(user=user, filename=filename, size=size, fingerprint=fingerprint)
+                  .order_by('-updated_at').first())
+    if upload and os.path.exists(part_path(upload)):
+        # Anything past the last verified chunk is discarded
+        with open(part_path(upload), 'r+b') as f:
+            f.truncate(upload.received)
+        return upload
+    upload = ChunkedUpload.objects.create(
+        upload_id=secrets.token_hex(16), user=user, filename=filename, size=size, fingerprint=fingerprint,
+        chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, index, stream, length, sha256=None):
+    """Store chunk `index` from `stream`, reading at most READ_SIZE bytes at a time."""
+    offset = index * upload.chunk_size
+    if offset > upload.received:
+        raise ChunkedUploadError(f'Expected chunk {upload.received // upload.chunk_size}.', status=409)
+    expected = min(upload.chunk_size, upload.size - offset)
+    if expected <= 0 or length != expected:
+        raise ChunkedUploadError(f'Chunk {index} must be {max(expected, 0)} bytes.')
+    if offset < upload.received:
+        # Re-sent after a lost response; the stored copy was already verified
+        return
+
+    digest = hashlib.sha256()
+    path = part_path(upload)
+    if not os.path.exists(path):
+        raise ChunkedUploadError('Upload expired, start again.', status=410)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            f.write(data)
+            remaining -= len(data)
+        if remaining or (sha256 and digest.hexdigest() != sha256.lower()):
+            f.truncate(offset)
+            if remaining:
+                raise ChunkedUploadError(f'Chunk {index} was cut short.')
+            raise ChunkedUploadError(f'Checksum mismatch for chunk {index}.')
+        f.flush()
+        os.fsync(f.fileno())
+
+    if offset + length > upload.received:
+        upload.received = offset + length
+        upload.save(update_fields=['received', 'updated_at'])
+
+
+def chunked_upload_files(request, field='file'):
+    """
+    request.FILES, with `field` taken from a completed chunked upload when the
+    form was posted with upload_id instead of a file. Returns (files, upload).
+    The view closes the opened file with finish_upload once it's saved, or
+    release_upload if the form is rejected.
+    """
+    upload_id = request.POST.get('upload_id')
+    if not upload_id or request.FILES.get(field):
+        return request.FILES, None
+    upload = ChunkedUpload.objects.filter(upload_id=upload_id, user=request.user).first()
+    if upload is None or upload.received != upload.size or not os.path.exists(part_path(upload)):
+        return request.FILES, None
+    files = MultiValueDict(request.FILES)
+    content_type = mimetypes.guess_type(upload.filename)[0] or 'application/octet-stream'
+    files[field] = UploadedFile(open(part_path(upload), 'rb'), name=upload.filename,
+                                content_type=content_type, size=upload.size)
+    return files, upload
+
+
+def release_upload(upload, files, field='file'):
+    """Close the file chunked_upload_files opened, keeping the upload so the form can be posted again."""
+    if upload is not None and files.get(field):
+        files[field].close()
+
+
+def finish_upload(upload, files=None, field='file'):
+    """Drop a chunked upload once its file has been saved to a model."""
+    if upload is None:
+        return
+    if files is not None:
+        release_upload(upload, files, field)
+    discard_upload(upload)
+
+
+def discard_upload(upload):
+    try:
+        os.unlink(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def clean_stale_uploads(hours=None):
+    """Remove unfinished uploads untouched for `hours` and orphaned partial files. Returns (uploads, bytes)."""
+    hours = settings.CHUNKED_UPLOAD_EXPIRY_HOURS if hours is None else hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    removed = freed = 0
+    for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        if os.path.exists(part_path(upload)):
+            freed += os.path.getsize(part_path(upload))
+        discard_upload(upload)
+        removed += 1
+    if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        known = set(ChunkedUpload.objects.values_list('upload_id', flat=True))
+        for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+            upload_id = entry.name.removesuffix('.part')
+            if upload_id not in known and entry.stat().st_mtime < cutoff.timestamp():
+                freed += entry.stat().st_size
+                os.unlink(entry.path)
+    return removed, freed
@@ -0,0 +1,181 @@
+"""
+"Students like you also used" recommendations.
+
+Quiz attempts, assignment submissions and note/content downloads form an
+implicit-feedback user x item matrix. Items are compared by the cosine
+similarity of their user columns, each user's items are scored against
+their own history, and the top TOP_K unseen items are stored in
+ContentRecommendation so the dashboard reads a single row.
+"""
+import numpy as np
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from .models import (Assignment, ContentDownload, ContentRecommendation, Note, Quiz, QuizAttempt,
+                     Settings, Submission, TeacherSubjectContent)
+
+TOP_K = 5
+# Keep only the strongest neighbours per item so scoring stays sparse
+NEIGHBOURS = 50
+USER_CHUNK = 500
+LAST_RUN_KEY = 'content_recommendations_last_run'
+
+
+def _interactions():
+    """(user_id, item_type, object_id, count) for every kind of activity we learn from."""
+    yield from ((user_id, 'quiz', quiz_id, n) for user_id, quiz_id, n in
+                QuizAttempt.objects.values_list('student_id', 'quiz_id').annotate(n=Count('id')))
+    yield from ((user_id, 'assignment', assignment_id, n) for user_id, assignment_id, n in
+                Submission.objects.values_list('student_id', 'assignment_id').annotate(n=Count('id')))
+    yield from ((user_id, item_type, object_id, n) for user_id, item_type, object_id, n in
+                ContentDownload.objects.values_list('user_id', 'item_type', 'object_id').annotate(n=Count('id')))
+
+
+def load_interactions():
+    """Sparse user x item matrix with log-scaled counts, plus the user ids and (type, id) item keys."""
+    users, items, counts = [], [], []
+    for user_id, item_type, object_id, n in _interactions():
+        users.append(user_id)
+        items.append((item_type, object_id))
+        counts.append(n)
+    user_ids, user_index = np.unique(np.array(users, dtype=np.int64), return_inverse=True)
+    item_keys = sorted(set(items))
+    column = {key: index for index, key in enumerate(item_keys)}
+    item_index = np.array([column[key] for key in items], dtype=np.int64)
+    # Repeat use counts, but less than the first one
+    weights = 1 + np.log(np.array(counts, dtype=np.float64))
+    matrix = sparse.csr_matrix((weights, (user_index, item_index)), shape=(len(user_ids), len(item_keys)))
+    return matrix, user_ids, item_keys
+
+
+def item_similarity(matrix, items=None):
+    """
+    Cosine similarity of the `items` (all by default) to every item, one row
+    per item with self-similarity removed and pruned to NEIGHBOURS.
+    """
+    items = np.arange(matrix.shape[1]) if items is None else np.asarray(items)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalised = (matrix @ sparse.diags(1 / np.maximum(norms, 1e-12))).tocsc()
+    similarity = (normalised[:, items].T @ normalised).tolil()
+    similarity[np.arange(len(items)), items] = 0
+    similarity = similarity.tocsr()
+    similarity.eliminate_zeros()
+
+    # Prune each row to its strongest entries
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if end - start > NEIGHBOURS:
+            values = similarity.data[start:end]
+            values[np.argsort(values)[:-NEIGHBOURS]] = 0
+    similarity.eliminate_zeros()
+    return similarity
+
+
+def top_items(matrix, similarity, rows, items=None):
+    """
+    {row: [(item_index, score), ...]} for the given user rows, excluding items
+    they already used. `similarity` has a row for each of `items` (all by
+    default), which must cover everything those users used.
+    """
+    result = {}
+    for start in range(0, len(rows), USER_CHUNK):
+        chunk = rows[start:start + USER_CHUNK]
+        history = matrix[chunk]
+        used = history if items is None else history[:, items]
+        scores = (used @ similarity).toarray()
+        scores[history.nonzero()] = 0
+        k = min(TOP_K, scores.shape[1])
+        if k == 0:
+            continue
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for row, picks, pick_scores in zip(chunk, best.tolist(), best_scores.tolist()):
+            result[row] = [(item, score) for item, score in zip(picks, pick_scores) if score > 0]
+    return result
+
+
+def describe_items(item_keys):
+    """{(type, id): (title, url)} for items that still exist and can be shown to students."""
+    ids = {}
+    for item_type, object_id in item_keys:
+        ids.setdefault(item_type, set()).add(object_id)
+    described = {}
+    for quiz_id, title in Quiz.objects.filter(id__in=ids.get('quiz', ())).values_list('id', 'title'):
+        described[('quiz', quiz_id)] = (title, reverse('attempt_quiz', args=[quiz_id]))
+    for assignment_id, topic in Assignment.objects.filter(id__in=ids.get('assignment', ())).values_list('id', 'topic'):
+        described[('assignment', assignment_id)] = (topic, reverse('assignment_detail', args=[assignment_id]))
+    for note_id, topic, course_id in Note.objects.filter(id__in=ids.get('note', ())).values_list('id', 'topic', 'course_id'):
+        url = reverse('course_notes', args=[course_id]) if course_id else reverse('notes')
+        described[('note', note_id)] = (topic, url)
+    contents = TeacherSubjectContent.objects.filter(id__in=ids.get('content', ()), approval_status='approved')
+    for content in contents.only('id', 'subject', 'content_type'):
+        described[('content', content.id)] = (
+            f'{content.subject} - {content.get_content_type_display()}',
+            reverse('download_teacher_content', args=[content.id]),
+        )
+    return described
+
+
+def active_user_ids(since):
+    """Users with any new activity after `since`."""
+    user_ids = set(QuizAttempt.objects.filter(attempted_at__gt=since).values_list('student_id', flat=True))
+    user_ids.update(Submission.objects.filter(submitted_at__gt=since).values_list('student_id', flat=True))
+    user_ids.update(ContentDownload.objects.filter(downloaded_at__gt=since).values_list('user_id', flat=True))
+    return user_ids
+
+
+def last_run():
+    value = Settings.objects.filter(key=LAST_RUN_KEY).values_list('value', flat=True).first()
+    return parse_datetime(value) if value else None
+
+
+def build_content_recommendations(incremental=False):
+    """
+    Recompute recommendations and return the number of users written.
+
+    The full run rewrites every user. The incremental run only rescores users
+    who did something since the previous run, and only computes similarity
+    rows for the items in their histories rather than the whole item x item
+    matrix.
+    """
+    started = timezone.now()
+    matrix, user_ids, item_keys = load_interactions()
+
+    rows = np.arange(len(user_ids))
+    items = None
+    since = last_run() if incremental else None
+    if since is not None:
+        rows = np.flatnonzero(np.isin(user_ids, list(active_user_ids(since))))
+        items = np.unique(matrix[rows].indices)
+
+    written = 0
+    if len(item_keys) and len(rows):
+        similarity = item_similarity(matrix, items)
+        scored = top_items(matrix, similarity, rows, items)
+        described = describe_items({item_keys[item] for picks in scored.values() for item, _ in picks})
+
+        recommendations = []
+        for row in rows.tolist():
+            entries = []
+            for item, score in scored.get(row, []):
+                key = item_keys[item]
+                if key not in described:
+                    continue
+                title, url = described[key]
+                entries.append({'type': key[0], 'id': key[1], 'title': title, 'url': url, 'score': round(score, 4)})
+            recommendations.append(ContentRecommendation(user_id=int(user_ids[row]), items=entries, computed_at=started))
+
+        ContentRecommendation.objects.bulk_create(
+            recommendations, batch_size=500, update_conflicts=True, unique_fields=['user'],
+            update_fields=['items', 'computed_at'],
+        )
+        written = len(recommendations)
+
+    Settings.objects.update_or_create(key=LAST_RUN_KEY, defaults={'value': started.isoformat()})
+    return written
@@ -0,0 +1,195 @@
+import hashlib
+import html
+import logging
+import os
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from docx import Document
+
+from .background import BackgroundWorker
+from .models import Note
+from .pdf_cache import prerender_note
+from .search import index_object
+
+logger = logging.getLogger(__name__)
+
+EXTRACTABLE_EXTENSIONS = ('.pdf', '.docx')
+PROGRESS_EVERY = 10  # pages between progress writes
+IMAGE_DIR = 'notes/images'
+# PyMuPDF span flags
+BOLD = 16
+ITALIC = 2
+# Font size relative to the page's body text that makes a line a heading
+H2_RATIO = 1.5
+H3_RATIO = 1.2
+
+
+def is_extractable(file_name):
+    return file_name.lower().endswith(EXTRACTABLE_EXTENSIONS)
+
+
+@contextmanager
+def local_copy(field_file):
+    """
+    A path on local disk for a stored file. FileSystemStorage files are used in
+    place; anything else is streamed to a temp file in chunks.
+    """
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        with field_file.open('rb') as source:
+            shutil.copyfileobj(source, tmp, 1024 * 1024)
+        tmp.flush()
+        yield tmp.name
+
+
+def _set_progress(note_id, percent):
+    Note.objects.filter(id=note_id).update(extraction_progress=percent)
+
+
+def save_image(data, ext, saved):
+    """Store an extracted image once, keyed by content hash, and return its URL."""
+    name = f'{IMAGE_DIR}/{hashlib.sha1(data).hexdigest()}.{ext}'
+    if name not in saved:
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(data))
+        saved[name] = default_storage.url(name)
+    return saved[name]
+
+
+def _line_html(spans):
+    """Line text with bold/italic kept, adjacent spans of the same style merged."""
+    runs = []
+    for span in spans:
+        if not span['text']:
+            continue
+        style = (bool(span['flags'] & BOLD), bool(span['flags'] & ITALIC))
+        if runs and runs[-1][0] == style:
+            runs[-1][1].append(span['text'])
+        else:
+            runs.append((style, [span['text']]))
+    out = []
+    for (bold, italic), texts in runs:
+        text = html.escape(''.join(texts))
+        if italic:
+            text = f'<em>{text}</em>'
+        if bold:
+            text = f'<strong>{text}</strong>'
+        out.append(text)
+    return ''.join(out)
+
+
+def compact_page_html(page, saved_images):
+    """
+    Semantic HTML for one page: text blocks become paragraphs or headings,
+    images are stored as files and linked. No positioning or font styles.
+    """
+    blocks = page.get_text("dict")['blocks']
+    sizes = Counter()
+    for block in blocks:
+        for line in block.get('lines', ()):
+            for span in line['spans']:
+                sizes[round(span['size'])] += len(span['text'])
+    body_size = sizes.most_common(1)[0][0] if sizes else 0
+
+    parts = []
+    for block in blocks:
+        if block['type'] == 1:
+            if block.get('image'):
+                url = save_image(block['image'], block['ext'], saved_images)
+                parts.append(f'<img src="{url}" alt="">')
+            continue
+        lines = []
+        block_size = 0
+        for line in block['lines']:
+            text = _line_html(line['spans']).strip()
+            if not text:
+                continue
+            block_size = max(block_size, max(span['size'] for span in line['spans']))
+            # Re-join words hyphenated across lines
+            if lines and lines[-1].endswith('-') and not lines[-1].endswith(' -'):
+                lines[-1] = lines[-1][:-1] + text
+            else:
+                lines.append(text)
+        if not lines:
+            continue
+        text = ' '.join(lines)
+        if body_size and block_size >= body_size * H2_RATIO:
+            parts.append(f'<h2>{text}</h2>')
+        elif body_size and block_size >= body_size * H3_RATIO:
+            parts.append(f'<h3>{text}</h3>')
+        else:
+            parts.append(f'<p>{text}</p>')
+    return '\n'.join(parts)
+
+
+def extract_pdf(path, note_id=None, compact=True):
+    """
+    HTML for a PDF, one page at a time so only the current page is held in memory.
+
+    compact=False keeps PyMuPDF's own HTML, with base64 images and absolutely
+    positioned spans.
+    """
+    parts = []
+    saved_images = {}
+    with fitz.open(path) as doc:
+        total = doc.page_count
+        for number in range(total):
+            page = doc.load_page(number)
+            parts.append(compact_page_html(page, saved_images) if compact else page.get_text("html"))
+            del page
+            if note_id and (number + 1) % PROGRESS_EVERY == 0:
+                _set_progress(note_id, (number + 1) * 100 // total)
+    return ''.join(parts)
+
+
+def extract_docx(path, note_id=None):
+    doc = Document(path)
+    paragraphs = doc.paragraphs
+    parts = []
+    for index, para in enumerate(paragraphs, start=1):
+        parts.append(f'<p>{html.escape(para.text)}</p>')
+        if note_id and index % (PROGRESS_EVERY * 20) == 0:
+            _set_progress(note_id, index * 100 // len(paragraphs))
+    return ''.join(parts)
+
+
+def extract_note(note_id):
+    """Fill Note.content_html from its uploaded file and record how it went."""
+    note = Note.objects.filter(id=note_id).only('id', 'file').first()
+    if note is None or not note.file:
+        return
+    Note.objects.filter(id=note_id).update(extraction_status='running', extraction_progress=0, extraction_error='')
+    try:
+        with local_copy(note.file) as path:
+            if note.file.name.lower().endswith('.pdf'):
+                content_html = extract_pdf(path, note_id)
+            else:
+                content_html = extract_docx(path, note_id)
+    except Exception as e:
+        logger.exception('Text extraction failed for note %s', note_id)
+        Note.objects.filter(id=note_id).update(extraction_status='failed', extraction_error=str(e))
+        return
+    logger.info('Note %s: %d bytes of HTML extracted from a %d byte file', note_id, len(content_html.encode()), note.file.size)
+    Note.objects.filter(id=note_id).update(content_html=content_html, extraction_status='done', extraction_progress=100)
+    # update() skips post_save, so index the new text here
+    index_object(Note.objects.get(id=note_id))
+    if settings.NOTE_PDF_PRERENDER:
+        prerender_note(note_id)
+
+
+# Pending/running notes lost to a restart are picked up by extract_pending_notes
+note_extractor = BackgroundWorker('note-extraction', extract_note)
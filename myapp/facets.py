@@ -0,0 +1,78 @@
+"""
+Filter dropdown counts for teacher content.
+
+One grouped query gives the number of rows for every distinct combination
+of the facet columns; it is cached until content is saved or deleted, with a
+version stamp kept in Settings so a change made in one process reaches the
+caches of the others. Each
+facet's counts are then worked out in memory, applying every active filter
+except the facet's own, so a dropdown lists the values still reachable from
+the other selections.
+"""
+import secrets
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Settings, TeacherSubjectContent
+
+FACET_FIELDS = ('department', 'semester', 'section', 'year', 'content_type', 'subject')
+CONTENT_FACETS_CACHE_KEY = 'content:facets'
+CONTENT_FACETS_TIMEOUT = 60 * 60 * 24
+CONTENT_FACETS_VERSION_KEY = 'content_facets_version'
+
+
+def facet_rows():
+    """[(department, semester, section, year, content_type, subject, count)] for approved content."""
+    version = Settings.objects.filter(key=CONTENT_FACETS_VERSION_KEY).values_list('value', flat=True).first()
+    cached = cache.get(CONTENT_FACETS_CACHE_KEY)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    rows = list(
+        TeacherSubjectContent.objects.filter(approval_status='approved').order_by()
+        .values_list(*FACET_FIELDS)
+        .annotate(count=Count('id'))
+    )
+    cache.set(CONTENT_FACETS_CACHE_KEY, (version, rows), CONTENT_FACETS_TIMEOUT)
+    return rows
+
+
+def invalidate_facets():
+    Settings.objects.update_or_create(key=CONTENT_FACETS_VERSION_KEY, defaults={'value': secrets.token_hex(8)})
+    cache.delete(CONTENT_FACETS_CACHE_KEY)
+
+
+def facet_counts(filters):
+    """
+    {field: [(value, count)]} for every facet field.
+
+    `filters` maps a field to either a value (compared as a string, so '3'
+    matches year 3) or a predicate taking the row's value. Empty filters are
+    ignored. A selected value is always listed, with 0 if nothing matches.
+    """
+    tests = {}
+    for field, wanted in filters.items():
+        if callable(wanted):
+            tests[field] = wanted
+        elif wanted not in (None, ''):
+            tests[field] = lambda value, wanted=str(wanted): str(value) == wanted
+
+    counts = {field: {} for field in FACET_FIELDS}
+    for *values, count in facet_rows():
+        row = dict(zip(FACET_FIELDS, values))
+        failed = [field for field, test in tests.items() if not test(row[field])]
+        if len(failed) > 1:
+            continue
+        for field in FACET_FIELDS:
+            # A row counts towards a facet if it passes every filter but that facet's own
+            if failed and failed[0] != field:
+                continue
+            value = row[field]
+            if value not in (None, ''):
+                counts[field][value] = counts[field].get(value, 0) + count
+
+    for field, wanted in filters.items():
+        if not callable(wanted) and wanted not in (None, ''):
+            if not any(str(value) == str(wanted) for value in counts[field]):
+                counts[field][wanted] = 0
+    return {field: sorted(values.items(), key=lambda item: str(item[0])) for field, values in counts.items()}
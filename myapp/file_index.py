@@ -0,0 +1,184 @@
+"""
+Search indexing of the text inside uploaded files.
+
+Text extraction (file_text.py) is CPU-bound, so it runs in a pool of worker
+processes; this process only copies files locally if needed and writes the
+chunks to search_file_chunks. IndexedFile remembers the SHA-256 each object
+was indexed at, so a file is only re-extracted when its content changes.
+
+New uploads are indexed by file_indexer after they commit; index_file_text
+works through the backlog and reports lag and throughput. Teacher content is
+also checked for near duplicates (near_duplicates.py) once its text is in.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .background import BackgroundWorker
+from .extraction import local_copy
+from .file_text import EXTRACTABLE_EXTENSIONS, chunk_text, extract_text
+from .minhash import document_signature
+from .models import IndexedFile
+from .near_duplicates import check_content
+from .search import KINDS, replace_file_chunks
+from .storage import file_digest
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers):
+    """A process pool with `workers` processes, started on first use and kept for later jobs."""
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: the web process has threads and open connections
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pools[workers]
+
+
+def _discard_pool(workers):
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_extractable(name):
+    return name.lower().endswith(EXTRACTABLE_EXTENSIONS)
+
+
+def pending_files():
+    """(kind, object id) of every file whose current content isn't in the index."""
+    pending = []
+    for kind, model in KINDS.items():
+        indexed = dict(IndexedFile.objects.filter(kind=kind).values_list('object_id', 'sha256'))
+        rows = model.objects.exclude(file='').exclude(file__isnull=True).values_list('id', 'file', 'file_sha256')
+        for object_id, name, sha256 in rows.iterator():
+            # Without a recorded hash (not backfilled yet) only unseen objects are pending
+            if _is_extractable(name) and (object_id not in indexed or (sha256 and indexed[object_id] != sha256)):
+                pending.append((kind, object_id))
+    return pending
+
+
+def _record(kind, object_id, sha256, size, text, seconds, error=''):
+    chunks = chunk_text(text) if text else []
+    with transaction.atomic():
+        replace_file_chunks(kind, object_id, chunks)
+        IndexedFile.objects.update_or_create(
+            kind=kind, object_id=object_id,
+            defaults={'sha256': sha256, 'size': size, 'chunks': len(chunks), 'chars': len(text),
+                      'seconds': seconds, 'error': error},
+        )
+    return len(chunks)
+
+
+def _check_duplicates(object_id, text, workers):
+    try:
+        # Signing is CPU-bound like extraction, so it runs in the pool too
+        check_content(object_id, _pool(workers).submit(document_signature, text).result() if text else None)
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool(workers)
+        logger.warning('Near-duplicate check failed for content %s: %s', object_id, e)
+
+
+def index_files(items, workers=None):
+    """
+    Extract and index the files of `items` ((kind, object id) pairs) using
+    `workers` processes. Files already indexed at their current hash are
+    skipped. Returns (indexed, skipped, failed).
+    """
+    workers = workers or settings.FILE_INDEX_WORKERS
+    batch_size = workers * 4
+    indexed = skipped = failed = 0
+    for start in range(0, len(items), batch_size):
+        pool = _pool(workers)
+        # Batches bound how many local copies of remote files exist at once
+        with ExitStack() as stack:
+            jobs = []
+            for kind, object_id in items[start:start + batch_size]:
+                instance = KINDS[kind].objects.filter(id=object_id).only('id', 'file', 'file_size', 'file_sha256').first()
+                if instance is None or not instance.file or not _is_extractable(instance.file.name):
+                    skipped += 1
+                    continue
+                try:
+                    path = stack.enter_context(local_copy(instance.file))
+                except OSError as e:
+                    failed += 1
+                    logger.warning('Cannot read %s %s for indexing: %s', kind, object_id, e)
+                    continue
+                sha256 = instance.file_sha256 or file_digest(path)
+                if IndexedFile.objects.filter(kind=kind, object_id=object_id, sha256=sha256).exists():
+                    skipped += 1
+                    continue
+                jobs.append((kind, object_id, sha256, instance.file_size or 0, pool.submit(extract_text, path)))
+
+            for kind, object_id, sha256, size, future in jobs:
+                try:
+                    text, seconds = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. crashed inside MuPDF), failing every job in the
+                    # batch; leave them unrecorded so the next run retries on a fresh pool
+                    logger.warning('Extraction worker died while indexing %s %s', kind, object_id)
+                    _discard_pool(workers)
+                    failed += 1
+                    continue
+                except Exception as e:
+                    # Recorded against this hash, so a broken file isn't retried until it changes
+                    logger.warning('Text extraction failed for %s %s: %s', kind, object_id, e)
+                    _record(kind, object_id, sha256, size, '', 0, error=str(e) or type(e).__name__)
+                    failed += 1
+                    continue
+                _record(kind, object_id, sha256, size, text, seconds)
+                if kind == 'content':
+                    _check_duplicates(object_id, text, workers)
+                indexed += 1
+    return indexed, skipped, failed
+
+
+def index_file(kind, object_id):
+    index_files([(kind, object_id)])
+
+
+file_indexer = BackgroundWorker('file-text-index', index_file)
+
+
+def index_stats(pending=None):
+    """Backlog size and age, plus extraction throughput over the last hour."""
+    pending = pending_files() if pending is None else pending
+    oldest = None
+    for kind in KINDS:
+        ids = [object_id for pending_kind, object_id in pending if pending_kind == kind]
+        if ids:
+            first = KINDS[kind].objects.filter(id__in=ids).order_by('uploaded_at').values_list('uploaded_at', flat=True).first()
+            if first and (oldest is None or first < oldest):
+                oldest = first
+
+    recent = IndexedFile.objects.filter(indexed_at__gte=timezone.now() - timedelta(hours=1))
+    totals = recent.aggregate(bytes=Sum('size'), chars=Sum('chars'), seconds=Sum('seconds'))
+    files = recent.count()
+    seconds = totals['seconds'] or 0
+    return {
+        'indexed_files': IndexedFile.objects.filter(error='').count(),
+        'failed_files': IndexedFile.objects.exclude(error='').count(),
+        'pending_files': len(pending),
+        'lag_seconds': round((timezone.now() - oldest).total_seconds()) if oldest else 0,
+        'last_hour': {
+            'files': files,
+            'bytes': totals['bytes'] or 0,
+            'files_per_minute': round(files / 60, 2),
+            # Per extraction worker, from time spent inside the extractor
+            'mb_per_second': round((totals['bytes'] or 0) / seconds / 1e6, 2) if seconds else None,
+        },
+    }
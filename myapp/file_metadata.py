@@ -0,0 +1,103 @@
+"""
+Size, MIME type, page count, SHA-256 and CRC-32 of uploaded files, stored on the
+model (FileMetadata) when the file is saved.
+
+A pre_save signal fills them in for new uploads while the bytes are still
+local; backfill_file_metadata covers rows uploaded before the columns
+existed. A PDF uploaded in memory has no path to open, so its pages are
+counted by a background worker once the file is in storage.
+"""
+import hashlib
+import mimetypes
+import os
+import zlib
+
+import fitz  # PyMuPDF
+
+from .background import BackgroundWorker
+from .extraction import local_copy
+from .models import (Assignment, Note, ResearchPaper, StudentDocument, Submission, TeacherDocument,
+                     TeacherSubjectContent)
+
+# Models with a `file` field and FileMetadata columns
+FILE_MODELS = (Assignment, Note, Submission, ResearchPaper, StudentDocument, TeacherDocument, TeacherSubjectContent)
+METADATA_FIELDS = ('file_size', 'mime_type', 'page_count', 'file_sha256', 'file_crc32')
+
+
+def _pdf_pages(path):
+    try:
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception:
+        # Damaged or not really a PDF; the upload itself is still fine
+        return None
+
+
+def _uploaded_path(file):
+    """Local path of a new upload, or None if it only exists in memory."""
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    # e.g. a finished chunked upload, opened straight from its partial file
+    name = getattr(file.file, 'name', None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+
+def file_metadata(field_file):
+    """Metadata dict for a FieldFile, whether it's a fresh upload or already in storage."""
+    name = field_file.name
+    mime_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    is_pdf = mime_type == 'application/pdf'
+    digest = hashlib.sha256()
+    crc = 0
+    if not field_file._committed:
+        # New upload: read the in-memory or temporary file before storage takes it
+        upload = field_file.file
+        for chunk in upload.chunks():
+            digest.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+        upload.seek(0)
+        size = upload.size
+        path = _uploaded_path(upload) if is_pdf else None
+        pages = _pdf_pages(path) if path else None
+    else:
+        with local_copy(field_file) as path:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    crc = zlib.crc32(chunk, crc)
+            size = os.path.getsize(path)
+            pages = _pdf_pages(path) if is_pdf else None
+    return {'file_size': size, 'mime_type': mime_type, 'page_count': pages, 'file_sha256': digest.hexdigest(),
+            'file_crc32': crc}
+
+
+def capture_metadata(instance):
+    """Set the metadata columns on an instance about to be saved."""
+    if not instance.file:
+        for field in METADATA_FIELDS:
+            setattr(instance, field, instance._meta.get_field(field).get_default())
+        return
+    # Only new uploads; an unchanged file keeps what was recorded for it
+    if instance.file._committed and instance.file_size is not None:
+        return
+    in_memory = not instance.file._committed and _uploaded_path(instance.file.file) is None
+    for field, value in file_metadata(instance.file).items():
+        setattr(instance, field, value)
+    # Picked up by the post_save signal, which has the primary key
+    instance._count_pages_later = in_memory and instance.mime_type == 'application/pdf'
+
+
+def count_pages(model_label, pk):
+    """Record the page count of a stored PDF, unless the row's file changed meanwhile."""
+    model = next(m for m in FILE_MODELS if m._meta.label == model_label)
+    instance = model.objects.filter(pk=pk).only('id', 'file').first()
+    if instance is None or not instance.file:
+        return
+    with local_copy(instance.file) as path:
+        pages = _pdf_pages(path)
+    # update() so recording the count doesn't run the save signals again
+    model.objects.filter(pk=pk, file=instance.file.name).update(page_count=pages)
+
+
+# PDFs whose count is lost to a restart are picked up by backfill_file_metadata
+page_counter = BackgroundWorker('pdf-page-count', count_pages)
@@ -0,0 +1,95 @@
+"""
+Plain-text extraction from uploaded files, for the search index.
+
+This module runs inside worker processes (see file_index.py), so it must not
+import Django or the app's models.
+"""
+import os
+import re
+import time
+import zipfile
+from xml.etree import ElementTree
+
+import fitz  # PyMuPDF
+from docx import Document
+
+MAX_CHARS = 2_000_000  # text beyond this isn't indexed
+CHUNK_CHARS = 2000
+DRAWINGML_TEXT = '{http://schemas.openxmlformats.org/drawingml/2006/main}t'
+SLIDE_RE = re.compile(r'^ppt/slides/slide(\d+)\.xml$')
+FITZ_EXTENSIONS = ('.pdf', '.xps', '.epub')
+EXTRACTABLE_EXTENSIONS = FITZ_EXTENSIONS + ('.docx', '.pptx', '.txt')
+
+
+def _pdf_text(path):
+    parts = []
+    length = 0
+    with fitz.open(path) as doc:
+        for page in doc:
+            text = page.get_text('text')
+            parts.append(text)
+            length += len(text)
+            if length > MAX_CHARS:
+                break
+    return '\n'.join(parts)
+
+
+def _docx_text(path):
+    doc = Document(path)
+    parts = [para.text for para in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            parts.append(' '.join(cell.text for cell in row.cells))
+    return '\n'.join(parts)
+
+
+def _pptx_text(path):
+    # python-pptx isn't installed; slide text is just the <a:t> runs in each slide's XML
+    with zipfile.ZipFile(path) as archive:
+        slides = sorted(
+            (int(match.group(1)), name)
+            for name in archive.namelist()
+            if (match := SLIDE_RE.match(name))
+        )
+        parts = []
+        for _, name in slides:
+            root = ElementTree.fromstring(archive.read(name))
+            parts.append(' '.join(node.text for node in root.iter(DRAWINGML_TEXT) if node.text))
+    return '\n'.join(parts)
+
+
+def _plain_text(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return f.read(MAX_CHARS)
+
+
+def extract_text(path):
+    """(text, seconds spent) for a local file; unsupported types give ''."""
+    started = time.perf_counter()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in FITZ_EXTENSIONS:
+        text = _pdf_text(path)
+    elif ext == '.docx':
+        text = _docx_text(path)
+    elif ext == '.pptx':
+        text = _pptx_text(path)
+    elif ext == '.txt':
+        text = _plain_text(path)
+    else:
+        text = ''
+    return ' '.join(text.split())[:MAX_CHARS], time.perf_counter() - started
+
+
+def chunk_text(text, size=CHUNK_CHARS):
+    """Split text into pieces of about `size` characters, breaking at spaces."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            if space > start:
+                end = space
+        chunks.append(text[start:end].strip())
+        start = end
+    return [chunk for chunk in chunks if chunk]
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Question, Quiz
+
+ANSWER_KEY_CACHE_KEY = 'quiz:{quiz_id}:answer_key'
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def get_answer_key(quiz):
+    """
+    Return {question_id: correct_option} for a quiz, ordered by question id.
+
+    The cached key is stored with the quiz's answers_version and only used
+    while that matches the version on the `quiz` the caller loaded, so a
+    change made in any process is seen by all of them without another query.
+    A miss costs a single values_list query.
+    """
+    cache_key = ANSWER_KEY_CACHE_KEY.format(quiz_id=quiz.id)
+    cached = cache.get(cache_key)
+    if cached is not None and cached[0] == quiz.answers_version:
+        return cached[1]
+    answer_key = dict(
+        Question.objects.filter(quiz_id=quiz.id)
+        .order_by('id')
+        .values_list('id', 'correct_answer')
+    )
+    cache.set(cache_key, (quiz.answers_version, answer_key), ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id):
+    if quiz_id is not None:
+        # Bumping the version makes every process's cached copy stale, not just this one's
+        Quiz.objects.filter(id=quiz_id).update(answers_version=F('answers_version') + 1)
+        cache.delete(ANSWER_KEY_CACHE_KEY.format(quiz_id=quiz_id))
+
+
+def collect_answers(data, answer_key):
+    """Pick the submitted option for every question in the key out of request.POST (or a dict)."""
+    answers = {}
+    for question_id in answer_key:
+        selected = data.get(f'question_{question_id}')
+        answers[question_id] = selected if selected in ('A', 'B', 'C', 'D') else None
+    return answers
+
+
+def score_answers(quiz, answer_key, answers):
+    """
+    Grade a whole submission in one pass over the answer key.
+
+    Returns (score, results) where results is a list of
+    (question_id, selected, is_correct) in question id order. Correct answers
+    earn quiz.marks_per_question, wrong answers lose quiz.negative_marking and
+    unanswered questions score nothing. The total never drops below zero.
+    """
+    marks = Decimal(quiz.marks_per_question)
+    penalty = Decimal(quiz.negative_marking or 0)
+    correct = wrong = 0
+    results = []
+    for question_id, correct_answer in answer_key.items():
+        selected = answers.get(question_id)
+        is_correct = selected is not None and selected == correct_answer
+        if is_correct:
+            correct += 1
+        elif selected is not None:
+            wrong += 1
+        results.append((question_id, selected, is_correct))
+    score = max(Decimal('0'), correct * marks - wrong * penalty)
+    return score, results
@@ -0,0 +1,96 @@
+"""
+Resized variants of uploaded images.
+
+For an image stored as profiles/me.jpg the background worker writes
+
+    variants/profiles/me.jpg-64w.webp  variants/profiles/me.jpg-64w.jpg
+    variants/profiles/me.jpg-160w.webp ...
+
+with EXIF rotation applied and all metadata dropped. Names keep the whole
+original name, extension included, so me.jpg and me.png never share
+variants. Once a set is complete the worker stores the image's name in the
+row's image_variants column, so the srcset and variant_url filters in
+custom_filters know whether to use them without touching storage.
+"""
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .background import BackgroundWorker
+from .models import Course, StudentProfile, TeacherProfile, TeacherSubjectContent
+
+VARIANT_DIR = 'variants'
+VARIANT_WIDTHS = (64, 160, 480)
+VARIANT_FORMATS = (('jpg', 'JPEG'), ('webp', 'WEBP'))
+QUALITY = 80
+
+# (model, image field) pairs that get variants on save
+IMAGE_FIELDS = (
+    (StudentProfile, 'image'),
+    (TeacherProfile, 'image'),
+    (Course, 'image'),
+    (TeacherSubjectContent, 'profile_photo'),
+)
+
+
+def variant_name(name, width, ext):
+    return f'{VARIANT_DIR}/{name}-{width}w.{ext}'
+
+
+def has_variants(image):
+    """Whether the variants of an image field's current file are ready, from the row itself."""
+    return bool(image) and getattr(image.instance, 'image_variants', '') == image.name
+
+
+def _variants_exist(name):
+    # The largest WebP is written last, so its presence means the set is complete
+    return default_storage.exists(variant_name(name, VARIANT_WIDTHS[-1], 'webp'))
+
+
+def _mark_ready(name):
+    for model, field in IMAGE_FIELDS:
+        # update() so saving the flag doesn't queue the image again
+        model.objects.filter(**{field: name}).update(image_variants=name)
+
+
+def make_variants(name):
+    """Write every width/format variant of a stored image. Returns the number written."""
+    if not name or name.startswith(f'{VARIANT_DIR}/') or not default_storage.exists(name):
+        return 0
+    # Variant names include the full original name, so existing ones are always for this image
+    if _variants_exist(name):
+        _mark_ready(name)
+        return 0
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        # JPEG has no alpha; flatten onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    image = image.convert('RGB')
+
+    written = 0
+    # Smallest first and WebP last, so _variants_exist() only turns true once everything exists
+    for width in VARIANT_WIDTHS:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for ext, pil_format in VARIANT_FORMATS:
+            out = io.BytesIO()
+            # No exif/icc arguments: the variants carry no metadata
+            resized.save(out, pil_format, quality=QUALITY, optimize=True)
+            target = variant_name(name, width, ext)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(out.getvalue()))
+            written += 1
+    _mark_ready(name)
+    return written
+
+
+image_worker = BackgroundWorker('image-variants', make_variants)
@@ -0,0 +1,141 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from django.db import close_old_connections, transaction
+
+from .models import QuizAttempt, QuizAttemptDraft, UserAnswer
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW = 0.05  # seconds the writer waits to gather more submissions
+BATCH_MAX_SIZE = 200  # attempts written per transaction at most
+SUBMIT_TIMEOUT = 30  # seconds a request waits for its batch to commit
+
+
+class SubmissionPending(Exception):
+    """The submission is queued but its batch didn't commit within SUBMIT_TIMEOUT."""
+
+
+class PendingSubmission:
+    def __init__(self, attempt, answers=()):
+        self.attempt = attempt
+        self.answers = list(answers)
+        self.future = Future()
+
+
+class SubmissionIngestor:
+    """
+    Group commit for quiz submissions.
+
+    Request threads hand their graded attempt to a single writer thread and
+    wait for it. The writer collects whatever arrives within BATCH_WINDOW and
+    writes the whole group in one transaction, so a deadline surge of hundreds
+    of submits becomes a handful of SQLite write transactions instead of
+    hundreds competing for the write lock. A request is only acknowledged
+    after its batch has committed, so an acknowledged attempt is durable.
+
+    An attempt carrying an attempt_key is written at most once: submitting it
+    again, after a timeout or an error page, returns the row already saved.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches_written = 0
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quiz-submission-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, attempt, answers=()):
+        """
+        Queue an unsaved QuizAttempt, plus any UserAnswer rows that go with it,
+        and return the saved attempt once its batch has committed. Raises
+        SubmissionPending if that takes longer than SUBMIT_TIMEOUT, or the
+        writer's exception if the attempt couldn't be saved.
+        """
+        self._ensure_writer()
+        pending = PendingSubmission(attempt, answers)
+        self._queue.put(pending)
+        try:
+            return pending.future.result(timeout=SUBMIT_TIMEOUT)
+        except FutureTimeoutError:
+            raise SubmissionPending(attempt.attempt_key) from None
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < BATCH_MAX_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            close_old_connections()
+            try:
+                write_batch(batch)
+            except Exception:
+                logger.exception('Batched quiz submission write failed; retrying one by one')
+                # Isolate the bad submission so the rest of the group still commits
+                for pending in batch:
+                    pending.attempt.pk = None
+                    for answer in pending.answers:
+                        answer.pk = None
+                    try:
+                        write_batch([pending])
+                    except Exception as e:
+                        pending.future.set_exception(e)
+                        continue
+                    pending.future.set_result(pending.attempt)
+            else:
+                self.batches_written += 1
+                for pending in batch:
+                    pending.future.set_result(pending.attempt)
+
+
+def write_batch(batch):
+    """
+    Write a group of submissions in one transaction. A submission whose
+    attempt_key is already saved, or earlier in the batch, gets that attempt
+    instead of a second row.
+    """
+    with transaction.atomic():
+        keys = [pending.attempt.attempt_key for pending in batch if pending.attempt.attempt_key]
+        saved = {attempt.attempt_key: attempt for attempt in QuizAttempt.objects.filter(attempt_key__in=keys)}
+        new = []
+        for pending in batch:
+            key = pending.attempt.attempt_key
+            if key in saved:
+                pending.attempt = saved[key]
+                continue
+            if key:
+                saved[key] = pending.attempt
+            new.append(pending)
+        # SQLite and PostgreSQL return primary keys from bulk_create
+        attempts = QuizAttempt.objects.bulk_create([pending.attempt for pending in new])
+        answers = []
+        for attempt, pending in zip(attempts, new):
+            for answer in pending.answers:
+                answer.attempt = attempt
+            answers.extend(pending.answers)
+        if answers:
+            UserAnswer.objects.bulk_create(answers, batch_size=1000)
+        if keys:
+            # The attempt token nonce is also the autosave draft's key
+            QuizAttemptDraft.objects.filter(key__in=keys).delete()
+
+
+submission_ingestor = SubmissionIngestor()
@@ -0,0 +1,134 @@
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .answer_sheets import QuizMatrix, load_quiz_matrix
+from .models import QuizAttempt
+
+ITEM_ANALYSIS_CACHE_KEY = 'quiz:{quiz_id}:item_analysis'
+ITEM_ANALYSIS_TIMEOUT = 60 * 60 * 24
+# Share of students in the upper and lower groups for the discrimination index
+GROUP_FRACTION = 0.27
+OPTIONS = ('A', 'B', 'C', 'D')
+
+
+def _merge(old, new):
+    """Append newly loaded attempts to a cached matrix, widening it if new questions appeared."""
+    question_ids = np.union1d(old.question_ids, new.question_ids)
+
+    def widen(matrix, values):
+        out = np.zeros((len(matrix.attempt_ids), len(question_ids)), dtype=values.dtype)
+        out[:, np.searchsorted(question_ids, matrix.question_ids)] = values
+        return out
+
+    return QuizMatrix(
+        attempt_ids=np.concatenate([old.attempt_ids, new.attempt_ids]),
+        student_ids=np.concatenate([old.student_ids, new.student_ids]),
+        question_ids=question_ids,
+        answers=np.vstack([widen(old, old.answers), widen(new, new.answers)]),
+        correct=np.vstack([widen(old, old.correct), widen(new, new.correct)]),
+        seen=np.vstack([widen(old, old.seen), widen(new, new.seen)]),
+    )
+
+
+def analyse(matrix):
+    """
+    Classical item statistics for every question at once.
+
+    difficulty       share of students who answered correctly (higher = easier)
+    discrimination   difficulty in the top 27% minus difficulty in the bottom 27%
+    point_biserial   correlation between getting the item right and the rest score
+    distractors      how often each option A-D was picked
+    """
+    seen = matrix.seen
+    correct = matrix.correct & seen
+    x = correct.astype(np.float64)
+    n = seen.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = np.where(n > 0, x.sum(axis=0) / n, np.nan)
+
+        totals = x.sum(axis=1)
+        order = np.argsort(totals, kind='stable')
+        group = max(1, int(round(len(totals) * GROUP_FRACTION)))
+        lower, upper = order[:group], order[-group:]
+        p_upper = x[upper].sum(axis=0) / np.maximum(seen[upper].sum(axis=0), 1)
+        p_lower = x[lower].sum(axis=0) / np.maximum(seen[lower].sum(axis=0), 1)
+        discrimination = np.where(n > 0, p_upper - p_lower, np.nan)
+
+        # Rest score: total without the item itself, so an item isn't correlated with itself
+        rest = (totals[:, None] - x) * seen
+        mean_x = x.sum(axis=0) / n
+        mean_rest = rest.sum(axis=0) / n
+        cov = (x * rest).sum(axis=0) / n - mean_x * mean_rest
+        var_x = mean_x * (1 - mean_x)
+        var_rest = (rest ** 2).sum(axis=0) / n - mean_rest ** 2
+        point_biserial = np.where((var_x > 0) & (var_rest > 0), cov / np.sqrt(var_x * var_rest), np.nan)
+
+    # One-hot over options 1-4; 0 (unanswered) matches nothing
+    picks = (matrix.answers[:, :, None] == np.arange(1, 5)) & seen[:, :, None]
+    distractors = picks.sum(axis=0)
+
+    items = []
+    for index, question_id in enumerate(matrix.question_ids.tolist()):
+        items.append({
+            'question_id': question_id,
+            'responses': int(n[index]),
+            'difficulty': _round(difficulty[index]),
+            'discrimination': _round(discrimination[index]),
+            'point_biserial': _round(point_biserial[index]),
+            'distractors': dict(zip(OPTIONS, distractors[index].tolist())),
+            'unanswered': int(n[index] - distractors[index].sum()),
+        })
+    return items
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def item_analysis(quiz_id):
+    """
+    Item statistics for a quiz, cached per quiz.
+
+    The cache keeps the decoded response matrix; when new attempts arrive only
+    those are loaded and appended before the statistics are recomputed.
+    """
+    cache_key = ITEM_ANALYSIS_CACHE_KEY.format(quiz_id=quiz_id)
+    cached = cache.get(cache_key)
+    state = QuizAttempt.objects.filter(quiz_id=quiz_id).aggregate(latest=Max('id'), count=Count('id'))
+    latest, count = state['latest'], state['count']
+
+    if cached and cached['latest'] == latest and cached['count'] == count:
+        return cached['items']
+
+    matrix = None
+    if cached and cached['latest'] is not None and latest is not None and cached['count'] <= count:
+        new_ids = list(QuizAttempt.objects.filter(quiz_id=quiz_id, id__gt=cached['latest']).values_list('id', flat=True))
+        # Only append when nothing was deleted in the meantime; otherwise rebuild
+        if cached['count'] + len(new_ids) == count:
+            matrix = _merge(cached['matrix'], load_quiz_matrix(quiz_id, attempt_ids=new_ids))
+    if matrix is None:
+        matrix = load_quiz_matrix(quiz_id)
+
+    items = analyse(matrix) if len(matrix.attempt_ids) else []
+    cache.set(cache_key, {'latest': latest, 'count': count, 'matrix': matrix, 'items': items}, ITEM_ANALYSIS_TIMEOUT)
+    return items
+
+
+def flag_items(items, answer_key):
+    """Attach simple review flags teachers can act on."""
+    for item in items:
+        flags = []
+        difficulty = item['difficulty']
+        if difficulty is not None and difficulty >= 0.9:
+            flags.append('too easy')
+        if difficulty is not None and difficulty <= 0.3:
+            flags.append('too hard')
+        correct = answer_key.get(item['question_id'])
+        distractors = item['distractors']
+        if (item['discrimination'] is not None and item['discrimination'] < 0) or (
+                correct in distractors and max(distractors.values()) > distractors[correct]):
+            flags.append('misleading')
+        item['correct_answer'] = correct
+        item['flags'] = flags
+    return items
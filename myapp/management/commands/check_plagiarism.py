@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import Assignment
+from myapp.plagiarism import check_assignment
+
+
+class Command(BaseCommand):
+    help = (
+        "Screen assignment submissions for copied text and refresh the similarity reports shown on "
+        "the assignment page. Fingerprints of unchanged files are reused; new submissions are checked automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignment_ids', nargs='*', type=int, help='Assignments to check (default: all with submissions)')
+        parser.add_argument('--workers', type=int, default=settings.PLAGIARISM_WORKERS,
+                            help='Fingerprinting processes')
+
+    def handle(self, *args, **options):
+        assignments = Assignment.objects.filter(submissions__isnull=False).distinct()
+        if options['assignment_ids']:
+            assignments = Assignment.objects.filter(id__in=options['assignment_ids'])
+            if not assignments:
+                raise CommandError('No such assignment.')
+        for assignment in assignments.order_by('id'):
+            pairs = check_assignment(assignment.id, options['workers'])
+            self.stdout.write(f'{assignment.topic} (#{assignment.id}): {pairs} similar pairs')
+        self.stdout.write(self.style.SUCCESS('Done.'))
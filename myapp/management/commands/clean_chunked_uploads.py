@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.chunked_upload import clean_stale_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove chunked uploads that were never finished, along with their partial files. "
+        "Run this periodically (e.g. hourly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS,
+                            help='Remove uploads untouched for this many hours.')
+
+    def handle(self, *args, **options):
+        removed, freed = clean_stale_uploads(options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} stale uploads, freed {freed / (1024 * 1024):.1f} MB.'
+        ))
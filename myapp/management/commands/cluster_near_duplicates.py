@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.models import TeacherSubjectContent
+from myapp.near_duplicates import cluster_corpus, sign_corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute MinHash signatures for all teacher content with indexed file text, then flag and "
+        "list groups of near-duplicate uploads. Run index_file_text first; new uploads are checked automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.FILE_INDEX_WORKERS,
+                            help='Signing processes')
+        parser.add_argument('--show', type=int, default=20, help='How many of the largest groups to list')
+
+    def handle(self, *args, **options):
+        signed = sign_corpus(options['workers'])
+        self.stdout.write(f'Signed {signed} content files.')
+        clusters = cluster_corpus()
+        flagged = TeacherSubjectContent.objects.filter(duplicate_of__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {len(clusters)} groups of near duplicates ({flagged} uploads flagged).'))
+        subjects = dict(TeacherSubjectContent.objects.filter(
+            id__in=[content_id for cluster in clusters[:options['show']] for content_id in cluster]
+        ).values_list('id', 'subject'))
+        for cluster in clusters[:options['show']]:
+            self.stdout.write(', '.join(f'#{content_id} {subjects.get(content_id, "")}' for content_id in cluster))
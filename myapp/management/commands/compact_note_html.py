@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from myapp.extraction import extract_pdf, local_copy
+from myapp.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-extract PDF notes as compact HTML, with images saved as files instead of "
+        "inline base64, and report the size reduction for each note."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('note_ids', nargs='*', type=int, help='Only these notes (default: every PDF note)')
+        parser.add_argument('--dry-run', action='store_true', help='Report sizes without saving')
+
+    def handle(self, *args, **options):
+        notes = Note.objects.filter(file__iendswith='.pdf').only('id', 'topic', 'file', 'content_html')
+        if options['note_ids']:
+            notes = notes.filter(id__in=options['note_ids'])
+        before_total = after_total = 0
+        for note in notes.iterator():
+            try:
+                with local_copy(note.file) as path:
+                    content_html = extract_pdf(path)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Note {note.id} ({note.topic}): {e}'))
+                continue
+            before, after = len(note.content_html.encode()), len(content_html.encode())
+            before_total += before
+            after_total += after
+            saved = (1 - after / before) * 100 if before else 0
+            self.stdout.write(f'Note {note.id} ({note.topic}): {before / 1024:.1f} KB -> {after / 1024:.1f} KB ({saved:.0f}% smaller)')
+            if not options['dry_run']:
+                Note.objects.filter(id=note.id).update(content_html=content_html)
+        if before_total:
+            self.stdout.write(self.style.SUCCESS(
+                f'Total: {before_total / 1024:.1f} KB -> {after_total / 1024:.1f} KB '
+                f'({(1 - after_total / before_total) * 100:.0f}% smaller)'
+            ))
@@ -0,0 +1,91 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+
+from myapp.answer_sheets import load_quiz_matrix, pack_legacy_attempts
+from myapp.models import QuizAttempt, UserAnswer
+
+
+def table_bytes(table):
+    """On-disk size of a table plus its indexes, or None if the SQLite dbstat table isn't available."""
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+                [table],
+            )
+        except DatabaseError:
+            return None
+        return cursor.fetchone()[0] or 0
+
+
+def packed_bytes():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(LENGTH(question_ids) + LENGTH(answer_vector) + LENGTH(correct_bitmap)), 0) "
+            f"FROM {QuizAttempt._meta.db_table}"
+        )
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Pack UserAnswer rows into QuizAttempt answer vectors, report storage and per-quiz "
+        "query time for both layouts, and optionally delete the packed UserAnswer rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-rows', action='store_true',
+                            help='Delete UserAnswer rows whose attempt has been packed')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            packed = pack_legacy_attempts()
+        self.stdout.write(f'Packed {packed} attempts.')
+
+        rows = UserAnswer.objects.count()
+        row_bytes = table_bytes(UserAnswer._meta.db_table)
+        vector_bytes = packed_bytes()
+        self.stdout.write(f'UserAnswer rows: {rows}')
+        if row_bytes is not None:
+            self.stdout.write(f'UserAnswer table + indexes: {row_bytes / 1024:.1f} KB')
+        self.stdout.write(f'Packed answer columns: {vector_bytes / 1024:.1f} KB')
+        if row_bytes:
+            self.stdout.write(self.style.SUCCESS(f'Storage saved: {(1 - vector_bytes / row_bytes) * 100:.1f}%'))
+
+        busiest = (UserAnswer.objects.values('quiz_id').annotate(n=Count('id')).order_by('-n').first())
+        if busiest:
+            self.report_query_time(busiest['quiz_id'])
+
+        if options['delete_rows']:
+            deleted, _ = UserAnswer.objects.filter(attempt__isnull=False).exclude(attempt__question_ids='').delete()
+            self.stdout.write(self.style.WARNING(f'Deleted {deleted} UserAnswer rows.'))
+
+    def report_query_time(self, quiz_id):
+        # Per-question correct counts: the basic building block of quiz analytics
+        start = time.perf_counter()
+        from_rows = Counter(
+            question_id for question_id, is_correct
+            in UserAnswer.objects.filter(quiz_id=quiz_id).values_list('question_id', 'is_correct').iterator()
+            if is_correct
+        )
+        rows_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matrix = load_quiz_matrix(quiz_id)
+        totals = matrix.correct.sum(axis=0)
+        vectors_time = time.perf_counter() - start
+        from_vectors = Counter({qid: int(n) for qid, n in zip(matrix.question_ids.tolist(), totals) if n})
+
+        self.stdout.write(
+            f'Quiz {quiz_id} per-question correct counts: rows {rows_time * 1000:.1f}ms, '
+            f'packed {vectors_time * 1000:.1f}ms'
+        )
+        if from_rows != from_vectors:
+            self.stdout.write(self.style.ERROR('Packed answers do not match UserAnswer rows!'))
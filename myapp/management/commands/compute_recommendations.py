@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.weak_topics import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Find every student's weak courses from their quiz answers and store the top "
+        "recommendations for the dashboard. Meant to run nightly from cron."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = build_recommendations()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Stored recommendations for {written} students in {elapsed:.2f}s.'))
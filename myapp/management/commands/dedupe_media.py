@@ -0,0 +1,60 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.storage import BLOB_DIR, DedupFileSystemStorage, file_digest
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing files under MEDIA_ROOT into the deduplicating blob store: identical "
+        "files become hard links to one blob. Reports the disk space reclaimed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reclaimed')
+
+    def handle(self, *args, **options):
+        storage = DedupFileSystemStorage(location=settings.MEDIA_ROOT)
+        blob_root = os.path.join(storage.location, BLOB_DIR)
+        dry_run = options['dry_run']
+        seen = {}  # digest -> first path, for dry runs
+        files = duplicates = reclaimed = 0
+
+        for root, dirs, names in os.walk(storage.location):
+            if os.path.abspath(root) == os.path.abspath(storage.location) and BLOB_DIR in dirs:
+                dirs.remove(BLOB_DIR)
+            for file_name in names:
+                path = os.path.join(root, file_name)
+                if os.path.islink(path):
+                    continue
+                files += 1
+                digest = file_digest(path)
+                blob = storage.blob_path(digest)
+                if dry_run:
+                    first = seen.setdefault(digest, path)
+                    if first != path and not os.path.samefile(first, path):
+                        duplicates += 1
+                        reclaimed += os.path.getsize(path)
+                    continue
+                if not os.path.exists(blob):
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.link(path, blob)
+                elif not os.path.samefile(blob, path):
+                    old = os.stat(path)
+                    # Swap the copy for a link to the blob without a moment where the name is missing
+                    tmp = f'{path}.dedupe'
+                    os.link(blob, tmp)
+                    os.replace(tmp, path)
+                    duplicates += 1
+                    # The bytes are only freed if nothing else held the old copy
+                    if old.st_nlink == 1:
+                        reclaimed += old.st_size
+
+        verb = 'Would reclaim' if dry_run else 'Reclaimed'
+        self.stdout.write(f'Scanned {files} files under {storage.location}, {duplicates} duplicates.')
+        self.stdout.write(self.style.SUCCESS(f'{verb} {reclaimed / (1024 * 1024):.1f} MB.'))
+        if not dry_run and os.path.isdir(blob_root):
+            blobs = sum(len(names) for _, _, names in os.walk(blob_root))
+            self.stdout.write(f'{blobs} unique blobs stored.')
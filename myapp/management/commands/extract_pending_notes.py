@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from myapp.extraction import extract_note
+from myapp.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        "Run text extraction for notes still marked pending or running, e.g. jobs lost "
+        "when the server restarted. Use --failed to retry failed ones too."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='Also retry notes whose extraction failed')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running'] + (['failed'] if options['failed'] else [])
+        note_ids = list(Note.objects.filter(extraction_status__in=statuses).values_list('id', flat=True))
+        for note_id in note_ids:
+            extract_note(note_id)
+            note = Note.objects.only('extraction_status', 'extraction_error').get(id=note_id)
+            if note.extraction_status == 'done':
+                self.stdout.write(f'Note {note_id}: done')
+            else:
+                self.stdout.write(self.style.ERROR(f'Note {note_id}: {note.extraction_error}'))
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(note_ids)} notes.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from myapp.images import IMAGE_FIELDS, make_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Create resized WebP/JPEG variants for profile, course and teacher content images "
+        "uploaded before variants were generated automatically."
+    )
+
+    def handle(self, *args, **options):
+        images = written = 0
+        for model, field in IMAGE_FIELDS:
+            names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True)
+            for name in names.distinct().iterator():
+                try:
+                    count = make_variants(name)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'{name}: {e}'))
+                    continue
+                images += bool(count)
+                written += count
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} variants for {images} images.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from myapp.models import FilePreview
+from myapp.previews import PREVIEW_MODELS, generate_preview
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate first-page thumbnails and text previews for uploaded documents that don't "
+        "have one yet. New uploads are previewed automatically; this backfills older files."
+    )
+
+    def handle(self, *args, **options):
+        done = set(FilePreview.objects.values_list('name', flat=True))
+        created = failed = 0
+        for model in PREVIEW_MODELS:
+            for instance in model.objects.exclude(file='').exclude(file__isnull=True).only('id', 'file').iterator():
+                name = instance.file.name
+                if name in done:
+                    continue
+                try:
+                    generate_preview(name, instance.file)
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'{model.__name__} {instance.id} ({name}): {e}'))
+                    continue
+                done.add(name)
+                created += 1
+        self.stdout.write(self.style.SUCCESS(f'Previewed {created} files, {failed} failed.'))
@@ -0,0 +1,27 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp.file_index import index_files, index_stats, pending_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract text from uploaded PDF/DOCX/PPTX files into the search index. Files already "
+        "indexed at their current content hash are skipped; new uploads are indexed automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.FILE_INDEX_WORKERS,
+                            help='Extraction processes')
+        parser.add_argument('--status', action='store_true', help='Only print backlog and throughput')
+
+    def handle(self, *args, **options):
+        pending = pending_files()
+        if not options['status'] and pending:
+            self.stdout.write(f'Indexing {len(pending)} files with {options["workers"]} workers...')
+            indexed, skipped, failed = index_files(pending, options['workers'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} files, skipped {skipped}, {failed} failed.'))
+            pending = None
+        self.stdout.write(json.dumps(index_stats(pending), indent=2))
@@ -0,0 +1,110 @@
+import random
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from myapp.answer_sheets import pack_answers
+from myapp.grading import get_answer_key, score_answers
+from myapp.ingest import submission_ingestor
+from myapp.models import Course, Question, Quiz, QuizAttempt
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduce a quiz deadline: N students submit at the same instant. "
+        "Compares one transaction per submit (direct) with the batched ingestion path. "
+        "Creates throwaway users and a quiz in the configured database and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--mode', choices=['direct', 'batched', 'both'], default='both')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data for inspection')
+
+    def handle(self, *args, **options):
+        students, quiz = self.setup_data(options['students'], options['questions'])
+        try:
+            modes = ['direct', 'batched'] if options['mode'] == 'both' else [options['mode']]
+            for mode in modes:
+                QuizAttempt.objects.filter(quiz=quiz).delete()
+                self.run_surge(mode, students, quiz)
+        finally:
+            if not options['keep']:
+                User.objects.filter(id__in=[s.id for s in students] + [quiz.course.user_id]).delete()
+
+    def setup_data(self, student_count, question_count):
+        owner = User.objects.create(username=f'surge_owner_{int(time.time())}')
+        course = Course.objects.create(user=owner, title='Surge load test', description='Generated by loadtest_quiz_surge')
+        quiz = Quiz.objects.create(title='Surge quiz', course=course, total_questions=question_count,
+                                   marks_per_question=1, negative_marking=0.25)
+        Question.objects.bulk_create([
+            Question(quiz=quiz, text=f'Question {i}', option_a='a', option_b='b', option_c='c', option_d='d',
+                     correct_answer=random.choice('ABCD'))
+            for i in range(question_count)
+        ])
+        prefix = owner.username.replace('owner', 'student')
+        User.objects.bulk_create([User(username=f'{prefix}_{i}') for i in range(student_count)])
+        students = list(User.objects.filter(username__startswith=f'{prefix}_'))
+        return students, quiz
+
+    def run_surge(self, mode, students, quiz):
+        answer_key = get_answer_key(quiz)
+        barrier = threading.Barrier(len(students))
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        batches_before = submission_ingestor.batches_written
+
+        def student(user):
+            answers = {qid: random.choice('ABCD') if random.random() < 0.9 else None for qid in answer_key}
+            score, results = score_answers(quiz, answer_key, answers)
+            attempt = QuizAttempt(student=user, quiz=quiz, score=score, total_questions=len(answer_key),
+                                  time_taken=0, **pack_answers(results))
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                if mode == 'batched':
+                    submission_ingestor.submit(attempt)
+                else:
+                    attempt.save()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            else:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=student, args=(user,)) for user in students]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        saved_attempts = QuizAttempt.objects.filter(quiz=quiz).count()
+        saved_answers = sum(len(vector) for vector in QuizAttempt.objects.filter(quiz=quiz).values_list('answer_vector', flat=True))
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{mode}: {len(students)} simultaneous submits'))
+        self.stdout.write(f'  acknowledged: {len(latencies)}  failed: {len(errors)}  wall time: {elapsed:.2f}s')
+        if latencies:
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f'  latency p50: {statistics.median(latencies) * 1000:.0f}ms  '
+                f'p95: {p95 * 1000:.0f}ms  max: {latencies[-1] * 1000:.0f}ms'
+            )
+        if mode == 'batched':
+            self.stdout.write(f'  write transactions: {submission_ingestor.batches_written - batches_before}')
+        if errors:
+            self.stdout.write(self.style.WARNING(f'  first error: {errors[0]}'))
+        # Every acknowledged submit must be on disk with all of its answers
+        durable = saved_attempts == len(latencies) and saved_answers == len(latencies) * len(answer_key)
+        style = self.style.SUCCESS if durable else self.style.ERROR
+        self.stdout.write(style(f'  stored attempts: {saved_attempts}  stored answers: {saved_answers}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from myapp.search import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index from notes, teacher content, assignments and "
+        "research papers. Saves keep it current; run this once after migrating."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents.'))
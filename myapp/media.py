@@ -0,0 +1,180 @@
+"""
+Access rules and delivery for uploaded files under MEDIA_ROOT.
+
+protected_media checks who may read a file, then either hands the transfer to
+the front-end server (MEDIA_DELIVERY = 'x-accel-redirect' for nginx,
+'x-sendfile' for Apache/lighttpd) or streams it itself with Range and
+conditional GET support.
+
+nginx example for MEDIA_DELIVERY = 'x-accel-redirect':
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/project/media/;
+    }
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import FilePreview, StudentDocument, Submission, TeacherDocument, TeacherSubjectContent
+
+# Images shown on public pages
+PUBLIC_DIRS = ('courses/', 'profiles/', 'teacher_profiles/')
+# Learning material any signed-in user can open
+SHARED_DIRS = ('assignments/', 'notes/', 'research_papers/')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# variants/<source name>-<width>w.<ext>, see images.py
+VARIANT_RE = re.compile(r'^variants/(.+)-\d+w\.\w+$')
+
+
+def _locker_owner(model, request, name):
+    # Document locker files also need the PIN to have been entered this session
+    return (request.session.get('pin_verified', False)
+            and model.objects.filter(file=name, user=request.user).exists())
+
+
+def _preview_reader(request, name):
+    # A preview is shared by every upload with the same bytes; it can be read
+    # by anyone who may read one of them, so a locker document's stays private
+    files = FilePreview.objects.filter(preview__thumbnail=name).values_list('name', flat=True)
+    return any(can_access(request, file_name) for file_name in files)
+
+
+def can_access(request, name):
+    if name.startswith('variants/'):
+        # A resized copy can be read by whoever may read the image it was made from
+        match = VARIANT_RE.match(name)
+        return bool(match) and can_access(request, match.group(1))
+    if name.startswith(PUBLIC_DIRS):
+        return True
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if name.startswith(SHARED_DIRS):
+        return True
+    if name.startswith('teacher_content/'):
+        if user.is_staff:
+            return True
+        # Pending or rejected uploads are only visible to the teacher who sent them
+        return TeacherSubjectContent.objects.filter(file=name).filter(
+            Q(approval_status='approved') | Q(user=user)).exists()
+    if name.startswith('student_documents/'):
+        return _locker_owner(StudentDocument, request, name)
+    if name.startswith('teacher_documents/'):
+        return _locker_owner(TeacherDocument, request, name)
+    if name.startswith('previews/'):
+        return user.is_staff or _preview_reader(request, name)
+    if name.startswith('submissions/'):
+        if user.is_staff:
+            return True
+        # The student who handed it in, or the teacher who set the assignment
+        return Submission.objects.filter(file=name).filter(
+            Q(student=user) | Q(assignment__user=user)).exists()
+    return user.is_staff
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to send the whole
+    file, or False when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class RangeFile:
+    """Read-only view of `length` bytes of an open file, for FileResponse."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def offload_response(name, path, content_type):
+    """Let the front-end server send the file, or None to stream it from Python."""
+    delivery = getattr(settings, 'MEDIA_DELIVERY', None)
+    if delivery == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        return response
+    if delivery == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def file_response(request, name, path):
+    stat = os.stat(path)
+    etag = f'"{int(stat.st_mtime)}-{stat.st_size}"'
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    offloaded = offload_response(name, path, content_type)
+    if offloaded is not None:
+        offloaded['Cache-Control'] = 'private'
+        return offloaded
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # If-Range: only honour the range if the client's copy is still current
+    if range_header and request.headers.get('If-Range', etag) in (etag, http_date(stat.st_mtime)):
+        byte_range = parse_range(range_header, stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        response = FileResponse(RangeFile(open(path, 'rb'), start, end - start + 1), status=206,
+                                content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        # A plain file object lets the WSGI server use sendfile()
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private'
+    return response
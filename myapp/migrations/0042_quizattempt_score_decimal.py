@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0041_teachersubjectcontent_approval_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='score',
+            field=models.DecimalField(decimal_places=2, max_digits=8),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0042_quizattempt_score_decimal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttemptDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('answers', models.JSONField(default=dict)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_drafts', to='myapp.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempt_drafts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
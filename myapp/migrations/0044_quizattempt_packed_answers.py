@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:46
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+
+def pack_existing_answers(apps, schema_editor):
+    # Same layout as answer_sheets.pack_answers, inlined so the migration stays frozen
+    QuizAttempt = apps.get_model('myapp', 'QuizAttempt')
+    UserAnswer = apps.get_model('myapp', 'UserAnswer')
+    rows = (UserAnswer.objects.filter(attempt__isnull=False)
+            .order_by('attempt_id', 'question_id')
+            .values_list('attempt_id', 'question_id', 'answer', 'is_correct'))
+    pending = []
+    for attempt_id, group in groupby(rows.iterator(chunk_size=2000), key=lambda row: row[0]):
+        group = list(group)
+        bitmap = bytearray((len(group) + 7) // 8)
+        for index, (_, _, _, is_correct) in enumerate(group):
+            if is_correct:
+                bitmap[index // 8] |= 1 << (index % 8)
+        pending.append(QuizAttempt(
+            id=attempt_id,
+            question_ids=','.join(str(row[1]) for row in group),
+            answer_vector=''.join(row[2] or '-' for row in group),
+            correct_bitmap=bytes(bitmap),
+        ))
+        if len(pending) >= 500:
+            QuizAttempt.objects.bulk_update(pending, ['question_ids', 'answer_vector', 'correct_bitmap'])
+            pending = []
+    if pending:
+        QuizAttempt.objects.bulk_update(pending, ['question_ids', 'answer_vector', 'correct_bitmap'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0043_quizattemptdraft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answer_vector',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='correct_bitmap',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='question_ids',
+            field=models.TextField(blank=True, default=''),
+        ),
+        # UserAnswer rows are left in place; compact_quiz_answers --delete-rows removes them
+        migrations.RunPython(pack_existing_answers, migrations.RunPython.noop),
+    ]
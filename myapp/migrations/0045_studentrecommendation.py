@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0044_quizattempt_packed_answers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weak_courses', models.JSONField(default=list)),
+                ('recommendations', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0046_contentdownload_contentrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='extraction_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='extraction_progress',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='extraction_status',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='', max_length=10),
+        ),
+    ]
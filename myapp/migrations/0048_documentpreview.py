@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0047_note_extraction_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('thumbnail', models.ImageField(blank=True, null=True, upload_to='previews/')),
+                ('text', models.TextField(blank=True, default='')),
+                ('page_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilePreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('preview', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='myapp.documentpreview')),
+            ],
+        ),
+    ]
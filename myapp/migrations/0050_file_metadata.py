@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0049_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='researchpaper',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='researchpaper',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='researchpaper',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='researchpaper',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teacherdocument',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='teacherdocument',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teacherdocument',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='teacherdocument',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='mime_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='page_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
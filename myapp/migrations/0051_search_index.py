@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0050_file_metadata'),
+    ]
+
+    operations = [
+        # See myapp/search.py. Populate existing rows with rebuild_search_index.
+        migrations.RunSQL(
+            sql="""
+                CREATE VIRTUAL TABLE search_index USING fts5(
+                    title,
+                    body,
+                    kind UNINDEXED,
+                    object_id UNINDEXED,
+                    department UNINDEXED,
+                    year UNINDEXED,
+                    semester UNINDEXED,
+                    tokenize = 'porter unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """,
+            reverse_sql='DROP TABLE search_index',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0051_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('chunks', models.IntegerField(default=0)),
+                ('chars', models.IntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('indexed_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        # See myapp/search.py; filled by index_file_text and on upload
+        migrations.RunSQL(
+            sql="""
+                CREATE VIRTUAL TABLE search_file_chunks USING fts5(
+                    body,
+                    tokenize = 'porter unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """,
+            reverse_sql='DROP TABLE search_file_chunks',
+        ),
+    ]
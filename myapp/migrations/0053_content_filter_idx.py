@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0052_indexedfile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teachersubjectcontent',
+            index=models.Index(fields=['department', 'semester', 'year', 'section', 'approval_status'], name='content_filter_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0054_content_listing_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSignature',
+            fields=[
+                ('content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='myapp.teachersubjectcontent')),
+                ('signature', models.BinaryField()),
+                ('shingles', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='myapp.teachersubjectcontent'),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='duplicate_similarity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ContentBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='myapp.teachersubjectcontent')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0055_near_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionFingerprint',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='myapp.submission')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('fingerprints', models.BinaryField()),
+                ('error', models.TextField(blank=True, default='')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='similarity_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SimilarityPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared', models.IntegerField()),
+                ('similarity', models.FloatField()),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_pairs', to='myapp.assignment')),
+                ('first', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.submission')),
+                ('second', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignment', '-similarity'], name='similarity_report_idx')],
+            },
+        ),
+    ]
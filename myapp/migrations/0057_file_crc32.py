@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0056_plagiarism'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='researchpaper',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teacherdocument',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='file_crc32',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0057_file_crc32'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_variants',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='image_variants',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='teacherprofile',
+            name='image_variants',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='teachersubjectcontent',
+            name='image_variants',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0058_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='attempt_key',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
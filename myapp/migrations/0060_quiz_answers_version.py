@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0059_quizattempt_attempt_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='answers_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0060_quiz_answers_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
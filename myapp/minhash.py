@@ -0,0 +1,82 @@
+"""
+MinHash signatures and LSH band keys for near-duplicate text.
+
+A document is reduced to the set of its SHINGLE_WORDS-word windows, and its
+signature is the minimum of NUM_PERM hash functions over that set; the
+fraction of positions where two signatures agree estimates the Jaccard
+similarity of the two sets. Signatures are cut into BANDS bands of ROWS
+values and each band hashed to a bucket key, so documents sharing any bucket
+are candidates: with 16 bands of 8 rows, a pair at similarity 0.8 shares a
+bucket 95% of the time, one at 0.6 24% and one at 0.4 1%.
+
+This module runs inside worker processes (see near_duplicates.py), so it
+must not import Django or the app's models.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIN_SHINGLES = 20  # shorter texts say too little to compare
+BLOCK = 4096  # shingles hashed per step, bounding memory to BLOCK x NUM_PERM
+WORD_RE = re.compile(r'\w+')
+
+# Fixed seed: signatures are stored, so the hash functions must never change
+_rng = np.random.default_rng(20261019)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text):
+    """64-bit hashes of the distinct SHINGLE_WORDS-word windows of `text`."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return np.empty(0, dtype=np.uint64)
+    hashes = {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + SHINGLE_WORDS]).encode(), digest_size=8).digest(), 'little')
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def signature(hashes):
+    """NUM_PERM uint32 minima of multiply-shift hashes of the shingle hashes."""
+    minima = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(hashes), BLOCK):
+        block = hashes[start:start + BLOCK]
+        # uint64 arithmetic wraps, which is what multiply-shift hashing wants
+        values = (_A[:, None] * block[None, :] + _B[:, None]) >> np.uint64(32)
+        np.minimum(minima, values.min(axis=1), out=minima)
+    return minima.astype(np.uint32)
+
+
+def band_keys(sig):
+    """One signed 64-bit bucket key per band; the band number is part of the key."""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8,
+                                 salt=band.to_bytes(2, 'little')).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def document_signature(text):
+    """(signature bytes, band keys, shingle count) for a text, or None if it's too short."""
+    hashes = shingles(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    sig = signature(hashes)
+    return sig.tobytes(), band_keys(sig), len(hashes)
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype=np.uint32)
@@ -3,6 +3,18 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from ckeditor.fields import RichTextField
 
+class FileMetadata(models.Model):
+    """Facts about `file` recorded when it is saved (see file_metadata.py), so listings never stat storage."""
+    file_size = models.BigIntegerField(null=True, blank=True, db_index=True)
+    mime_type = models.CharField(max_length=100, blank=True, default='', db_index=True)
+    page_count = models.IntegerField(null=True, blank=True)  # PDFs only
+    file_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    file_crc32 = models.BigIntegerField(null=True, blank=True)  # for ZIP entries (zip_stream.py)
+
+    class Meta:
+        abstract = True
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
 
@@ -16,6 +28,7 @@ class Course(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     duration = models.IntegerField(blank=True, null=True)  # in weeks
     image = models.ImageField(upload_to='courses/', blank=True, null=True)
+    image_variants = models.CharField(max_length=255, blank=True, default='')  # see images.py
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -32,6 +45,7 @@ class Quiz(models.Model):
     marks_per_question = models.IntegerField(default=1)
     negative_marking = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
+    answers_version = models.PositiveIntegerField(default=0)  # bumped when its questions change, see grading.py
 
     def __str__(self):
         return self.title
@@ -63,6 +77,7 @@ class StudentProfile(models.Model):
     pass_out_year = models.IntegerField()
     courses = models.ManyToManyField(Course, related_name='students', blank=True)
     image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    image_variants = models.CharField(max_length=255, blank=True, default='')  # see images.py
     # Document locker PIN fields
     pin = models.CharField(max_length=4, blank=True, null=True)
     recovery_password = models.CharField(max_length=16, blank=True, null=True)
@@ -72,7 +87,7 @@ class StudentProfile(models.Model):
         return self.user.username
 
 
-class Assignment(models.Model):
+class Assignment(FileMetadata):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_assignments', default=1)
     file = models.FileField(upload_to='assignments/', blank=True, null=True)
     description = models.TextField()
@@ -84,12 +99,13 @@ class Assignment(models.Model):
     section = models.CharField(max_length=10, blank=True, null=True)
     department = models.CharField(max_length=255, blank=True, null=True)
     upload_type = models.CharField(max_length=20, choices=[('Assignment', 'Assignment'), ('Notes', 'Notes'), ('Question Bank', 'Question Bank'), ('Papers', 'Papers')], default='Assignment')
+    similarity_checked_at = models.DateTimeField(blank=True, null=True)  # last plagiarism screening
 
     def __str__(self):
         return self.topic
 
 
-class Note(models.Model):
+class Note(FileMetadata):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='notes', null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_notes')
     file = models.FileField(upload_to='notes/', blank=True, null=True)
@@ -102,12 +118,16 @@ class Note(models.Model):
     semester = models.CharField(max_length=10, blank=True, null=True)
     section = models.CharField(max_length=10, blank=True, null=True)
     upload_type = models.CharField(max_length=20, choices=[('Assignment', 'Assignment'), ('Notes', 'Notes'), ('Question Bank', 'Question Bank'), ('Papers', 'Papers'), ('Lab Manual', 'Lab Manual'), ('Presentation', 'Presentation'), ('Syllabus', 'Syllabus'), ('Other', 'Other')], default='Notes')
+    # Background text extraction from the uploaded file, see extraction.py
+    extraction_status = models.CharField(max_length=10, choices=[('', 'None'), ('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='', blank=True)
+    extraction_progress = models.IntegerField(default=0)  # percent
+    extraction_error = models.TextField(blank=True, default='')
 
     def __str__(self):
         return self.topic
 
 
-class Submission(models.Model):
+class Submission(FileMetadata):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions')
     file = models.FileField(upload_to='submissions/', blank=True, null=True)
@@ -118,6 +138,34 @@ class Submission(models.Model):
         return f"Submission by {self.student.username} for {self.assignment.topic}"
 
 
+class SubmissionFingerprint(models.Model):
+    """Winnowed fingerprints of a submission's text (see winnowing.py), kept until the file changes."""
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True,
+                                      related_name='fingerprint')
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    fingerprints = models.BinaryField()  # sorted uint64 values
+    error = models.TextField(blank=True, default='')
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fingerprint of submission {self.submission_id}"
+
+
+class SimilarityPair(models.Model):
+    """Two submissions to an assignment whose text overlaps, from the last plagiarism screening."""
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='similarity_pairs')
+    first = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    second = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    shared = models.IntegerField()  # fingerprints in common
+    similarity = models.FloatField()  # shared / fingerprints of the shorter submission
+
+    class Meta:
+        indexes = [models.Index(fields=['assignment', '-similarity'], name='similarity_report_idx')]
+
+    def __str__(self):
+        return f"{self.first_id} ~ {self.second_id} ({self.similarity:.0%})"
+
+
 class TeacherProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=20)
@@ -126,6 +174,7 @@ class TeacherProfile(models.Model):
     unique_id = models.CharField(max_length=50, unique=True, blank=True, null=True)
     courses = models.ManyToManyField(Course, related_name='teachers', blank=True)
     image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    image_variants = models.CharField(max_length=255, blank=True, default='')  # see images.py
     # Document locker PIN fields
     pin = models.CharField(max_length=4, blank=True, null=True)
     recovery_password = models.CharField(max_length=16, blank=True, null=True)
@@ -138,14 +187,43 @@ class TeacherProfile(models.Model):
 class QuizAttempt(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quiz_attempts")
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="attempts")
-    score = models.IntegerField()
+    score = models.DecimalField(max_digits=8, decimal_places=2)  # marks after negative marking
     total_questions = models.IntegerField()
     attempted_at = models.DateTimeField(auto_now_add=True)
     time_taken = models.IntegerField(default=0)  # in seconds
+    # Nonce of the attempt token, so a resubmitted attempt is only saved once (see ingest.py)
+    attempt_key = models.CharField(max_length=32, null=True, blank=True, unique=True)
+    # Packed answers, see answer_sheets.py
+    question_ids = models.TextField(blank=True, default='')  # comma-separated, ascending
+    answer_vector = models.TextField(blank=True, default='')  # one option per question, '-' if unanswered
+    correct_bitmap = models.BinaryField(blank=True, default=b'')
 
     def __str__(self):
         return f"{self.student.username} - {self.quiz.title} - {self.score}/{self.total_questions}"
 
+    @property
+    def max_score(self):
+        return self.total_questions * self.quiz.marks_per_question
+
+    @property
+    def score_percentage(self):
+        if not self.max_score:
+            return 0
+        return round(float(self.score) / self.max_score * 100)
+
+
+class QuizAttemptDraft(models.Model):
+    """Autosaved answers for a quiz attempt that hasn't been submitted yet."""
+    key = models.CharField(max_length=32, unique=True)  # nonce from the signed attempt token
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="quiz_attempt_drafts")
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="attempt_drafts")
+    answers = models.JSONField(default=dict)  # {question_id: option}
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.student.username} - {self.quiz.title} (draft)"
+
 
 class UserAnswer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_answers')
@@ -160,7 +238,101 @@ class UserAnswer(models.Model):
         return f"{self.user.username} - {self.question.text[:20]} - {self.answer}"
 
 
-class ResearchPaper(models.Model):
+class StudentRecommendation(models.Model):
+    """Precomputed weak areas and study suggestions, rebuilt by the compute_recommendations command."""
+    student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recommendation')
+    weak_courses = models.JSONField(default=list)  # [{course_id, title, accuracy, class_accuracy}, ...]
+    recommendations = models.JSONField(default=list)  # ready-to-show strings, best first
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.student.username} - {len(self.recommendations)} recommendations"
+
+
+class ContentDownload(models.Model):
+    """One row per note or teacher content download, used as implicit feedback by the recommender."""
+    ITEM_TYPE_CHOICES = [
+        ('note', 'Note'),
+        ('content', 'Teacher Content'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='content_downloads')
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    downloaded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.item_type} {self.object_id}"
+
+
+class ChunkedUpload(models.Model):
+    """A file being uploaded in fixed-size chunks; the bytes so far live in CHUNKED_UPLOAD_DIR."""
+    upload_id = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # SHA-256 of the file's first and last MiB, computed by the browser; part of the resume key
+    fingerprint = models.CharField(max_length=64, blank=True, default='')
+    chunk_size = models.IntegerField()
+    received = models.BigIntegerField(default=0)  # bytes stored, always a whole number of chunks
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.filename} ({self.received}/{self.size})"
+
+
+class IndexedFile(models.Model):
+    """The file content last put into the search index for an object (see file_index.py)."""
+    kind = models.CharField(max_length=20)  # a key of search.KINDS
+    object_id = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField(default=0)
+    chunks = models.IntegerField(default=0)
+    chars = models.IntegerField(default=0)
+    seconds = models.FloatField(default=0)  # extraction time
+    error = models.TextField(blank=True, default='')
+    indexed_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} ({self.chunks} chunks)"
+
+
+class DocumentPreview(models.Model):
+    """First-page thumbnail and text of a file, shared by every upload with the same bytes."""
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of the file
+    thumbnail = models.ImageField(upload_to='previews/', blank=True, null=True)
+    text = models.TextField(blank=True, default='')
+    page_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest[:12]
+
+
+class FilePreview(models.Model):
+    """Maps a stored file name to its preview so listings can look previews up by name."""
+    name = models.CharField(max_length=255, unique=True)
+    preview = models.ForeignKey(DocumentPreview, on_delete=models.CASCADE, related_name='files')
+
+    def __str__(self):
+        return self.name
+
+
+class ContentRecommendation(models.Model):
+    """Top "students like you also used" items per user, rebuilt by compute_content_recommendations."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='content_recommendation')
+    items = models.JSONField(default=list)  # [{type, id, title, url, score}, ...] best first
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user.username} - {len(self.items)} items"
+
+
+class ResearchPaper(FileMetadata):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_research_papers', default=1)
     title = models.CharField(max_length=300)
     authors = models.CharField(max_length=500, help_text="Comma-separated list of authors")
@@ -175,7 +347,7 @@ class ResearchPaper(models.Model):
         return self.title
 
 
-class StudentDocument(models.Model):
+class StudentDocument(FileMetadata):
     DOCUMENT_TYPE_CHOICES = [
         ('notes', 'Notes'),
         ('assignment', 'Assignment'),
@@ -198,7 +370,7 @@ class StudentDocument(models.Model):
     def get_file_size(self):
         """Return file size in human readable format"""
         if self.file:
-            size = self.file.size
+            size = self.file_size if self.file_size is not None else self.file.size
             for unit in ['B', 'KB', 'MB', 'GB']:
                 if size < 1024.0:
                     return f"{size:.1f} {unit}"
@@ -206,7 +378,7 @@ class StudentDocument(models.Model):
         return "0 B"
 
 
-class TeacherDocument(models.Model):
+class TeacherDocument(FileMetadata):
     DOCUMENT_TYPE_CHOICES = [
         ('notes', 'Notes'),
         ('assignment', 'Assignment'),
@@ -229,7 +401,7 @@ class TeacherDocument(models.Model):
     def get_file_size(self):
         """Return file size in human readable format"""
         if self.file:
-            size = self.file.size
+            size = self.file_size if self.file_size is not None else self.file.size
             for unit in ['B', 'KB', 'MB', 'GB']:
                 if size < 1024.0:
                     return f"{size:.1f} {unit}"
@@ -258,7 +430,7 @@ class Settings(models.Model):
         return self.key
 
 
-class TeacherSubjectContent(models.Model):
+class TeacherSubjectContent(FileMetadata):
     CONTENT_TYPE_CHOICES = [
         ('notes', 'Notes'),
         ('question-bank', 'Question Bank'),
@@ -339,9 +511,44 @@ class TeacherSubjectContent(models.Model):
     file = models.FileField(upload_to='teacher_content/')
     teacher_name = models.CharField(max_length=255, blank=True, null=True)
     profile_photo = models.ImageField(upload_to='teacher_profiles/', blank=True, null=True)
+    image_variants = models.CharField(max_length=255, blank=True, default='')  # see images.py
     uploaded_at = models.DateTimeField(auto_now_add=True)
     submission_data = models.TextField(blank=True, null=True)  # For HTML content or additional submission data
     approval_status = models.CharField(max_length=20, choices=APPROVAL_CHOICES, default='pending')
+    # Set by near_duplicates.py when the file's text nearly matches earlier content
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True,
+                                     related_name='near_duplicates')
+    duplicate_similarity = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The student content page filters on these together
+            models.Index(fields=['department', 'semester', 'year', 'section', 'approval_status'],
+                         name='content_filter_idx'),
+            # Newest-first listing of approved content, paged by (uploaded_at, id)
+            models.Index(fields=['approval_status', '-uploaded_at', '-id'], name='content_listing_idx'),
+        ]
 
     def __str__(self):
         return f"{self.subject} - {self.content_type} ({self.year})"
+
+
+class ContentSignature(models.Model):
+    """MinHash signature of a content file's extracted text (see minhash.py)."""
+    content = models.OneToOneField(TeacherSubjectContent, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='signature')
+    signature = models.BinaryField()  # NUM_PERM uint32 values
+    shingles = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Signature of content {self.content_id}"
+
+
+class ContentBucket(models.Model):
+    """One LSH band key of a content signature; content sharing a key are duplicate candidates."""
+    content = models.ForeignKey(TeacherSubjectContent, on_delete=models.CASCADE, related_name='lsh_buckets')
+    bucket = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.bucket} - content {self.content_id}"
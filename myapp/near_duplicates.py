@@ -0,0 +1,145 @@
+"""
+Near-duplicate detection for teacher content.
+
+When a content file's text is indexed (file_index.py), its MinHash signature
+(minhash.py) is stored with one ContentBucket row per LSH band. Checking an
+upload is then one indexed lookup for content sharing a band key, and only
+those candidates' signatures are compared, so the cost doesn't grow with the
+corpus. A match with earlier content sets duplicate_of and
+duplicate_similarity, which the admin approval list shows.
+
+cluster_near_duplicates signs the existing corpus in parallel from the text
+already in the search index, then flags and groups it the same way.
+"""
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import transaction
+from django.db.models import Count
+
+from .minhash import document_signature, from_bytes, similarity
+from .models import ContentBucket, ContentSignature, IndexedFile, TeacherSubjectContent
+from .search import file_text
+
+SIMILARITY_THRESHOLD = 0.8
+BATCH_SIZE = 100
+
+
+def store_signature(content_id, result):
+    """Save a document_signature() result, replacing the content's old one; None just removes it."""
+    with transaction.atomic():
+        ContentBucket.objects.filter(content_id=content_id).delete()
+        if result is None:
+            ContentSignature.objects.filter(content_id=content_id).delete()
+            return
+        data, keys, shingles = result
+        ContentSignature.objects.update_or_create(content_id=content_id,
+                                                  defaults={'signature': data, 'shingles': shingles})
+        ContentBucket.objects.bulk_create([ContentBucket(content_id=content_id, bucket=key) for key in keys])
+
+
+def similar_content(content_id, result):
+    """[(content id, similarity)] best first, for other content at SIMILARITY_THRESHOLD or above."""
+    if result is None:
+        return []
+    data, keys, _ = result
+    candidates = (ContentBucket.objects.filter(bucket__in=keys).exclude(content_id=content_id)
+                  .values_list('content_id', flat=True).distinct())
+    sig = from_bytes(data)
+    matches = []
+    for other_id, other in ContentSignature.objects.filter(content_id__in=candidates).values_list('content_id', 'signature'):
+        score = similarity(sig, from_bytes(other))
+        if score >= SIMILARITY_THRESHOLD:
+            matches.append((other_id, score))
+    return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+
+def flag_duplicate(content_id, matches):
+    """Point duplicate_of at the most similar earlier upload among `matches`, or clear it."""
+    earlier = [(other_id, score) for other_id, score in matches if other_id < content_id]
+    other_id, score = max(earlier, key=lambda match: match[1]) if earlier else (None, None)
+    # update() so the content's save signals (search, facets, previews) don't run again
+    TeacherSubjectContent.objects.filter(id=content_id).update(duplicate_of=other_id, duplicate_similarity=score)
+
+
+def check_content(content_id, result):
+    """Store a new signature for content and flag it if it nearly matches earlier content."""
+    store_signature(content_id, result)
+    matches = similar_content(content_id, result)
+    flag_duplicate(content_id, matches)
+    return matches
+
+
+def sign_corpus(workers):
+    """Sign every content file with indexed text using `workers` processes. Returns how many were signed."""
+    ids = list(
+        TeacherSubjectContent.objects
+        .filter(id__in=IndexedFile.objects.filter(kind='content', error='').values('object_id'))
+        .order_by('id').values_list('id', flat=True)
+    )
+    signed = 0
+    # spawn, not fork: the caller may have threads and open connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            texts = [file_text('content', content_id) for content_id in batch]
+            results = pool.map(document_signature, texts, chunksize=max(1, len(batch) // (workers * 4)))
+            with transaction.atomic():
+                for content_id, result in zip(batch, results):
+                    store_signature(content_id, result)
+                    signed += result is not None
+    return signed
+
+
+def cluster_corpus():
+    """
+    Flag every signed content against the rest and return the groups of near
+    duplicates, each a list of content ids oldest first, largest group first.
+    """
+    # Only content sharing a bucket with something else can have a match
+    shared = ContentBucket.objects.values('bucket').annotate(n=Count('id')).filter(n__gt=1).values('bucket')
+    members = defaultdict(set)
+    for bucket, content_id in ContentBucket.objects.filter(bucket__in=shared).values_list('bucket', 'content_id'):
+        members[bucket].add(content_id)
+    candidates = set().union(*members.values())
+    signatures = {
+        content_id: from_bytes(data)
+        for content_id, data in ContentSignature.objects.filter(content_id__in=candidates).values_list('content_id', 'signature')
+    }
+
+    matches = defaultdict(list)
+    compared = set()
+    for group in members.values():
+        group = sorted(group)
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                score = similarity(signatures[a], signatures[b])
+                if score >= SIMILARITY_THRESHOLD:
+                    matches[a].append((b, score))
+                    matches[b].append((a, score))
+
+    TeacherSubjectContent.objects.filter(duplicate_of__isnull=False).exclude(id__in=list(matches)).update(
+        duplicate_of=None, duplicate_similarity=None)
+    for content_id, found in matches.items():
+        flag_duplicate(content_id, found)
+
+    # Union-find over the matching pairs
+    parent = {content_id: content_id for content_id in matches}
+
+    def root(content_id):
+        while parent[content_id] != content_id:
+            parent[content_id] = parent[parent[content_id]]
+            content_id = parent[content_id]
+        return content_id
+
+    for a, found in matches.items():
+        for b, _ in found:
+            parent[root(a)] = root(b)
+    clusters = defaultdict(list)
+    for content_id in sorted(matches):
+        clusters[root(content_id)].append(content_id)
+    return sorted(clusters.values(), key=lambda cluster: (-len(cluster), cluster[0]))
@@ -0,0 +1,42 @@
+"""
+Keyset ("seek") pagination on (uploaded_at, id), newest first.
+
+A page is fetched with WHERE (uploaded_at, id) < cursor ORDER BY uploaded_at
+DESC, id DESC LIMIT n, so every page costs the same however deep the user
+scrolls, unlike OFFSET. The cursor is the last row's position, as
+"<microseconds since epoch>.<id>".
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+PAGE_SIZE = 24
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(obj):
+    return f'{(obj.uploaded_at - EPOCH) // MICROSECOND}.{obj.id}'
+
+
+def decode_cursor(cursor):
+    """(uploaded_at, id) from a cursor, or None if it's missing or malformed."""
+    try:
+        micros, object_id = cursor.split('.')
+        return EPOCH + int(micros) * MICROSECOND, int(object_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """(rows, next cursor or None) for the page after `cursor`."""
+    queryset = queryset.order_by('-uploaded_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        uploaded_at, object_id = position
+        queryset = queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=object_id))
+    # One extra row tells whether there's another page without a COUNT
+    rows = list(queryset[:size + 1])
+    if len(rows) > size:
+        return rows[:size], encode_cursor(rows[size - 1])
+    return rows, None
@@ -0,0 +1,127 @@
+"""
+Disk cache for note PDFs.
+
+A rendered PDF is stored as <note id>-<hash>.pdf, where the hash covers the
+topic, the HTML and TEMPLATE_VERSION. An unchanged note is therefore served
+straight from disk, and any edit produces a new file (the old one is removed).
+The hash doubles as the ETag.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from weasyprint import HTML
+
+from .background import BackgroundWorker
+from .models import Note
+
+# Bump when note_html() changes so existing renders are not reused
+TEMPLATE_VERSION = '1'
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def note_html(note):
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>{note.topic}</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; margin: 20px; }}
+            h1 {{ color: #333; }}
+            p {{ line-height: 1.6; }}
+        </style>
+    </head>
+    <body>
+        <h1>{note.topic}</h1>
+        {note.content_html}
+    </body>
+    </html>
+    """
+
+
+def note_pdf_key(note):
+    digest = hashlib.sha256()
+    for part in (TEMPLATE_VERSION, note.topic, note.content_html):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _path(note_id, key):
+    return os.path.join(settings.NOTE_PDF_CACHE_DIR, f'{note_id}-{key}.pdf')
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def get_note_pdf(note):
+    """
+    (path, key) of the note's rendered PDF, rendering it if needed.
+
+    Concurrent callers for the same uncached note wait on one render instead
+    of each running WeasyPrint. Across processes, the atomic rename means a
+    duplicate render at worst, never a partial file.
+    """
+    key = note_pdf_key(note)
+    path = _path(note.id, key)
+    if os.path.exists(path):
+        return path, key
+
+    lock = _lock_for(path)
+    try:
+        with lock:
+            if not os.path.exists(path):
+                os.makedirs(settings.NOTE_PDF_CACHE_DIR, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=settings.NOTE_PDF_CACHE_DIR, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        HTML(string=note_html(note)).write_pdf(out)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                _remove_stale(note.id, path)
+    finally:
+        with _locks_guard:
+            _locks.pop(path, None)
+    return path, key
+
+
+def open_note_pdf(note):
+    """
+    (open file, key) for the note's rendered PDF. Once open, the file stays
+    readable even if a render of a newer version removes it.
+    """
+    path, key = get_note_pdf(note)
+    try:
+        return open(path, 'rb'), key
+    except FileNotFoundError:
+        # Removed as stale between the render and the open; render this version again
+        path, key = get_note_pdf(note)
+        return open(path, 'rb'), key
+
+
+def _remove_stale(note_id, current):
+    for old in glob.glob(os.path.join(settings.NOTE_PDF_CACHE_DIR, f'{note_id}-*.pdf')):
+        if old != current:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+
+
+def prerender_note(note_id):
+    note = Note.objects.filter(id=note_id).only('id', 'topic', 'content_html').first()
+    if note is not None and note.content_html:
+        get_note_pdf(note)
+
+
+pdf_renderer = BackgroundWorker('note-pdf-prerender', prerender_note)
@@ -0,0 +1,219 @@
+"""
+Plagiarism screening of assignment submissions.
+
+Each submission's file is fingerprinted (winnowing.py) in a long-lived pool
+of worker processes, or inline when only a couple of files are new, and the
+fingerprints are kept with the file's hash so a later run only processes new
+or replaced files. Pairs are found through an inverted
+index from fingerprint to the submissions containing it, so only submissions
+that share text are ever compared, not every pair in the class.
+Fingerprints also found in the assignment's own file (the questions students
+copy, taken from the search index's text) or in more than a quarter of the
+class are left out.
+
+New submissions queue a check of their assignment on plagiarism_checker;
+check_plagiarism runs it from the command line. The report is shown to the
+teacher on assignment_detail.
+"""
+import logging
+import multiprocessing
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import winnowing
+from .background import BackgroundWorker
+from .extraction import local_copy
+from .models import Assignment, SimilarityPair, Submission, SubmissionFingerprint
+from .search import file_text
+
+logger = logging.getLogger(__name__)
+
+MIN_SHARED = 5
+MIN_SIMILARITY = 0.2
+# A fingerprint in more than this share of the class (but at least COMMON_MIN submissions) is common phrasing
+COMMON_FRACTION = 0.25
+COMMON_MIN = 10
+REPORT_SIZE = 50
+# Up to this many files are fingerprinted on the calling thread rather than in the pool
+INLINE_FILES = 2
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers):
+    """A process pool with `workers` processes, started on first use and kept for later checks."""
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: this runs on a background thread of the web process
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pools[workers]
+
+
+def _discard_pool(workers):
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _fingerprint_inline(items):
+    results = {}
+    for key, field_file in items:
+        try:
+            with local_copy(field_file) as path:
+                results[key] = (winnowing.fingerprint_file(path), '')
+        except Exception as e:
+            logger.warning('Fingerprinting failed for %s: %s', key, e)
+            results[key] = (b'', str(e) or type(e).__name__)
+    return results
+
+
+def _fingerprint_files(items, workers):
+    """
+    {key: (fingerprint bytes, error)} for (key, field file) items, using
+    `workers` processes. Keys missing from the result were lost with a dead
+    worker and should be retried.
+    """
+    if len(items) <= INLINE_FILES:
+        # Usually a single new submission: not worth handing to another process
+        return _fingerprint_inline(items)
+    results = {}
+    batch_size = workers * 4
+    for start in range(0, len(items), batch_size):
+        pool = _pool(workers)
+        # Batches bound how many local copies of remote files exist at once
+        with ExitStack() as stack:
+            futures = []
+            for key, field_file in items[start:start + batch_size]:
+                try:
+                    path = stack.enter_context(local_copy(field_file))
+                except OSError as e:
+                    results[key] = (b'', str(e) or type(e).__name__)
+                    continue
+                futures.append((key, pool.submit(winnowing.fingerprint_file, path)))
+            for key, future in futures:
+                try:
+                    results[key] = (future.result(), '')
+                except BrokenProcessPool:
+                    # Every job in the batch fails with the worker; the next check retries them
+                    logger.warning('Fingerprinting worker died while processing %s', key)
+                    _discard_pool(workers)
+                except Exception as e:
+                    logger.warning('Fingerprinting failed for %s: %s', key, e)
+                    results[key] = (b'', str(e) or type(e).__name__)
+    return results
+
+
+def _update_fingerprints(assignment, workers):
+    """{submission id: fingerprints} for the assignment, fingerprinting new or changed files first."""
+    submissions = list(Submission.objects.filter(assignment=assignment).exclude(file='').exclude(file__isnull=True)
+                       .only('id', 'file', 'file_sha256'))
+    stored = {
+        submission_id: (sha256, data)
+        for submission_id, sha256, data in SubmissionFingerprint.objects.filter(submission__assignment=assignment)
+        .values_list('submission_id', 'sha256', 'fingerprints')
+    }
+    # Without a recorded hash (not backfilled yet) only unseen submissions are redone
+    stale = [s for s in submissions
+             if s.id not in stored or (s.file_sha256 and stored[s.id][0] != s.file_sha256)]
+    if stale:
+        results = _fingerprint_files([(s.id, s.file) for s in stale], workers)
+        for submission in stale:
+            if submission.id not in results:
+                continue
+            data, error = results[submission.id]
+            SubmissionFingerprint.objects.update_or_create(
+                submission=submission,
+                defaults={'sha256': submission.file_sha256, 'fingerprints': data, 'error': error},
+            )
+            stored[submission.id] = (submission.file_sha256, data)
+    return {s.id: winnowing.from_bytes(stored[s.id][1]) for s in submissions if s.id in stored}
+
+
+def find_similar_pairs(fingerprints, ignore=None):
+    """
+    [(first id, second id, shared, similarity)] best first, for submissions
+    ({id: fingerprints}) sharing at least MIN_SHARED fingerprints and
+    MIN_SIMILARITY of the shorter one's.
+    """
+    if ignore is not None and len(ignore):
+        fingerprints = {key: np.setdiff1d(values, ignore, assume_unique=True) for key, values in fingerprints.items()}
+    fingerprints = {key: values for key, values in fingerprints.items() if len(values)}
+    common = max(COMMON_MIN, int(len(fingerprints) * COMMON_FRACTION))
+
+    index = defaultdict(list)
+    for key in sorted(fingerprints):
+        for value in fingerprints[key].tolist():
+            index[value].append(key)
+    shared = Counter()
+    for keys in index.values():
+        if 1 < len(keys) <= common:
+            shared.update(combinations(keys, 2))
+
+    pairs = []
+    for (first, second), count in shared.items():
+        similarity = count / min(len(fingerprints[first]), len(fingerprints[second]))
+        if count >= MIN_SHARED and similarity >= MIN_SIMILARITY:
+            pairs.append((first, second, count, similarity))
+    return sorted(pairs, key=lambda pair: (-pair[3], -pair[2], pair[0], pair[1]))
+
+
+def check_assignment(assignment_id, workers=None):
+    """Screen an assignment's submissions and replace its report. Returns the number of pairs found."""
+    assignment = Assignment.objects.filter(id=assignment_id).first()
+    if assignment is None:
+        return 0
+    workers = workers or settings.PLAGIARISM_WORKERS
+    fingerprints = _update_fingerprints(assignment, workers)
+    # The assignment file's text is already extracted for search
+    questions = winnowing.fingerprints(file_text('assignment', assignment.id))
+    pairs = find_similar_pairs(fingerprints, ignore=questions)
+    with transaction.atomic():
+        SimilarityPair.objects.filter(assignment=assignment).delete()
+        SimilarityPair.objects.bulk_create([
+            SimilarityPair(assignment=assignment, first_id=first, second_id=second, shared=count, similarity=similarity)
+            for first, second, count, similarity in pairs
+        ])
+        Assignment.objects.filter(id=assignment.id).update(similarity_checked_at=timezone.now())
+    return len(pairs)
+
+
+def similarity_report(assignment, limit=REPORT_SIZE):
+    """The most similar pairs from the assignment's last screening."""
+    return (SimilarityPair.objects.filter(assignment=assignment)
+            .select_related('first__student', 'second__student')
+            .order_by('-similarity', '-shared')[:limit])
+
+
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def _run_check(assignment_id):
+    with _queued_lock:
+        # Submissions arriving from here on queue another run
+        _queued.discard(assignment_id)
+    check_assignment(assignment_id)
+
+
+plagiarism_checker = BackgroundWorker('plagiarism-check', _run_check)
+
+
+def schedule_check(assignment_id):
+    """Queue a screening of the assignment unless one is already waiting to start."""
+    with _queued_lock:
+        if assignment_id in _queued:
+            return
+        _queued.add(assignment_id)
+    plagiarism_checker.enqueue(assignment_id)
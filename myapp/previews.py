@@ -0,0 +1,109 @@
+"""
+First-page previews for uploaded documents.
+
+A preview (thumbnail + a few lines of text) is generated once per distinct
+file content and shared through FilePreview by every upload with the same
+bytes. Generation runs on a background worker after the upload commits.
+"""
+import io
+import os
+
+import fitz  # PyMuPDF
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from docx import Document
+from PIL import Image
+
+from .background import BackgroundWorker
+from .extraction import local_copy
+from .models import (Assignment, DocumentPreview, FilePreview, Note, ResearchPaper, StudentDocument,
+                     TeacherDocument, TeacherSubjectContent)
+from .storage import file_digest
+
+# Models whose `file` gets a preview
+PREVIEW_MODELS = (Note, Assignment, TeacherSubjectContent, StudentDocument, TeacherDocument, ResearchPaper)
+# Formats PyMuPDF can render
+RENDERABLE_EXTENSIONS = ('.pdf', '.xps', '.epub', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp')
+THUMBNAIL_WIDTH = 320
+PREVIEW_CHARS = 400
+
+
+def _shorten(text):
+    text = ' '.join(text.split())
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS].rsplit(' ', 1)[0] + '…'
+
+
+def _render(path):
+    """(webp bytes or None, text, page count) for the first page of a document."""
+    with fitz.open(path) as doc:
+        if not doc.page_count:
+            return None, '', 0
+        page = doc.load_page(0)
+        zoom = THUMBNAIL_WIDTH / page.rect.width if page.rect.width else 1
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        out = io.BytesIO()
+        image.save(out, 'WEBP', quality=70)
+        text = page.get_text('text') if doc.is_pdf else ''
+        return out.getvalue(), _shorten(text), doc.page_count
+
+
+def _docx_text(path):
+    parts = []
+    length = 0
+    for para in Document(path).paragraphs:
+        if para.text.strip():
+            parts.append(para.text)
+            length += len(para.text)
+            if length > PREVIEW_CHARS:
+                break
+    return _shorten(' '.join(parts))
+
+
+def generate_preview(name, field_file):
+    """Create (or reuse) the preview for a stored file and link it to `name`."""
+    with local_copy(field_file) as path:
+        digest = file_digest(path)
+        preview = DocumentPreview.objects.filter(digest=digest).first()
+        if preview is None:
+            ext = os.path.splitext(name)[1].lower()
+            thumbnail, text, pages = None, '', 0
+            if ext in RENDERABLE_EXTENSIONS:
+                thumbnail, text, pages = _render(path)
+            elif ext == '.docx':
+                text = _docx_text(path)
+            preview = DocumentPreview(digest=digest, text=text, page_count=pages)
+            if thumbnail:
+                preview.thumbnail.save(f'{digest}.webp', ContentFile(thumbnail), save=False)
+            try:
+                with transaction.atomic():
+                    preview.save()
+            except IntegrityError:
+                # Generated meanwhile by another process for the same bytes
+                preview = DocumentPreview.objects.get(digest=digest)
+    FilePreview.objects.update_or_create(name=name, defaults={'preview': preview})
+    return preview
+
+
+def preview_file(model_label, pk):
+    model = next(m for m in PREVIEW_MODELS if m._meta.label == model_label)
+    instance = model.objects.filter(pk=pk).only('id', 'file').first()
+    if instance is None or not instance.file or FilePreview.objects.filter(name=instance.file.name).exists():
+        return
+    generate_preview(instance.file.name, instance.file)
+
+
+preview_worker = BackgroundWorker('document-previews', preview_file)
+
+
+def attach_previews(objects):
+    """Set `.preview` on each object (None if not generated yet) with one query. Returns a list."""
+    objects = list(objects)
+    names = [obj.file.name for obj in objects if obj.file]
+    previews = {
+        link.name: link.preview
+        for link in FilePreview.objects.filter(name__in=names).select_related('preview')
+    }
+    for obj in objects:
+        obj.preview = previews.get(obj.file.name) if obj.file else None
+    return objects
@@ -0,0 +1,177 @@
+import codecs
+import csv
+import io
+import json
+import zipfile
+
+from django.db import transaction
+from django.db.models import F
+
+from .grading import invalidate_answer_key
+from .models import Question, Quiz
+
+OPTIONS = ('A', 'B', 'C', 'D')
+BULK_BATCH_SIZE = 500
+# Stop collecting errors after this many so a broken file doesn't flood the page
+MAX_REPORTED_ERRORS = 50
+OPTION_MAX_LENGTH = Question._meta.get_field('option_a').max_length
+# Tried in order; Excel on Windows saves plain "CSV" as cp1252
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+class QuestionImportError(Exception):
+    """The uploaded file can't be read at all (wrong format, missing dependency)."""
+
+
+def iter_json_rows(data):
+    """Rows from the add_quiz JSON format: [{text, options: {A..D}, correct}, ...]."""
+    if isinstance(data, (bytes, str)):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise QuestionImportError(f'Invalid JSON: {e}')
+    if isinstance(data, dict):
+        data = data.get('questions', [])
+    if not isinstance(data, list):
+        raise QuestionImportError('JSON must be a list of questions.')
+    for entry in data:
+        if not isinstance(entry, dict):
+            yield {}
+            continue
+        options = entry.get('options') or {}
+        yield {
+            'text': entry.get('text'),
+            'option_a': options.get('A', entry.get('option_a')),
+            'option_b': options.get('B', entry.get('option_b')),
+            'option_c': options.get('C', entry.get('option_c')),
+            'option_d': options.get('D', entry.get('option_d')),
+            'correct': entry.get('correct', entry.get('correct_answer')),
+        }
+
+
+def _normalise_header(header):
+    header = (header or '').strip().lower().replace(' ', '_')
+    aliases = {
+        'question': 'text', 'a': 'option_a', 'b': 'option_b', 'c': 'option_c', 'd': 'option_d',
+        'answer': 'correct', 'correct_answer': 'correct',
+    }
+    return aliases.get(header, header)
+
+
+def _csv_encoding(uploaded_file):
+    """The first of CSV_ENCODINGS the whole file decodes as, checked a chunk at a time."""
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            for chunk in uploaded_file.chunks():
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    raise QuestionImportError('The CSV file is not readable text. Save it as "CSV UTF-8" and upload it again.')
+
+
+def iter_csv_rows(uploaded_file):
+    encoding = _csv_encoding(uploaded_file)
+    # Decode line by line so a large bank is never held in memory as one string
+    uploaded_file.seek(0)
+    text = io.TextIOWrapper(uploaded_file.file, encoding=encoding, newline='')
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [_normalise_header(h) for h in header]
+        for values in reader:
+            yield dict(zip(columns, values))
+    except csv.Error as e:
+        raise QuestionImportError(f'The CSV file could not be read: {e}')
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(uploaded_file):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise QuestionImportError('XLSX import needs the openpyxl package; upload a CSV or JSON file instead.')
+    # read_only mode streams rows instead of loading the whole sheet
+    try:
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # KeyError: a ZIP archive that is missing the workbook's parts
+        raise QuestionImportError('The file is not a valid Excel workbook. Save it as .xlsx and upload it again.')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_normalise_header(str(h) if h is not None else '') for h in header]
+        for values in rows:
+            yield dict(zip(columns, ('' if v is None else str(v) for v in values)))
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(uploaded_file):
+    name = uploaded_file.name.lower()
+    if name.endswith('.json'):
+        return iter_json_rows(uploaded_file.read())
+    if name.endswith('.csv'):
+        return iter_csv_rows(uploaded_file)
+    if name.endswith('.xlsx'):
+        return iter_xlsx_rows(uploaded_file)
+    raise QuestionImportError('Unsupported file type. Upload a .json, .csv or .xlsx file.')
+
+
+def validate_row(row):
+    """Return (Question, errors) for one row; the Question is unsaved and has no quiz yet."""
+    errors = []
+    values = {}
+    for field in ('text', 'option_a', 'option_b', 'option_c', 'option_d'):
+        value = str(row.get(field) or '').strip()
+        if not value:
+            errors.append(f'{field} is required')
+        elif field != 'text' and len(value) > OPTION_MAX_LENGTH:
+            errors.append(f'{field} is longer than {OPTION_MAX_LENGTH} characters')
+        values[field] = value
+    correct = str(row.get('correct') or '').strip().upper()
+    if correct not in OPTIONS:
+        errors.append('correct must be one of A, B, C or D')
+    if errors:
+        return None, errors
+    return Question(correct_answer=correct, **values), []
+
+
+def validate_rows(rows):
+    """
+    Validate rows in a single streaming pass.
+
+    Returns (questions, errors) where errors is a list of (row_number, message).
+    Row numbers are 1-based data rows, not counting a header.
+    """
+    questions = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        question, row_errors = validate_row(row)
+        if row_errors:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((row_number, '; '.join(row_errors)))
+        else:
+            questions.append(question)
+    return questions, errors
+
+
+def save_questions(quiz, questions):
+    """Insert validated questions in one transaction and bump Quiz.total_questions atomically."""
+    for question in questions:
+        question.quiz = quiz
+    with transaction.atomic():
+        Question.objects.bulk_create(questions, batch_size=BULK_BATCH_SIZE)
+        Quiz.objects.filter(pk=quiz.pk).update(total_questions=F('total_questions') + len(questions))
+    # bulk_create skips post_save, so the answer key cache has to be dropped here
+    invalidate_answer_key(quiz.pk)
+    quiz.refresh_from_db(fields=['total_questions'])
+    return len(questions)
@@ -0,0 +1,246 @@
+"""
+Full-text search over notes, teacher content, assignments and research papers.
+
+Metadata lives in the SQLite FTS5 table search_index (migration 0051), with
+the title and HTML-stripped body indexed and the facet columns stored
+alongside. Each row's rowid is derived from (kind, object id), so keeping it
+in sync on save/delete is a single-row replace by primary key.
+
+Text extracted from the uploaded files (file_index.py) goes to a second
+table, search_file_chunks, a couple of thousand characters per row, with
+rowid = document rowid * MAX_FILE_CHUNKS + chunk number. A search matches
+either table and ranks each document by its best hit.
+
+Teacher content only has a search_index row while it is approved, and
+every query joins through search_index, so pending or rejected content (and
+the text of its file) never shows up in results. Its file chunks are kept
+for near-duplicate checks during approval (near_duplicates.py).
+
+rebuild_search_index fills search_index for rows saved before it existed;
+index_file_text does the same for file contents.
+"""
+import html
+import re
+
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape, strip_tags
+
+from .models import Assignment, Note, ResearchPaper, TeacherSubjectContent
+
+# kind -> model; the position is part of the rowid, so only append
+KINDS = {
+    'note': Note,
+    'content': TeacherSubjectContent,
+    'assignment': Assignment,
+    'paper': ResearchPaper,
+}
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+FACETS = ('kind', 'department', 'year', 'semester')
+PAGE_SIZE = 20
+# Control characters can't occur in stripped text, so they mark snippet hits safely
+HIT_START, HIT_END = '\x02', '\x03'
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_FILE_CHUNKS = 1000
+# File text is long and loosely related to the item, so its hits rank below metadata hits
+FILE_WEIGHT = 0.5
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KIND_CODES[kind]
+
+
+def _text(value):
+    return ' '.join(html.unescape(strip_tags(value or '')).split())
+
+
+def _document(kind, obj):
+    """(title, body, department, year, semester) to index for an object."""
+    if kind == 'note':
+        body = f'{_text(obj.description)} {_text(obj.content_html)}'.strip()
+        return obj.topic, body, obj.department, obj.year, obj.semester
+    if kind == 'content':
+        title = f'{obj.subject} - {obj.get_content_type_display()}'
+        return title, _text(obj.description), obj.department, obj.year, obj.semester
+    if kind == 'assignment':
+        return obj.topic, _text(obj.description), obj.department, obj.year, obj.semester
+    return obj.title, f'{obj.authors} {_text(obj.abstract)}', None, None, None
+
+
+def _kind_of(model):
+    return next(kind for kind, m in KINDS.items() if m is model)
+
+
+def is_searchable(kind, obj):
+    # Students may only find teacher content once it's approved
+    return kind != 'content' or obj.approval_status == 'approved'
+
+
+def index_object(instance):
+    """Add or refresh an object's row; one that isn't searchable (any more) is removed. Returns whether it's indexed."""
+    kind = _kind_of(type(instance))
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index WHERE rowid = %s', [_rowid(kind, instance.pk)])
+    if not is_searchable(kind, instance):
+        return False
+    title, body, department, year, semester = _document(kind, instance)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO search_index (rowid, title, body, kind, object_id, department, year, semester) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+            [_rowid(kind, instance.pk), title, body, kind, instance.pk,
+             department or '', str(year or ''), semester or ''],
+        )
+    return True
+
+
+def remove_object(instance):
+    rowid = _rowid(_kind_of(type(instance)), instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index WHERE rowid = %s', [rowid])
+        cursor.execute('DELETE FROM search_file_chunks WHERE rowid BETWEEN %s AND %s',
+                       [rowid * MAX_FILE_CHUNKS, (rowid + 1) * MAX_FILE_CHUNKS - 1])
+
+
+def replace_file_chunks(kind, object_id, chunks):
+    """Swap the indexed file text for an object. Extra chunks past MAX_FILE_CHUNKS are dropped."""
+    first = _rowid(kind, object_id) * MAX_FILE_CHUNKS
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_file_chunks WHERE rowid BETWEEN %s AND %s',
+                       [first, first + MAX_FILE_CHUNKS - 1])
+        cursor.executemany(
+            'INSERT INTO search_file_chunks (rowid, body) VALUES (%s, %s)',
+            [(first + number, chunk) for number, chunk in enumerate(chunks[:MAX_FILE_CHUNKS])],
+        )
+
+
+def file_text(kind, object_id):
+    """The indexed text of an object's file, '' if there is none."""
+    first = _rowid(kind, object_id) * MAX_FILE_CHUNKS
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT body FROM search_file_chunks WHERE rowid BETWEEN %s AND %s ORDER BY rowid',
+                       [first, first + MAX_FILE_CHUNKS - 1])
+        return ' '.join(body for body, in cursor.fetchall())
+
+
+def rebuild():
+    """Re-index everything. Returns the number of rows indexed."""
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index')
+    for model in KINDS.values():
+        for instance in model.objects.iterator(chunk_size=500):
+            count += index_object(instance)
+    with connection.cursor() as cursor:
+        # Merge the b-tree segments left by row-at-a-time inserts
+        cursor.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+    return count
+
+
+def match_expression(query):
+    """
+    FTS5 query for free text: every word must match, the last one as a prefix
+    so results appear while typing. Words are quoted, so FTS5 operators and
+    punctuation in the input are taken literally. None if there are no words.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _snippet(text):
+    return escape(text).replace(HIT_START, '<mark>').replace(HIT_END, '</mark>')
+
+
+def _url(kind, object_id):
+    if kind == 'note':
+        return reverse('download_note_html_as_pdf', args=[object_id])
+    if kind == 'content':
+        return reverse('download_teacher_content', args=[object_id])
+    if kind == 'assignment':
+        return reverse('assignment_detail', args=[object_id])
+    return reverse('research_paper')
+
+
+def search(query, filters=None, page=1):
+    """
+    Ranked results for `query` with facet counts.
+
+    `filters` maps facet names (kind, department, year, semester) to a value.
+    Returns {'results', 'total', 'page', 'pages', 'facets'}; results carry
+    kind, id, title, snippet (safe HTML), url.
+    """
+    expression = match_expression(query)
+    empty = {'results': [], 'total': 0, 'page': 1, 'pages': 0, 'facets': {facet: [] for facet in FACETS}}
+    if expression is None:
+        return empty
+
+    filters = {facet: str(value) for facet, value in (filters or {}).items() if facet in FACETS and value}
+    filter_sql = ''.join(f' AND s.{facet} = %s' for facet in filters)
+
+    with connection.cursor() as cursor:
+        # One pass over the matching documents gives both the facet counts (for
+        # the query alone, so each filter shows its alternatives) and the filtered total
+        cursor.execute(
+            f'WITH docs AS ('
+            f'  SELECT rowid AS doc FROM search_index WHERE search_index MATCH %s'
+            f'  UNION SELECT rowid / {MAX_FILE_CHUNKS} FROM search_file_chunks WHERE search_file_chunks MATCH %s'
+            f') '
+            f'SELECT {", ".join("s." + facet for facet in FACETS)}, count(*) '
+            f'FROM docs JOIN search_index s ON s.rowid = docs.doc '
+            f'GROUP BY {", ".join("s." + facet for facet in FACETS)}',
+            [expression, expression],
+        )
+        counts = {facet: {} for facet in FACETS}
+        total = 0
+        for *values, count in cursor.fetchall():
+            row = dict(zip(FACETS, values))
+            for facet, value in row.items():
+                if value != '':
+                    counts[facet][value] = counts[facet].get(value, 0) + count
+            if all(row[facet] == value for facet, value in filters.items()):
+                total += count
+        facets = {facet: sorted(values.items(), key=lambda item: -item[1]) for facet, values in counts.items()}
+
+        pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        page = min(max(page, 1), max(pages, 1))
+        results = []
+        if total:
+            # bm25 is negative, lower is better. Metadata weights follow column
+            # order: title counts ten times as much as body. SQLite returns
+            # `hit` from the row that gave min(score), i.e. the best match.
+            cursor.execute(
+                f'WITH hits AS ('
+                f'  SELECT rowid AS doc, bm25(search_index, 10.0, 1.0) AS score, NULL AS hit'
+                f'  FROM search_index WHERE search_index MATCH %s'
+                f'  UNION ALL SELECT rowid / {MAX_FILE_CHUNKS}, bm25(search_file_chunks) * {FILE_WEIGHT}, rowid'
+                f'  FROM search_file_chunks WHERE search_file_chunks MATCH %s'
+                f'), best AS (SELECT doc, min(score) AS score, hit FROM hits GROUP BY doc) '
+                f'SELECT s.rowid, s.kind, s.object_id, s.title, best.hit '
+                f'FROM best JOIN search_index s ON s.rowid = best.doc WHERE 1{filter_sql} '
+                f'ORDER BY best.score LIMIT %s OFFSET %s',
+                [expression, expression, *filters.values(), PAGE_SIZE, (page - 1) * PAGE_SIZE],
+            )
+            page_rows = cursor.fetchall()
+            # Snippets only for the page being shown
+            for rowid, kind, object_id, title, hit in page_rows:
+                if hit is None:
+                    cursor.execute(
+                        "SELECT snippet(search_index, 1, %s, %s, '…', 24) FROM search_index "
+                        'WHERE search_index MATCH %s AND rowid = %s',
+                        [HIT_START, HIT_END, expression, rowid],
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT snippet(search_file_chunks, 0, %s, %s, '…', 24) FROM search_file_chunks "
+                        'WHERE search_file_chunks MATCH %s AND rowid = %s',
+                        [HIT_START, HIT_END, expression, hit],
+                    )
+                snippet = cursor.fetchone()[0]
+                results.append({'kind': kind, 'id': object_id, 'title': title, 'snippet': _snippet(snippet),
+                                'url': _url(kind, object_id), 'in_file': hit is not None})
+
+    return {'results': results, 'total': total, 'page': page, 'pages': pages, 'facets': facets}
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import SOURCES, add_value, value_changed
+from .file_index import file_indexer
+from .facets import invalidate_facets
+from .file_metadata import FILE_MODELS, capture_metadata, page_counter
+from .grading import invalidate_answer_key
+from .images import IMAGE_FIELDS, image_worker
+from .models import Note, Question, Submission, TeacherSubjectContent
+from .plagiarism import schedule_check
+from .previews import PREVIEW_MODELS, preview_worker
+from .search import KINDS, index_object, remove_object
+from .pdf_cache import pdf_renderer
+
+
+@receiver(pre_save, sender=Question)
+def question_saving(sender, instance, **kwargs):
+    # Remember the quiz a question is moved away from; its key changes too
+    instance._previous_quiz_id = (
+        Question.objects.filter(pk=instance.pk).values_list('quiz_id', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    # Mark the answer key stale so the next submission re-reads it
+    invalidate_answer_key(instance.quiz_id)
+    previous = getattr(instance, '_previous_quiz_id', None)
+    if previous not in (None, instance.quiz_id):
+        invalidate_answer_key(previous)
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, **kwargs):
+    # Re-screen the assignment; a run already waiting picks this submission up too
+    if instance.file:
+        transaction.on_commit(lambda: schedule_check(instance.assignment_id))
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, **kwargs):
+    # Have the PDF ready before the first download
+    if settings.NOTE_PDF_PRERENDER and instance.content_html:
+        transaction.on_commit(lambda: pdf_renderer.enqueue(instance.id))
+
+
+def document_saved(sender, instance, **kwargs):
+    # Thumbnail and text preview for listings, generated off the request
+    if instance.file:
+        transaction.on_commit(lambda: preview_worker.enqueue(sender._meta.label, instance.pk))
+
+
+for model in PREVIEW_MODELS:
+    post_save.connect(document_saved, sender=model, dispatch_uid=f'document_preview_{model._meta.label}')
+
+
+def image_saved(sender, instance, **kwargs):
+    # Resized variants for srcset, made off the request
+    for model, field in IMAGE_FIELDS:
+        if sender is model:
+            image = getattr(instance, field)
+            if image:
+                transaction.on_commit(lambda name=image.name: image_worker.enqueue(name))
+
+
+for model, field in IMAGE_FIELDS:
+    post_save.connect(image_saved, sender=model, dispatch_uid=f'image_variants_{model._meta.label}')
+
+
+def file_saving(sender, instance, update_fields=None, **kwargs):
+    # Record size/type/hash now so listings and quotas never touch storage
+    if update_fields is None or 'file' in update_fields:
+        capture_metadata(instance)
+
+
+def file_saved(sender, instance, **kwargs):
+    # A PDF uploaded in memory is opened from storage once it's there
+    if getattr(instance, '_count_pages_later', False):
+        instance._count_pages_later = False
+        transaction.on_commit(lambda: page_counter.enqueue(sender._meta.label, instance.pk))
+
+
+for model in FILE_MODELS:
+    pre_save.connect(file_saving, sender=model, dispatch_uid=f'file_metadata_{model._meta.label}')
+    post_save.connect(file_saved, sender=model, dispatch_uid=f'file_pages_{model._meta.label}')
+
+
+def searchable_saved(sender, instance, **kwargs):
+    # Written in the same transaction as the row, so it commits or rolls back with it
+    index_object(instance)
+    if instance.file:
+        # The file's own text is extracted in the background; unchanged files are skipped there
+        kind = next(kind for kind, model in KINDS.items() if model is sender)
+        transaction.on_commit(lambda: file_indexer.enqueue(kind, instance.pk))
+
+
+def searchable_deleted(sender, instance, **kwargs):
+    remove_object(instance)
+
+
+for model in KINDS.values():
+    post_save.connect(searchable_saved, sender=model, dispatch_uid=f'search_index_{model._meta.label}')
+    post_delete.connect(searchable_deleted, sender=model, dispatch_uid=f'search_unindex_{model._meta.label}')
+
+
+def autocomplete_source_saved(sender, instance, created, update_fields=None, **kwargs):
+    # New names show up in this process's autocomplete at once; others pick them up on refresh
+    if created:
+        add_value(instance)
+        return
+    column = next(column for model, column, split in SOURCES.values() if model is sender)
+    if update_fields is None or column in update_fields:
+        # An edit may have renamed a value, which only a rebuild can take out
+        value_changed(instance)
+
+
+def autocomplete_source_deleted(sender, instance, **kwargs):
+    value_changed(instance)
+
+
+for model, column, split in SOURCES.values():
+    post_save.connect(autocomplete_source_saved, sender=model, dispatch_uid=f'autocomplete_{model._meta.label}')
+    post_delete.connect(autocomplete_source_deleted, sender=model, dispatch_uid=f'autocomplete_{model._meta.label}')
+
+
+@receiver(post_save, sender=TeacherSubjectContent)
+@receiver(post_delete, sender=TeacherSubjectContent)
+def content_changed(sender, instance, **kwargs):
+    # Uploads, edits and approvals all change the filter counts
+    invalidate_facets()
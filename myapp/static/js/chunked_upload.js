@@ -0,0 +1,129 @@
+// Resumable chunked uploads for forms marked with
+// data-chunked-upload="{% url 'chunked_upload_init' %}".
+//
+// Large files are sent in chunks to that URL before the form is submitted;
+// the form then posts upload_id instead of the file. If the connection
+// drops, submitting the same file again resumes from the last stored chunk.
+(function () {
+    var THRESHOLD = 8 * 1024 * 1024;  // smaller files go through the normal form post
+    var SAMPLE = 1024 * 1024;  // bytes from each end of the file hashed into its fingerprint
+    var RETRIES = 3;
+
+    function csrfToken(form) {
+        var input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function toHex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function (b) {
+            return ('0' + b.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function checksum(blob) {
+        // crypto.subtle is only available on HTTPS and localhost
+        if (!window.crypto || !window.crypto.subtle) {
+            return Promise.resolve(null);
+        }
+        return blob.arrayBuffer()
+            .then(function (data) { return window.crypto.subtle.digest('SHA-256', data); })
+            .then(toHex);
+    }
+
+    function fingerprint(file) {
+        // Identifies the file for resuming without reading all of it
+        return checksum(new Blob([file.slice(0, SAMPLE), file.slice(Math.max(file.size - SAMPLE, 0))]));
+    }
+
+    function json(response) {
+        return response.json().then(function (data) {
+            if (!response.ok && response.status !== 409) {
+                throw new Error(data.error || 'Upload failed');
+            }
+            return data;
+        });
+    }
+
+    function showProgress(form, text) {
+        var status = form.querySelector('.chunked-upload-status');
+        if (!status) {
+            status = document.createElement('div');
+            status.className = 'chunked-upload-status small text-muted mt-2';
+            form.appendChild(status);
+        }
+        status.textContent = text;
+    }
+
+    function sendChunk(form, url, state, file, index, attempt) {
+        var start = index * state.chunk_size;
+        var blob = file.slice(start, Math.min(start + state.chunk_size, file.size));
+        return checksum(blob).then(function (digest) {
+            var headers = {'X-CSRFToken': csrfToken(form)};
+            if (digest) {
+                headers['X-Chunk-SHA256'] = digest;
+            }
+            return fetch(url + state.upload_id + '/' + index + '/', {
+                method: 'PUT',
+                headers: headers,
+                body: blob,
+                credentials: 'same-origin'
+            });
+        }).then(json).catch(function (error) {
+            if (attempt >= RETRIES) {
+                throw error;
+            }
+            return new Promise(function (resolve) { setTimeout(resolve, 1000 * attempt); })
+                .then(function () { return sendChunk(form, url, state, file, index, attempt + 1); });
+        });
+    }
+
+    function upload(form, file) {
+        var url = form.getAttribute('data-chunked-upload');
+        return fingerprint(file).then(function (digest) {
+            var body = new FormData();
+            body.append('filename', file.name);
+            body.append('size', file.size);
+            body.append('fingerprint', digest || '');
+            body.append('csrfmiddlewaretoken', csrfToken(form));
+            return fetch(url, {method: 'POST', body: body, credentials: 'same-origin'});
+        }).then(json).then(function next(state) {
+            showProgress(form, 'Uploading… ' + Math.floor(100 * state.received / state.size) + '%');
+            if (state.complete) {
+                return state;
+            }
+            // The server answers with the chunk it expects next, so a 409 also resumes correctly
+            return sendChunk(form, url, state, file, state.next_chunk, 1).then(next);
+        });
+    }
+
+    document.addEventListener('submit', function (event) {
+        var form = event.target;
+        // Page-specific validation runs first and may have cancelled the submit
+        if (event.defaultPrevented || !form.hasAttribute('data-chunked-upload')) {
+            return;
+        }
+        var input = form.querySelector('input[type="file"][name="file"]');
+        var file = input && input.files[0];
+        if (!file || file.size < THRESHOLD) {
+            return;
+        }
+        event.preventDefault();
+        upload(form, file).then(function (state) {
+            var hidden = form.querySelector('input[name="upload_id"]');
+            if (!hidden) {
+                hidden = document.createElement('input');
+                hidden.type = 'hidden';
+                hidden.name = 'upload_id';
+                form.appendChild(hidden);
+            }
+            hidden.value = state.upload_id;
+            // The server already has the bytes; don't send them again
+            input.required = false;
+            input.value = '';
+            showProgress(form, 'Upload complete, saving…');
+            form.submit();
+        }).catch(function (error) {
+            showProgress(form, error.message + ' — submit again to resume.');
+        });
+    });
+})();
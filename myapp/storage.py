@@ -0,0 +1,100 @@
+"""
+Deduplicating file storage.
+
+Every saved file is written once to BLOB_DIR/<sha256[:2]>/<sha256>, and
+the name Django asked for (notes/syllabus.pdf, ...) is a hard link to that
+blob. Identical uploads therefore share their bytes on disk. The link count
+is the reference count: deleting a file removes its link, and the blob goes
+once no other name points at it.
+
+Names, paths and URLs look exactly like FileSystemStorage's, so existing
+FileFields, MEDIA_URL links and X-Accel-Redirect keep working. Files must
+not be modified in place, which Django never does.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+
+    def blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIR, digest[:2], digest)
+
+    def store_blob(self, content):
+        """Write content to its blob (unless it's already there) and return the blob path."""
+        tmp_dir = os.path.join(self.location, BLOB_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+            blob = self.blob_path(digest.hexdigest())
+            if os.path.exists(blob):
+                os.unlink(tmp)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(tmp, blob)
+                if self.file_permissions_mode is not None:
+                    os.chmod(blob, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return blob
+
+    def _save(self, name, content):
+        blob = self.store_blob(content)
+        while True:
+            full_path = self.path(name)
+            directory = os.path.dirname(full_path)
+            os.makedirs(directory, exist_ok=True)
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                # Someone took the name meanwhile; pick another like FileSystemStorage does
+                name = self.get_available_name(name)
+                continue
+            except OSError:
+                # Filesystem without hard links: fall back to a plain copy
+                if os.path.exists(blob) and os.stat(blob).st_nlink == 1:
+                    os.unlink(blob)
+                return super()._save(name, content)
+            break
+        return str(name).replace('\\', '/')
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        full_path = self.path(name)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            return
+        blob = None
+        # Two links means this name and its blob; drop the blob along with the last name
+        if stat.st_nlink == 2:
+            blob = self.blob_path(file_digest(full_path))
+            if not (os.path.exists(blob) and os.path.samefile(blob, full_path)):
+                blob = None
+        super().delete(name)
+        if blob and os.stat(blob).st_nlink == 1:
+            os.unlink(blob)
@@ -1,6 +1,9 @@
 from django import template
+from django.core.files.storage import default_storage
 from urllib.parse import quote
 
+from myapp.images import VARIANT_WIDTHS, has_variants, variant_name
+
 register = template.Library()
 
 @register.filter
@@ -26,3 +29,28 @@ def filter_by_type(queryset, doc_type):
     if queryset is None:
         return 0
     return queryset.filter(document_type=doc_type).count()
+
+@register.filter
+def srcset(image):
+    """
+    WebP srcset for an uploaded image's resized variants, or '' until they exist.
+    Usage: <img src="{{ image|variant_url:160 }}" srcset="{{ image|srcset }}" sizes="48px">
+    """
+    if not has_variants(image):
+        return ''
+    return ', '.join(
+        f'{default_storage.url(variant_name(image.name, width, "webp"))} {width}w' for width in VARIANT_WIDTHS
+    )
+
+@register.filter
+def variant_url(image, width):
+    """
+    JPEG variant of an uploaded image at the given width, falling back to the original.
+    Usage: image|variant_url:160
+    """
+    if not image:
+        return ''
+    width = int(width)
+    if width in VARIANT_WIDTHS and has_variants(image):
+        return default_storage.url(variant_name(image.name, width, 'jpg'))
+    return image.url
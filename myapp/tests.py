@@ -1,3 +1,1527 @@
-from django.test import TestCase
+import hashlib
+import io
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import docx
+import fitz
+import numpy as np
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile, UploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from scipy import sparse
+
+from . import winnowing
+from .answer_sheets import pack_answers, unpack_answers
+from .autocomplete import TrigramIndex, _Source
+from .autosave import (ATTEMPT_TOKEN_SALT, AnswerBuffer, answer_buffer, is_expired, issue_attempt_token,
+                       read_attempt_token, saved_answers)
+from .chunked_upload import chunked_upload_files, clean_stale_uploads, finish_upload, part_path
+from .content_recommender import LAST_RUN_KEY, build_content_recommendations, item_similarity, top_items
+from .extraction import IMAGE_DIR, extract_note, extract_pdf
+from .facets import facet_counts
+from .file_index import index_files, pending_files
+from .file_metadata import count_pages
+from .file_text import chunk_text, extract_text
+from .grading import collect_answers, get_answer_key, score_answers
+from .images import VARIANT_WIDTHS, make_variants, variant_name
+from .ingest import PendingSubmission, SubmissionIngestor, SubmissionPending, submission_ingestor, write_batch
+from .item_analysis import flag_items, item_analysis
+from .media import can_access
+from .minhash import MIN_SHINGLES, SHINGLE_WORDS, band_keys, document_signature, from_bytes, shingles, similarity
+from .models import (Assignment, ChunkedUpload, ContentDownload, ContentRecommendation, Course, DocumentPreview,
+                     FilePreview, IndexedFile, Note, Question, Quiz, QuizAttempt, QuizAttemptDraft, Settings,
+                     StudentDocument, StudentRecommendation, Submission, SubmissionFingerprint, TeacherSubjectContent,
+                     UserAnswer)
+from .near_duplicates import check_content, cluster_corpus
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .pdf_cache import _locks, get_note_pdf, note_pdf_key, open_note_pdf
+from .plagiarism import (_discard_pool, _fingerprint_inline, _pool, _run_check, check_assignment, find_similar_pairs,
+                         plagiarism_checker, schedule_check, similarity_report)
+from .previews import attach_previews, generate_preview, preview_file
+from .question_import import QuestionImportError, iter_file_rows, validate_rows
+from .search import PAGE_SIZE, match_expression, replace_file_chunks, search
+from .storage import BLOB_DIR, DedupFileSystemStorage, file_digest
+from .templatetags.custom_filters import srcset, variant_url
+from .weak_topics import build_recommendations
+from .zip_stream import ZipEntry, ZipStream, _fill_rows, crc_worker
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+def make_question(quiz, correct):
+    return Question.objects.create(quiz=quiz, text='Q', option_a='a', option_b='b', option_c='c', option_d='d',
+                                   correct_answer=correct)
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(id=1, username='teacher')
+        course = Course.objects.create(user=self.user, title='DBMS', description='')
+        self.quiz = Quiz.objects.create(title='Unit 1', course=course, marks_per_question=2,
+                                        negative_marking=Decimal('0.5'))
+        self.questions = [make_question(self.quiz, correct) for correct in 'ABCD']
+
+    def test_negative_marking(self):
+        answer_key = get_answer_key(self.quiz)
+        answers = collect_answers({f'question_{q.id}': option for q, option in zip(self.questions, 'AAC')}, answer_key)
+        score, results = score_answers(self.quiz, answer_key, answers)
+        # Two right (+4), one wrong (-0.5), one unanswered (0)
+        self.assertEqual(score, Decimal('3.5'))
+        self.assertEqual([is_correct for _, _, is_correct in results], [True, False, True, False])
+        self.assertIsNone(results[3][1])
+
+    def test_score_never_negative(self):
+        answer_key = get_answer_key(self.quiz)
+        answers = {question_id: 'D' if correct != 'D' else 'A' for question_id, correct in answer_key.items()}
+        score, _ = score_answers(self.quiz, answer_key, answers)
+        self.assertEqual(score, 0)
+
+    def test_cached_key_needs_no_query(self):
+        get_answer_key(self.quiz)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_answer_key(self.quiz)), 4)
+
+    def test_invalid_options_count_as_unanswered(self):
+        answer_key = get_answer_key(self.quiz)
+        answers = collect_answers({f'question_{self.questions[0].id}': 'E'}, answer_key)
+        self.assertEqual(set(answers.values()), {None})
+
+    def test_answer_key_follows_edits_and_moves(self):
+        other = Quiz.objects.create(title='Unit 2', course=self.quiz.course)
+        self.assertEqual(len(get_answer_key(other)), 0)
+        question = self.questions[0]
+        question.correct_answer = 'D'
+        question.save()
+        # A request loads the quiz afresh, with the bumped version
+        self.quiz.refresh_from_db()
+        self.assertEqual(get_answer_key(self.quiz)[question.id], 'D')
+        question.quiz = other
+        question.save()
+        self.quiz.refresh_from_db()
+        other.refresh_from_db()
+        self.assertNotIn(question.id, get_answer_key(self.quiz))
+        self.assertEqual(get_answer_key(other), {question.id: 'D'})
+
+
+def write_now(attempt, answers=()):
+    """Stand-in for submission_ingestor.submit that writes on the calling thread."""
+    pending = PendingSubmission(attempt, answers)
+    write_batch([pending])
+    return pending.attempt
+
+
+class AutosaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create(id=1, username='student')
+        course = Course.objects.create(user=self.student, title='DBMS', description='')
+        self.quiz = Quiz.objects.create(title='Unit 1', course=course, time_limit=10)
+        self.questions = [make_question(self.quiz, correct) for correct in 'AB']
+        self.payload = {'u': self.student.id, 'q': self.quiz.id, 'n': 'attempt1', 't': int(time.time())}
+
+    def token(self, **changes):
+        return signing.dumps({**self.payload, **changes}, salt=ATTEMPT_TOKEN_SALT)
+
+    def test_attempt_token(self):
+        token = issue_attempt_token(self.student.id, self.quiz.id)
+        payload = read_attempt_token(token, self.student.id, self.quiz.id)
+        self.assertLessEqual(abs(payload['t'] - time.time()), 1)
+        self.assertIsNone(read_attempt_token(token, self.student.id + 1, self.quiz.id))
+        self.assertIsNone(read_attempt_token(token, self.student.id, self.quiz.id + 1))
+        self.assertIsNone(read_attempt_token(token[:-2], self.student.id, self.quiz.id))
+        self.assertIsNone(read_attempt_token('', self.student.id, self.quiz.id))
+
+    def test_expiry_allows_grace(self):
+        self.assertFalse(is_expired({'t': int(time.time()) - 10 * 60 - 5}, 10))
+        self.assertTrue(is_expired({'t': int(time.time()) - 11 * 60}, 10))
+
+    def test_buffer_merges_into_stored_draft(self):
+        buffer = AnswerBuffer()
+        with mock.patch('myapp.autosave.draft_flusher') as flusher:
+            buffer.add(self.payload, {'1': 'A'})
+            buffer.add(self.payload, {'2': 'B'})
+        # One flush is scheduled however many autosaves arrive before it
+        self.assertEqual(flusher.enqueue.call_count, 1)
+        # Another process already flushed an answer this one hasn't seen
+        QuizAttemptDraft.objects.create(key='attempt1', student=self.student, quiz=self.quiz,
+                                        started_at=self.quiz.created_at, answers={'1': 'C', '3': 'D'})
+        self.assertEqual(buffer.flush(), 1)
+        draft = QuizAttemptDraft.objects.get(key='attempt1')
+        self.assertEqual(draft.answers, {'1': 'A', '2': 'B', '3': 'D'})
+        self.assertEqual(buffer.get(self.payload), {})
+
+    def test_flush_skips_submitted_attempts(self):
+        buffer = AnswerBuffer()
+        QuizAttempt.objects.create(student=self.student, quiz=self.quiz, score=0, total_questions=2,
+                                   attempt_key='attempt1')
+        with mock.patch('myapp.autosave.draft_flusher'):
+            buffer.add(self.payload, {'1': 'A'})
+        buffer.flush()
+        self.assertFalse(QuizAttemptDraft.objects.exists())
+
+    def test_saved_answers_reads_through(self):
+        QuizAttemptDraft.objects.create(key='attempt1', student=self.student, quiz=self.quiz,
+                                        started_at=self.quiz.created_at, answers={'1': 'C', '2': 'D'})
+        with mock.patch('myapp.autosave.draft_flusher'):
+            answer_buffer.add(self.payload, {'1': 'A'})
+        try:
+            self.assertEqual(saved_answers(self.payload), {'1': 'A', '2': 'D'})
+        finally:
+            answer_buffer.discard(self.payload)
+
+    def submit(self, data):
+        self.client.force_login(self.student)
+        with mock.patch.object(submission_ingestor, 'submit', side_effect=write_now):
+            return self.client.post(reverse('attempt_quiz', args=[self.quiz.id]), data)
+
+    def test_submit_needs_token(self):
+        response = self.submit({f'question_{self.questions[0].id}': 'A'})
+        self.assertRedirects(response, reverse('attempt_quiz', args=[self.quiz.id]), fetch_redirect_response=False)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_submit_in_time(self):
+        self.submit({'attempt_token': self.token(), f'question_{self.questions[0].id}': 'A',
+                     f'question_{self.questions[1].id}': 'B'})
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual((attempt.score, attempt.answer_vector, attempt.attempt_key), (2, 'AB', 'attempt1'))
+
+    def test_late_submit_keeps_only_autosaved_answers(self):
+        QuizAttemptDraft.objects.create(key='attempt1', student=self.student, quiz=self.quiz,
+                                        started_at=self.quiz.created_at, answers={str(self.questions[0].id): 'A'})
+        self.submit({'attempt_token': self.token(t=int(time.time()) - 60 * 60),
+                     f'question_{self.questions[0].id}': 'C', f'question_{self.questions[1].id}': 'B'})
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual((attempt.answer_vector, attempt.time_taken), ('A-', 10 * 60))
+
+
+class QuestionImportTests(TestCase):
+    HEADER = 'Question,A,B,C,D,Answer\r\n'
+
+    def import_file(self, name, data):
+        return validate_rows(iter_file_rows(SimpleUploadedFile(name, data)))
+
+    def test_csv(self):
+        questions, errors = self.import_file('bank.csv', (self.HEADER + 'What is SQL?,a,b,c,d,b\r\n').encode('utf-8-sig'))
+        self.assertEqual(errors, [])
+        self.assertEqual((questions[0].text, questions[0].correct_answer), ('What is SQL?', 'B'))
+
+    def test_csv_row_errors(self):
+        data = self.HEADER + 'Fine,a,b,c,d,A\r\n,a,b,c,d,A\r\nNo answer,a,b,c,d,E\r\n'
+        questions, errors = self.import_file('bank.csv', data.encode())
+        self.assertEqual(len(questions), 1)
+        self.assertEqual([row for row, _ in errors], [2, 3])
+        self.assertIn('text is required', errors[0][1])
+
+    def test_cp1252_csv(self):
+        questions, errors = self.import_file('bank.csv', (self.HEADER + 'Café “quotes”,a,b,c,d,C\r\n').encode('cp1252'))
+        self.assertEqual(errors, [])
+        self.assertEqual(questions[0].text, 'Café “quotes”')
+
+    def test_unreadable_csv(self):
+        with self.assertRaises(QuestionImportError):
+            self.import_file('bank.csv', self.HEADER.encode() + b'\x81\x8d,a,b,c,d,A\r\n')
+        with self.assertRaises(QuestionImportError):
+            self.import_file('bank.csv', (self.HEADER + '"' + 'x' * 200000 + '",a,b,c,d,A\r\n').encode())
+
+    def test_unsupported_type(self):
+        with self.assertRaises(QuestionImportError):
+            self.import_file('bank.txt', b'')
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct'])
+        workbook.active.append(['2 + 2?', 3, 4, 5, 6, 'b'])
+        workbook.active.append(['Missing options', 'x', None, None, None, 'A'])
+        out = io.BytesIO()
+        workbook.save(out)
+        questions, errors = self.import_file('bank.xlsx', out.getvalue())
+        self.assertEqual((questions[0].option_b, questions[0].correct_answer), ('4', 'B'))
+        self.assertEqual([row for row, _ in errors], [2])
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_broken_xlsx(self):
+        with self.assertRaises(QuestionImportError):
+            self.import_file('bank.xlsx', b'not a zip file')
+
+
+class SubmissionIngestTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(id=1, username='student')
+        course = Course.objects.create(user=self.student, title='DBMS', description='')
+        self.quiz = Quiz.objects.create(title='Unit 1', course=course)
+        self.question = make_question(self.quiz, 'A')
+
+    def pending(self, key, answer='A'):
+        attempt = QuizAttempt(student=self.student, quiz=self.quiz, score=1, total_questions=1, attempt_key=key)
+        return PendingSubmission(attempt, [UserAnswer(user=self.student, quiz=self.quiz, question=self.question,
+                                                       answer=answer)])
+
+    def test_batch_writes_attempts_with_answers(self):
+        QuizAttemptDraft.objects.create(key='a', student=self.student, quiz=self.quiz,
+                                        started_at=self.quiz.created_at, answers={})
+        batch = [self.pending('a'), self.pending('b', 'B')]
+        write_batch(batch)
+        self.assertTrue(all(pending.attempt.pk for pending in batch))
+        self.assertEqual(sorted(UserAnswer.objects.values_list('attempt__attempt_key', 'answer')),
+                         [('a', 'A'), ('b', 'B')])
+        self.assertFalse(QuizAttemptDraft.objects.exists())
+
+    def test_resubmitted_key_returns_saved_attempt(self):
+        first = self.pending('a')
+        write_batch([first])
+        again, duplicate = self.pending('a'), self.pending('b')
+        twin = self.pending('b')
+        write_batch([again, duplicate, twin])
+        self.assertEqual(again.attempt.pk, first.attempt.pk)
+        self.assertIs(twin.attempt, duplicate.attempt)
+        self.assertEqual(QuizAttempt.objects.count(), 2)
+        self.assertEqual(UserAnswer.objects.count(), 2)
+
+    def test_attempts_without_key_are_never_merged(self):
+        write_batch([self.pending(None), self.pending(None)])
+        self.assertEqual(QuizAttempt.objects.count(), 2)
+
+    def test_slow_batch_raises_pending(self):
+        ingestor = SubmissionIngestor()
+        with mock.patch.object(ingestor, '_ensure_writer'), mock.patch('myapp.ingest.SUBMIT_TIMEOUT', 0.01):
+            with self.assertRaises(SubmissionPending):
+                ingestor.submit(self.pending('a').attempt)
+        # The submission stays queued for the writer
+        self.assertEqual(ingestor._queue.qsize(), 1)
+
+    def test_pending_page_offers_resubmit(self):
+        self.client.force_login(self.student)
+        token = issue_attempt_token(self.student.id, self.quiz.id)
+        data = {'attempt_token': token, f'question_{self.question.id}': 'A'}
+        with mock.patch.object(submission_ingestor, 'submit', side_effect=SubmissionPending('a')):
+            response = self.client.post(reverse('attempt_quiz', args=[self.quiz.id]), data)
+        self.assertEqual(response.status_code, 202)
+        self.assertIn(('attempt_token', token), response.context['resubmit'])
+        self.assertFalse(QuizAttempt.objects.exists())
+
+
+class AnswerSheetTests(TestCase):
+    def test_round_trip(self):
+        results = [(question_id, 'ABCD'[question_id % 4] if question_id % 3 else None, question_id % 2 == 0)
+                   for question_id in range(1, 20)]
+        packed = pack_answers(results)
+        self.assertEqual(len(packed['answer_vector']), 19)
+        self.assertEqual(len(packed['correct_bitmap']), 3)
+        self.assertEqual(unpack_answers(**packed), results)
+
+    def test_empty(self):
+        self.assertEqual(unpack_answers(**pack_answers([])), [])
+
+
+def make_attempt(student, quiz, questions, picks):
+    """Save a packed attempt answering questions[i] with picks[i] ('-' leaves it unanswered)."""
+    results = [(q.id, None if pick == '-' else pick, pick == q.correct_answer) for q, pick in zip(questions, picks)]
+    return QuizAttempt.objects.create(student=student, quiz=quiz, total_questions=len(questions),
+                                      score=sum(correct for _, _, correct in results), **pack_answers(results))
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [User.objects.create(username=f'student{i}') for i in range(4)]
+        course = Course.objects.create(user=self.students[0], title='DBMS', description='')
+        self.quiz = Quiz.objects.create(title='Unit 1', course=course)
+        self.questions = [make_question(self.quiz, correct) for correct in 'AB']
+
+    def stats(self):
+        return {item['question_id']: item for item in item_analysis(self.quiz.id)}
+
+    def test_difficulty_and_distractors(self):
+        for student, picks in zip(self.students, ['AB', 'AC', 'AC', 'B-']):
+            make_attempt(student, self.quiz, self.questions, picks)
+        first, second = (self.stats()[q.id] for q in self.questions)
+        self.assertEqual((first['responses'], first['difficulty']), (4, 0.75))
+        self.assertEqual(first['distractors'], {'A': 3, 'B': 1, 'C': 0, 'D': 0})
+        self.assertEqual((second['difficulty'], second['unanswered']), (0.25, 1))
+        # The only student who got the first question wrong is also the weakest overall
+        self.assertEqual(first['discrimination'], 1.0)
+        flagged = {item['question_id']: item['flags'] for item in flag_items(list(self.stats().values()),
+                                                                               get_answer_key(self.quiz))}
+        self.assertEqual(flagged[self.questions[1].id], ['too hard', 'misleading'])
+
+    def test_new_attempts_are_appended(self):
+        make_attempt(self.students[0], self.quiz, self.questions, 'AB')
+        self.assertEqual(self.stats()[self.questions[0].id]['responses'], 1)
+        # A question added later only appears in the new attempt
+        extra = make_question(self.quiz, 'C')
+        make_attempt(self.students[1], self.quiz, self.questions + [extra], 'BBC')
+        stats = self.stats()
+        self.assertEqual(stats[self.questions[0].id]['difficulty'], 0.5)
+        self.assertEqual((stats[extra.id]['responses'], stats[extra.id]['difficulty']), (1, 1.0))
+
+    def test_deleted_attempt_forces_rebuild(self):
+        make_attempt(self.students[0], self.quiz, self.questions, 'AB')
+        gone = make_attempt(self.students[1], self.quiz, self.questions, 'CC')
+        self.stats()
+        gone.delete()
+        make_attempt(self.students[2], self.quiz, self.questions, 'AB')
+        self.assertEqual(self.stats()[self.questions[0].id]['difficulty'], 1.0)
+
+    def test_legacy_attempts_use_answer_rows(self):
+        attempt = QuizAttempt.objects.create(student=self.students[0], quiz=self.quiz, score=1, total_questions=2)
+        UserAnswer.objects.create(user=self.students[0], quiz=self.quiz, question=self.questions[0], attempt=attempt,
+                                  answer='A', is_correct=True)
+        stats = self.stats()
+        self.assertEqual((stats[self.questions[0].id]['difficulty'], stats[self.questions[0].id]['responses']), (1.0, 1))
+        self.assertNotIn(self.questions[1].id, stats)
+
+
+class WeakTopicTests(TestCase):
+    def setUp(self):
+        self.strong, self.weak = User.objects.create(username='strong'), User.objects.create(username='weak')
+        self.course = Course.objects.create(user=self.strong, title='DBMS', description='')
+        self.quiz = Quiz.objects.create(title='Unit 1', course=self.course)
+        self.questions = [make_question(self.quiz, 'A') for _ in range(5)]
+
+    def weak_courses(self, student):
+        return StudentRecommendation.objects.get(student=student).weak_courses
+
+    def test_weak_course_against_class_average(self):
+        make_attempt(self.strong, self.quiz, self.questions, 'AAAAA')
+        make_attempt(self.weak, self.quiz, self.questions, 'AABBB')
+        self.assertEqual(build_recommendations(), 2)
+        self.assertEqual(self.weak_courses(self.strong), [])
+        self.assertEqual(self.weak_courses(self.weak),
+                         [{'course_id': self.course.id, 'title': 'DBMS', 'accuracy': 40, 'class_accuracy': 70}])
+
+    def test_unanswered_questions_are_not_counted(self):
+        make_attempt(self.strong, self.quiz, self.questions, 'AAAAA')
+        # A blank retake says nothing about accuracy
+        make_attempt(self.strong, self.quiz, self.questions, '-----')
+        attempt = QuizAttempt.objects.create(student=self.weak, quiz=self.quiz, score=5, total_questions=5)
+        for question in self.questions:
+            UserAnswer.objects.create(user=self.weak, quiz=self.quiz, question=question, attempt=attempt,
+                                      answer='A', is_correct=True)
+            UserAnswer.objects.create(user=self.weak, quiz=self.quiz, question=question, answer=None)
+        build_recommendations()
+        self.assertEqual(self.weak_courses(self.strong), [])
+        self.assertEqual(self.weak_courses(self.weak), [])
+
+    def test_too_few_answers_to_judge(self):
+        make_attempt(self.weak, self.quiz, self.questions, 'BBBB-')
+        build_recommendations()
+        self.assertEqual(self.weak_courses(self.weak), [])
+
+
+def make_content(user, **fields):
+    values = {'content_type': 'notes', 'department': 'CSE', 'year': 2025, 'semester': '3', 'section': 'A1',
+              'subject': 'DBMS', 'approval_status': 'approved', **fields}
+    return TeacherSubjectContent.objects.create(user=user, **values)
+
+
+class ContentRecommenderTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f'student{i}') for i in range(4)]
+        course = Course.objects.create(user=self.users[0], title='DBMS', description='')
+        self.quizzes = [Quiz.objects.create(title=f'Unit {i}', course=course) for i in range(3)]
+
+    def attempt(self, user, quiz):
+        QuizAttempt.objects.create(student=user, quiz=quiz, score=0, total_questions=0)
+
+    def recommended(self, user):
+        return [(item['type'], item['id']) for item in ContentRecommendation.objects.get(user=user).items]
+
+    def test_students_like_you_also_used(self):
+        for user in self.users[:3]:
+            self.attempt(user, self.quizzes[0])
+            self.attempt(user, self.quizzes[1])
+        self.attempt(self.users[3], self.quizzes[0])
+        pending = make_content(self.users[0], approval_status='pending')
+        for user in self.users[:3]:
+            ContentDownload.objects.create(user=user, item_type='content', object_id=pending.id)
+        self.assertEqual(build_content_recommendations(), 4)
+        # Content still awaiting approval is never recommended
+        self.assertEqual(self.recommended(self.users[3]), [('quiz', self.quizzes[1].id)])
+        self.assertEqual(self.recommended(self.users[0]), [])
+
+    def test_incremental_run_rescores_active_users(self):
+        self.attempt(self.users[0], self.quizzes[0])
+        self.attempt(self.users[1], self.quizzes[1])
+        build_content_recommendations()
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        QuizAttempt.objects.update(attempted_at=an_hour_ago)
+        Settings.objects.filter(key=LAST_RUN_KEY).update(value=(an_hour_ago + timedelta(minutes=1)).isoformat())
+        self.attempt(self.users[1], self.quizzes[0])
+        self.assertEqual(build_content_recommendations(incremental=True), 1)
+        self.assertEqual(self.recommended(self.users[0]), [])
+        self.assertEqual(self.recommended(self.users[1]), [])
+        build_content_recommendations()
+        self.assertEqual(self.recommended(self.users[0]), [('quiz', self.quizzes[1].id)])
+
+    def test_partial_similarity_across_user_chunks(self):
+        rng = np.random.default_rng(7)
+        matrix = sparse.random(12, 20, density=0.2, format='csr', random_state=rng)
+        rows = np.arange(0, 12, 2)
+        items = np.unique(matrix[rows].indices)
+        expected = top_items(matrix, item_similarity(matrix), rows)
+        # More users than fit in one chunk, scored against similarity rows for their items only
+        with mock.patch('myapp.content_recommender.USER_CHUNK', 4):
+            scored = top_items(matrix, item_similarity(matrix, items), rows, items)
+        self.assertEqual(scored.keys(), expected.keys())
+        for row, picks in expected.items():
+            self.assertEqual([item for item, _ in scored[row]], [item for item, _ in picks])
+            np.testing.assert_allclose([score for _, score in scored[row]], [score for _, score in picks])
+
+
+class MediaTestCase(TestCase):
+    """A TestCase whose uploads go to a throwaway MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+
+
+def docx_bytes(*paragraphs):
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+class NoteExtractionTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher')
+
+    def make_note(self, name, data):
+        return Note.objects.create(user=self.user, file=default_storage.save(f'notes/{name}', ContentFile(data)),
+                                   extraction_status='pending')
+
+    def test_docx_text_is_escaped(self):
+        note = self.make_note('unit1.docx', docx_bytes('Joins & keys', '<script>'))
+        extract_note(note.id)
+        note.refresh_from_db()
+        self.assertEqual((note.extraction_status, note.extraction_progress), ('done', 100))
+        self.assertEqual(note.content_html, '<p>Joins &amp; keys</p><p>&lt;script&gt;</p>')
+
+    def test_failure_is_recorded(self):
+        note = self.make_note('broken.pdf', b'not a pdf')
+        with self.assertLogs('myapp.extraction', 'ERROR'):
+            extract_note(note.id)
+        note.refresh_from_db()
+        self.assertEqual((note.extraction_status, note.content_html), ('failed', ''))
+        self.assertTrue(note.extraction_error)
+
+    def test_note_without_file_is_skipped(self):
+        note = Note.objects.create(user=self.user)
+        extract_note(note.id)
+        note.refresh_from_db()
+        self.assertEqual(note.extraction_status, '')
+
+
+def png_bytes(size=(8, 8), color='red'):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'PNG')
+    return out.getvalue()
+
+
+class CompactNoteHtmlTests(MediaTestCase):
+    def write_pdf(self, pages=2):
+        document = fitz.open()
+        for _ in range(pages):
+            page = document.new_page()
+            page.insert_text((72, 72), 'Chapter One', fontsize=24)
+            page.insert_text((72, 120), 'Body text long enough to set the body size\nwith a hyph-\nenated word',
+                             fontsize=11)
+            page.insert_text((72, 200), 'Bold <words>', fontsize=11, fontname='hebo')
+            page.insert_image(fitz.Rect(72, 300, 144, 372), stream=png_bytes())
+        path = f'{default_storage.location}/unit1.pdf'
+        document.save(path)
+        return path
+
+    def test_semantic_html(self):
+        html = extract_pdf(self.write_pdf(pages=1))
+        self.assertIn('<h2>Chapter One</h2>', html)
+        self.assertIn('<p>Body text long enough to set the body size with a hyphenated word</p>', html)
+        self.assertIn('<p><strong>Bold &lt;words&gt;</strong></p>', html)
+        self.assertNotIn('style=', html)
+
+    def test_images_are_stored_once(self):
+        html = extract_pdf(self.write_pdf(pages=2))
+        images = default_storage.listdir(IMAGE_DIR)[1]
+        self.assertEqual(len(images), 1)
+        self.assertEqual(html.count(f'<img src="{default_storage.url(f"{IMAGE_DIR}/{images[0]}")}"'), 2)
+        self.assertNotIn('base64', html)
+
+    def test_original_html_still_available(self):
+        self.assertIn('base64', extract_pdf(self.write_pdf(pages=1), compact=False))
+
+
+def fake_render(renders):
+    """A stand-in for WeasyPrint's HTML that records each render."""
+    def render(string):
+        renders.append(string)
+        return mock.Mock(write_pdf=lambda out: out.write(b'%PDF-' + string.encode()))
+    return render
+
+
+class NotePdfCacheTests(MediaTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.enterContext(override_settings(NOTE_PDF_CACHE_DIR=self.cache_dir))
+        self.renders = []
+        self.enterContext(mock.patch('myapp.pdf_cache.HTML', side_effect=fake_render(self.renders)))
+        self.user = User.objects.create(username='student')
+        self.note = Note.objects.create(user=self.user, topic='Joins', content_html='<p>Inner join</p>')
+
+    def test_unchanged_note_is_served_from_disk(self):
+        path, key = get_note_pdf(self.note)
+        self.assertEqual(get_note_pdf(self.note), (path, key))
+        self.assertEqual(len(self.renders), 1)
+        self.assertEqual(_locks, {})
+
+    def test_edit_renders_again_and_drops_old_file(self):
+        old_path, old_key = get_note_pdf(self.note)
+        self.note.content_html = '<p>Outer join</p>'
+        path, key = get_note_pdf(self.note)
+        self.assertNotEqual(key, old_key)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(path)])
+
+    def test_concurrent_requests_share_one_render(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_render(string):
+            started.set()
+            release.wait(5)
+            return fake_render(self.renders)(string)
+
+        with mock.patch('myapp.pdf_cache.HTML', side_effect=slow_render):
+            first = threading.Thread(target=get_note_pdf, args=[self.note])
+            first.start()
+            started.wait(5)
+            second = threading.Thread(target=get_note_pdf, args=[self.note])
+            second.start()
+            # Let the second request reach the lock while the first is still rendering
+            time.sleep(0.05)
+            release.set()
+            first.join()
+            second.join()
+        self.assertEqual(len(self.renders), 1)
+
+    def test_failed_render_leaves_nothing_behind(self):
+        with mock.patch('myapp.pdf_cache.HTML', side_effect=ValueError('bad html')):
+            with self.assertRaises(ValueError):
+                get_note_pdf(self.note)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(_locks, {})
+
+    def test_open_survives_a_concurrent_stale_cleanup(self):
+        path, _ = get_note_pdf(self.note)
+        real_get = get_note_pdf
+        calls = []
+
+        def removed_before_open(note):
+            calls.append(note)
+            result = real_get(note)
+            if len(calls) == 1:
+                os.unlink(path)
+            return result
+
+        with mock.patch('myapp.pdf_cache.get_note_pdf', side_effect=removed_before_open):
+            pdf, key = open_note_pdf(self.note)
+        with pdf:
+            self.assertTrue(pdf.read().startswith(b'%PDF-'))
+        self.assertEqual(key, note_pdf_key(self.note))
+
+    def test_download_revalidates_with_etag(self):
+        self.client.force_login(self.user)
+        url = reverse('download_note_html_as_pdf', args=[self.note.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(self.renders), 1)
+
+
+class CanAccessTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create(id=1, username='teacher')
+        self.other_teacher = User.objects.create(username='other')
+        self.student = User.objects.create(username='student')
+        self.classmate = User.objects.create(username='classmate')
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        assignment = Assignment.objects.create(user=self.teacher, topic='ER diagrams', description='')
+        # bulk_create skips the save signals, which would read the (missing) files
+        Submission.objects.bulk_create([Submission(assignment=assignment, student=self.student,
+                                                   file='submissions/er.pdf')])
+        StudentDocument.objects.bulk_create([StudentDocument(user=self.student, file='student_documents/id.pdf')])
+        content = {'content_type': 'notes', 'department': 'CSE', 'year': 2025, 'semester': '3', 'section': 'A1',
+                   'subject': 'DBMS', 'user': self.teacher}
+        TeacherSubjectContent.objects.bulk_create([
+            TeacherSubjectContent(file='teacher_content/approved.pdf', approval_status='approved', **content),
+            TeacherSubjectContent(file='teacher_content/pending.pdf', approval_status='pending', **content),
+            TeacherSubjectContent(file='teacher_content/rejected.pdf', approval_status='rejected', **content),
+        ])
+        locker = DocumentPreview.objects.create(digest='1' * 64, thumbnail='previews/1.webp')
+        shared = DocumentPreview.objects.create(digest='2' * 64, thumbnail='previews/2.webp')
+        FilePreview.objects.create(name='student_documents/id.pdf', preview=locker)
+        FilePreview.objects.create(name='notes/unit1.pdf', preview=shared)
+
+    def allowed(self, user, name, pin=False):
+        request = RequestFactory().get('/')
+        request.user = user
+        request.session = {'pin_verified': pin}
+        return can_access(request, name)
+
+    def test_public_and_shared(self):
+        self.assertTrue(self.allowed(AnonymousUser(), 'courses/banner.jpg'))
+        self.assertFalse(self.allowed(AnonymousUser(), 'notes/unit1.pdf'))
+        self.assertTrue(self.allowed(self.classmate, 'notes/unit1.pdf'))
+        self.assertFalse(self.allowed(self.classmate, 'unknown/file.pdf'))
+        self.assertTrue(self.allowed(self.staff, 'unknown/file.pdf'))
+
+    def test_submissions(self):
+        self.assertTrue(self.allowed(self.student, 'submissions/er.pdf'))
+        self.assertTrue(self.allowed(self.teacher, 'submissions/er.pdf'))
+        self.assertTrue(self.allowed(self.staff, 'submissions/er.pdf'))
+        self.assertFalse(self.allowed(self.classmate, 'submissions/er.pdf'))
+        self.assertFalse(self.allowed(self.other_teacher, 'submissions/er.pdf'))
+
+    def test_locker_needs_owner_and_pin(self):
+        self.assertTrue(self.allowed(self.student, 'student_documents/id.pdf', pin=True))
+        self.assertFalse(self.allowed(self.student, 'student_documents/id.pdf'))
+        self.assertFalse(self.allowed(self.classmate, 'student_documents/id.pdf', pin=True))
+
+    def test_teacher_content_needs_approval(self):
+        self.assertTrue(self.allowed(self.student, 'teacher_content/approved.pdf'))
+        self.assertFalse(self.allowed(AnonymousUser(), 'teacher_content/approved.pdf'))
+        for name in ('teacher_content/pending.pdf', 'teacher_content/rejected.pdf'):
+            self.assertFalse(self.allowed(self.student, name))
+            self.assertFalse(self.allowed(self.other_teacher, name))
+            self.assertTrue(self.allowed(self.teacher, name))
+            self.assertTrue(self.allowed(self.staff, name))
+        self.assertFalse(self.allowed(self.student, 'teacher_content/unknown.pdf'))
+
+    def test_variants_follow_their_source(self):
+        self.assertTrue(self.allowed(AnonymousUser(), 'variants/profiles/me.jpg-64w.webp'))
+        self.assertFalse(self.allowed(AnonymousUser(), 'variants/notes/diagram.png-160w.jpg'))
+        self.assertTrue(self.allowed(self.classmate, 'variants/notes/diagram.png-160w.jpg'))
+        self.assertFalse(self.allowed(self.classmate, 'variants/student_documents/id.pdf-64w.webp', pin=True))
+        self.assertFalse(self.allowed(self.staff, 'variants/notes/diagram.png'))
+
+    def test_previews_follow_their_files(self):
+        self.assertTrue(self.allowed(self.student, 'previews/1.webp', pin=True))
+        self.assertFalse(self.allowed(self.classmate, 'previews/1.webp', pin=True))
+        self.assertTrue(self.allowed(self.classmate, 'previews/2.webp'))
+        self.assertFalse(self.allowed(self.classmate, 'previews/unknown.webp'))
+
+
+class DedupStorageTests(MediaTestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = DedupFileSystemStorage(location=location)
+
+    def blobs(self):
+        root = os.path.join(self.storage.location, BLOB_DIR)
+        return [name for _, _, names in os.walk(root) for name in names]
+
+    def test_identical_files_share_one_blob(self):
+        first = self.storage.save('notes/a.pdf', ContentFile(b'same bytes'))
+        second = self.storage.save('assignments/b.pdf', ContentFile(b'same bytes'))
+        self.storage.save('notes/c.pdf', ContentFile(b'other bytes'))
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual(len(self.blobs()), 2)
+        blob = self.storage.blob_path(file_digest(self.storage.path(first)))
+        self.assertEqual(os.stat(blob).st_nlink, 3)
+
+    def test_taken_name_gets_another(self):
+        first = self.storage.save('notes/a.pdf', ContentFile(b'one'))
+        second = self.storage.save('notes/a.pdf', ContentFile(b'two'))
+        self.assertNotEqual(first, second)
+        with self.storage.open(first) as f:
+            self.assertEqual(f.read(), b'one')
+
+    def test_blob_goes_with_its_last_name(self):
+        first = self.storage.save('notes/a.pdf', ContentFile(b'same bytes'))
+        second = self.storage.save('notes/b.pdf', ContentFile(b'same bytes'))
+        self.storage.delete(first)
+        self.assertEqual(len(self.blobs()), 1)
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'same bytes')
+        self.storage.delete(second)
+        self.assertEqual(self.blobs(), [])
+
+    def test_editor_images_use_default_storage(self):
+        self.client.force_login(User.objects.create(username='teacher'))
+        image = SimpleUploadedFile('diagram.png', png_bytes(), content_type='image/png')
+        with mock.patch('myapp.views.image_worker') as worker:
+            response = self.client.post(reverse('upload_image'), {'image': image})
+        name = worker.enqueue.call_args.args[0]
+        self.assertEqual(response.json(), {'url': default_storage.url(name)})
+        # Stored as a link to its blob
+        self.assertEqual(os.stat(default_storage.path(name)).st_nlink, 2)
+
+
+def pdf_bytes(*pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text, fontsize=11)
+    return document.tobytes()
+
+
+class DocumentPreviewTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher')
+
+    def make_note(self, name, data):
+        return Note.objects.create(user=self.user, file=default_storage.save(f'notes/{name}', ContentFile(data)))
+
+    def test_pdf_preview_is_shared_by_identical_uploads(self):
+        data = pdf_bytes('Relational algebra', 'Second page')
+        first = self.make_note('unit1.pdf', data)
+        copy = self.make_note('copy.pdf', data)
+        preview = generate_preview(first.file.name, first.file)
+        self.assertEqual((preview.text, preview.page_count), ('Relational algebra', 2))
+        with default_storage.open(preview.thumbnail.name) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size[0], 320)
+        preview_file('myapp.Note', copy.id)
+        self.assertEqual(DocumentPreview.objects.count(), 1)
+        self.assertEqual(FilePreview.objects.get(name=copy.file.name).preview, preview)
+
+    def test_docx_preview_has_text_only(self):
+        note = self.make_note('unit2.docx', docx_bytes('', 'Normal forms', 'BCNF'))
+        preview = generate_preview(note.file.name, note.file)
+        self.assertEqual((preview.text, preview.page_count, preview.thumbnail.name), ('Normal forms BCNF', 0, None))
+
+    def test_attach_previews(self):
+        ready = self.make_note('unit1.pdf', pdf_bytes('Joins'))
+        self.make_note('unit2.pdf', pdf_bytes('Keys'))
+        Note.objects.create(user=self.user)
+        generate_preview(ready.file.name, ready.file)
+        notes = attach_previews(Note.objects.order_by('id'))
+        self.assertEqual([note.preview and note.preview.text for note in notes], ['Joins', None, None])
+
+
+class ImageVariantTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher')
+
+    def save_image(self, name, image, **options):
+        out = io.BytesIO()
+        image.save(out, **options)
+        return default_storage.save(name, ContentFile(out.getvalue()))
+
+    def test_variants_for_every_width_and_format(self):
+        name = self.save_image('courses/banner.png', Image.new('RGBA', (1000, 500), (0, 0, 255, 0)), format='PNG')
+        course = Course.objects.create(user=self.user, title='DBMS', description='', image=name)
+        self.assertEqual(make_variants(name), len(VARIANT_WIDTHS) * 2)
+        for width in VARIANT_WIDTHS:
+            with default_storage.open(variant_name(name, width, 'jpg')) as f:
+                variant = Image.open(f)
+                self.assertEqual((variant.size, variant.mode), ((width, width // 2), 'RGB'))
+                # Transparent areas are flattened onto white
+                self.assertEqual(variant.getpixel((0, 0)), (255, 255, 255))
+        course.refresh_from_db()
+        self.assertEqual(course.image_variants, name)
+        self.assertEqual(variant_url(course.image, 160), default_storage.url(variant_name(name, 160, 'jpg')))
+        self.assertIn(f'{default_storage.url(variant_name(name, 480, "webp"))} 480w', srcset(course.image))
+
+    def test_rotation_applied_and_metadata_dropped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees clockwise
+        exif[0x010F] = 'Camera maker'
+        name = self.save_image('profiles/me.jpg', Image.new('RGB', (40, 20)), format='JPEG', exif=exif)
+        make_variants(name)
+        with default_storage.open(variant_name(name, 64, 'jpg')) as f:
+            variant = Image.open(f)
+            # Small images aren't scaled up
+            self.assertEqual(variant.size, (20, 40))
+            self.assertEqual(dict(variant.getexif()), {})
+
+    def test_existing_set_is_not_rewritten(self):
+        name = self.save_image('courses/banner.png', Image.new('RGB', (100, 100)), format='PNG')
+        make_variants(name)
+        self.assertEqual(make_variants(name), 0)
+        self.assertEqual(make_variants(variant_name(name, 64, 'jpg')), 0)
+        self.assertEqual(make_variants('courses/missing.png'), 0)
+
+    def test_filters_fall_back_until_ready(self):
+        name = self.save_image('courses/banner.png', Image.new('RGB', (100, 100)), format='PNG')
+        course = Course.objects.create(user=self.user, title='DBMS', description='', image=name)
+        self.assertEqual(variant_url(course.image, 160), course.image.url)
+        self.assertEqual(srcset(course.image), '')
+
+
+class ChunkedUploadTests(TestCase):
+    DATA = b'0123456789'
+
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir, ignore_errors=True)
+        self.enterContext(override_settings(CHUNKED_UPLOAD_DIR=upload_dir, CHUNKED_UPLOAD_CHUNK_SIZE=4))
+        self.user = User.objects.create(username='student')
+        self.client.force_login(self.user)
+
+    def start(self, fingerprint=''):
+        response = self.client.post(reverse('chunked_upload_init'),
+                                    {'filename': '../report.pdf', 'size': len(self.DATA), 'fingerprint': fingerprint})
+        return response.json()
+
+    def send(self, upload_id, index, data=None, checksum=None):
+        data = self.DATA[index * 4:index * 4 + 4] if data is None else data
+        headers = {'HTTP_X_CHUNK_SHA256': checksum} if checksum else {}
+        return self.client.put(reverse('chunked_upload_chunk', args=[upload_id, index]), data,
+                               content_type='application/octet-stream', **headers)
+
+    def test_upload_in_chunks(self):
+        state = self.start()
+        self.assertEqual((state['chunk_size'], state['next_chunk'], state['complete']), (4, 0, False))
+        for index in range(3):
+            chunk = self.DATA[index * 4:index * 4 + 4]
+            state = self.send(state['upload_id'], index, checksum=hashlib.sha256(chunk).hexdigest()).json()
+        self.assertEqual((state['received'], state['complete']), (10, True))
+
+        request = RequestFactory().post('/', {'upload_id': state['upload_id']})
+        request.user = self.user
+        files, upload = chunked_upload_files(request)
+        self.assertEqual((files['file'].name, files['file'].read()), ('report.pdf', self.DATA))
+        finish_upload(upload, files)
+        self.assertFalse(os.path.exists(part_path(upload)))
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_bad_chunks_are_rejected(self):
+        upload_id = self.start()['upload_id']
+        self.assertEqual(self.send(upload_id, 1).status_code, 409)
+        self.assertEqual(self.send(upload_id, 0, data=b'012').status_code, 400)
+        response = self.send(upload_id, 0, checksum='0' * 64)
+        self.assertEqual((response.status_code, response.json()['received']), (400, 0))
+        self.assertEqual(os.path.getsize(part_path(ChunkedUpload.objects.get())), 0)
+        self.send(upload_id, 0)
+        # A chunk sent again after a lost response is accepted without rewriting it
+        self.assertEqual(self.send(upload_id, 0, data=b'xxxx').json()['received'], 4)
+
+    def test_resume_needs_matching_fingerprint(self):
+        fingerprint = hashlib.sha256(self.DATA).hexdigest()
+        upload_id = self.start(fingerprint)['upload_id']
+        self.send(upload_id, 0)
+        # Bytes past the last verified chunk, from a write that never finished
+        with open(part_path(ChunkedUpload.objects.get()), 'ab') as f:
+            f.write(b'45')
+        state = self.start(fingerprint)
+        self.assertEqual((state['upload_id'], state['next_chunk']), (upload_id, 1))
+        self.assertEqual(os.path.getsize(part_path(ChunkedUpload.objects.get(upload_id=upload_id))), 4)
+        self.assertNotEqual(self.start()['upload_id'], upload_id)
+
+    def test_uploads_are_private(self):
+        upload_id = self.start()['upload_id']
+        self.client.force_login(User.objects.create(username='other'))
+        self.assertEqual(self.client.get(reverse('chunked_upload_status', args=[upload_id])).status_code, 404)
+        self.assertEqual(self.send(upload_id, 0).status_code, 404)
+
+    def test_invalid_start(self):
+        response = self.client.post(reverse('chunked_upload_init'), {'filename': 'a.pdf', 'size': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('chunked_upload_init'), {'filename': '', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_uploads_are_cleaned(self):
+        upload_id = self.start()['upload_id']
+        self.send(upload_id, 0)
+        fresh = self.start()['upload_id']
+        ChunkedUpload.objects.filter(upload_id=upload_id).update(updated_at=timezone.now() - timedelta(hours=25))
+        self.assertEqual(clean_stale_uploads(), (1, 4))
+        self.assertEqual(list(ChunkedUpload.objects.values_list('upload_id', flat=True)), [fresh])
+
+
+class FileMetadataTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='teacher')
+        self.data = pdf_bytes('One', 'Two')
+        for worker in ('preview_worker', 'file_indexer'):
+            self.enterContext(mock.patch(f'myapp.signals.{worker}'))
+        self.page_counter = self.enterContext(mock.patch('myapp.signals.page_counter'))
+
+    def save_note(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Note.objects.create(user=self.user, file=upload)
+
+    def test_in_memory_pdf_is_counted_in_the_background(self):
+        note = self.save_note(SimpleUploadedFile('unit1.pdf', self.data))
+        self.assertEqual((note.file_size, note.mime_type, note.page_count), (len(self.data), 'application/pdf', None))
+        self.assertEqual(note.file_sha256, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(note.file_crc32, zlib.crc32(self.data))
+        self.page_counter.enqueue.assert_called_once_with('myapp.Note', note.id)
+        count_pages('myapp.Note', note.id)
+        note.refresh_from_db()
+        self.assertEqual(note.page_count, 2)
+
+    def test_uploads_on_disk_are_counted_from_their_path(self):
+        upload = TemporaryUploadedFile('unit1.pdf', 'application/pdf', len(self.data), None)
+        upload.write(self.data)
+        upload.seek(0)
+        self.assertEqual(self.save_note(upload).page_count, 2)
+        # A finished chunked upload is opened from its partial file
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        path = os.path.join(upload_dir, 'unit2.part')
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        with open(path, 'rb') as f:
+            self.assertEqual(self.save_note(UploadedFile(f, name='unit2.pdf', size=len(self.data))).page_count, 2)
+        self.page_counter.enqueue.assert_not_called()
+
+    def test_unchanged_file_keeps_its_metadata(self):
+        note = self.save_note(SimpleUploadedFile('notes.txt', b'plain text'))
+        self.assertEqual((note.mime_type, note.page_count), ('text/plain', None))
+        Note.objects.filter(id=note.id).update(file_size=1)
+        note.refresh_from_db()
+        note.topic = 'Renamed'
+        note.save()
+        self.assertEqual(note.file_size, 1)
+        note.file = None
+        note.save()
+        self.assertEqual((note.file_size, note.file_sha256), (None, ''))
+
+    def test_replaced_file_is_not_counted(self):
+        note = self.save_note(SimpleUploadedFile('unit1.pdf', self.data))
+
+        def replaced_while_counting(path):
+            Note.objects.filter(id=note.id).update(file='notes/other.pdf')
+            return 2
+
+        with mock.patch('myapp.file_metadata._pdf_pages', side_effect=replaced_while_counting):
+            count_pages('myapp.Note', note.id)
+        note.refresh_from_db()
+        self.assertIsNone(note.page_count)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher')
+
+    def note(self, topic, text='', **fields):
+        return Note.objects.create(user=self.user, topic=topic, content_html=text, **fields)
+
+    def titles(self, query, **filters):
+        return [result['title'] for result in search(query, filters)['results']]
+
+    def test_title_hits_rank_first(self):
+        self.note('Indexing basics', '<p>How a B-tree works</p>')
+        self.note('Storage', '<p>Indexing makes lookups fast, indexing everywhere</p>')
+        self.assertEqual(self.titles('indexing'), ['Indexing basics', 'Storage'])
+        # The last word matches as a prefix while typing
+        self.assertEqual(self.titles('index'), ['Indexing basics', 'Storage'])
+        self.assertEqual(self.titles('storage index'), ['Storage'])
+
+    def test_snippet_is_escaped_and_marked(self):
+        self.note('Joins', '<p>Use &lt;b&gt; for a join</p>')
+        snippet = search('join')['results'][0]['snippet']
+        self.assertIn('&lt;b&gt; for a <mark>join</mark>', snippet)
+
+    def test_query_syntax_is_taken_literally(self):
+        self.note('Normal forms')
+        self.assertIsNone(match_expression('"*()'))
+        self.assertEqual(match_expression('NOT normal-forms'), '"NOT" "normal" "forms"*')
+        self.assertEqual(self.titles('normal OR'), [])
+        self.assertEqual(search('"')['total'], 0)
+
+    def test_facets_and_filters(self):
+        self.note('Joins one', department='CSE', year='2025')
+        self.note('Joins two', department='IT', year='2025')
+        Assignment.objects.create(user=self.user, topic='Joins homework', description='', department='CSE')
+        result = search('joins', {'department': 'CSE'})
+        self.assertEqual(result['total'], 2)
+        # Facet counts ignore the filters, so every alternative stays visible
+        self.assertEqual(dict(result['facets']['department']), {'CSE': 2, 'IT': 1})
+        self.assertEqual(dict(result['facets']['kind']), {'note': 2, 'assignment': 1})
+        self.assertEqual(self.titles('joins', kind='assignment'), ['Joins homework'])
+
+    def test_only_approved_content_is_found(self):
+        content = make_content(self.user, approval_status='pending', description='Relational algebra')
+        self.assertEqual(search('algebra')['total'], 0)
+        content.approval_status = 'approved'
+        content.save()
+        self.assertEqual(self.titles('algebra'), ['DBMS - Notes'])
+        content.delete()
+        self.assertEqual(search('algebra')['total'], 0)
+
+    def test_pages(self):
+        for number in range(PAGE_SIZE + 1):
+            self.note(f'Transactions {number}')
+        result = search('transactions', page=9)
+        self.assertEqual((result['total'], result['pages'], result['page'], len(result['results'])), (21, 2, 2, 1))
+
+
+class FileTextTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_formats(self):
+        self.assertEqual(extract_text(self.write('a.pdf', pdf_bytes('Page one', 'Page two')))[0], 'Page one Page two')
+        self.assertEqual(extract_text(self.write('a.docx', docx_bytes('Hello', 'world')))[0], 'Hello world')
+        self.assertEqual(extract_text(self.write('a.txt', 'Plain\n text é'.encode()))[0], 'Plain text é')
+        self.assertEqual(extract_text(self.write('a.zip', b'PK'))[0], '')
+        slides = io.BytesIO()
+        with zipfile.ZipFile(slides, 'w') as archive:
+            for number, text in ((2, 'Second'), (10, 'Tenth'), (1, 'First')):
+                archive.writestr(f'ppt/slides/slide{number}.xml',
+                                 '<p:sld xmlns:p="p" xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+                                 f'<a:t>{text}</a:t></p:sld>')
+        self.assertEqual(extract_text(self.write('a.pptx', slides.getvalue()))[0], 'First Second Tenth')
+
+    def test_chunks_break_at_spaces(self):
+        self.assertEqual(chunk_text('alpha beta gamma', size=8), ['alpha', 'beta', 'gamma'])
+        self.assertEqual(chunk_text('abcdefghij', size=4), ['abcd', 'efgh', 'ij'])
+
+
+class FileIndexTests(MediaTestCase):
+    def setUp(self):
+        # Extraction runs on a thread here instead of a spawned worker process
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        self.enterContext(mock.patch('myapp.file_index._pool', return_value=pool))
+        self.user = User.objects.create(username='teacher')
+
+    def note(self, name, data):
+        return Note.objects.create(user=self.user, topic='Unit 1',
+                                   file=default_storage.save(f'notes/{name}', ContentFile(data)))
+
+    def test_file_text_is_searchable(self):
+        note = self.note('unit1.txt', b'Serializable isolation prevents anomalies')
+        self.assertEqual(pending_files(), [('note', note.id)])
+        self.assertEqual(index_files(pending_files()), (1, 0, 0))
+        result = search('anomalies')['results']
+        self.assertEqual([(r['id'], r['in_file']) for r in result], [(note.id, True)])
+        self.assertIn('<mark>anomalies</mark>', result[0]['snippet'])
+        self.assertEqual(pending_files(), [])
+        # Unchanged content is not extracted again
+        self.assertEqual(index_files([('note', note.id)]), (0, 1, 0))
+
+    def test_changed_file_is_indexed_again(self):
+        note = self.note('unit1.txt', b'first version')
+        index_files([('note', note.id)])
+        note.file = SimpleUploadedFile('unit1.txt', b'second version')
+        note.save()
+        self.assertEqual(pending_files(), [('note', note.id)])
+        index_files(pending_files())
+        self.assertEqual(search('second')['total'], 1)
+        self.assertEqual(search('first')['total'], 0)
+
+    def test_failures(self):
+        note = self.note('unit1.txt', b'text')
+        with mock.patch('myapp.file_index.extract_text', side_effect=ValueError('bad file')), \
+                self.assertLogs('myapp.file_index', 'WARNING'):
+            self.assertEqual(index_files([('note', note.id)]), (0, 0, 1))
+        # Recorded against the hash, so it isn't retried until the file changes
+        self.assertEqual(IndexedFile.objects.get().error, 'bad file')
+        self.assertEqual(pending_files(), [])
+
+    def test_dead_worker_leaves_file_pending(self):
+        note = self.note('unit1.txt', b'text')
+        broken = Future()
+        broken.set_exception(BrokenProcessPool())
+        with mock.patch('myapp.file_index._pool') as pool, mock.patch('myapp.file_index._discard_pool') as discard, \
+                self.assertLogs('myapp.file_index', 'WARNING'):
+            pool.return_value.submit.return_value = broken
+            self.assertEqual(index_files([('note', note.id)]), (0, 0, 1))
+        discard.assert_called_once()
+        self.assertEqual(pending_files(), [('note', note.id)])
+
+
+class AutocompleteTests(TestCase):
+    def index(self, *values):
+        index = TrigramIndex()
+        for value in values:
+            index.add(value)
+        return index
+
+    def best(self, index, query):
+        return [value for value, _ in index.search(query)][:1]
+
+    def test_typos_initials_and_prefixes(self):
+        index = self.index('Compiler Design', 'Computer Networks', 'Data Base Management System', 'Operating Systems')
+        self.assertEqual(self.best(index, 'Compiler Desgin'), ['Compiler Design'])
+        self.assertEqual(self.best(index, 'dbms'), ['Data Base Management System'])
+        self.assertEqual(self.best(index, 'oper'), ['Operating Systems'])
+        self.assertEqual(index.search('zzzz'), [])
+        self.assertEqual(index.search('  '), [])
+
+    def test_duplicates_counted_once_and_rank_higher(self):
+        index = self.index('Networks Lab', 'networks  lab', 'Networks Theory')
+        self.assertEqual(len(index.values), 2)
+        self.assertEqual([value for value, _ in index.search('networks')], ['Networks Lab', 'Networks Theory'])
+
+    def test_source_picks_up_new_and_edited_rows(self):
+        user = User.objects.create(username='teacher')
+        course = Course.objects.create(user=user, title='Compiler Design', description='')
+        source = _Source('course')
+        self.assertEqual(self.best(source.get(), 'compiler'), ['Compiler Design'])
+        Course.objects.create(user=user, title='Cloud Computing', description='')
+        with mock.patch('myapp.autocomplete.REFRESH_SECONDS', -1), \
+                mock.patch('myapp.autocomplete.autocomplete_rebuilder') as rebuilder:
+            self.assertEqual(self.best(source.get(), 'cloud'), ['Cloud Computing'])
+            rebuilder.enqueue.assert_not_called()
+            # A rename can only be taken out by a rebuild, which runs off the lock
+            course.title = 'Compiler Construction'
+            course.save()
+            source.get()
+            rebuilder.enqueue.assert_called_once_with(source)
+        self.assertEqual(self.best(source.get(), 'compiler design'), ['Compiler Design'])
+        source.rebuild()
+        self.assertFalse(source.rebuilding)
+        self.assertEqual(self.best(source.get(), 'compiler'), ['Compiler Construction'])
+        self.assertNotIn('Compiler Design', source.get().values)
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(id=1, username='teacher')
+        make_content(user, subject='DBMS', semester='3')
+        make_content(user, subject='DBMS', semester='3', section='A2')
+        make_content(user, subject='OS', semester='4')
+        make_content(user, subject='Compilers', semester='5', approval_status='pending')
+
+    def test_unfiltered(self):
+        counts = facet_counts({})
+        self.assertEqual(counts['subject'], [('DBMS', 2), ('OS', 1)])
+        self.assertEqual(counts['semester'], [('3', 2), ('4', 1)])
+
+    def test_filter_skips_own_facet(self):
+        counts = facet_counts({'semester': '3'})
+        # The semester dropdown still lists every reachable semester
+        self.assertEqual(counts['semester'], [('3', 2), ('4', 1)])
+        self.assertEqual(counts['subject'], [('DBMS', 2)])
+        self.assertEqual(counts['section'], [('A1', 1), ('A2', 1)])
+
+    def test_selected_value_without_matches(self):
+        counts = facet_counts({'subject': 'OS', 'section': 'A2'})
+        self.assertEqual(counts['subject'], [('DBMS', 1), ('OS', 0)])
+        self.assertEqual(counts['section'], [('A1', 1), ('A2', 0)])
+        self.assertEqual(counts['year'], [])
+
+    def test_year_matches_as_string(self):
+        self.assertEqual(facet_counts({'year': '2025'})['subject'], [('DBMS', 2), ('OS', 1)])
+        self.assertEqual(facet_counts({'year': '2024'})['year'], [('2024', 0), (2025, 3)])
+
+    def test_cached_counts_follow_changes(self):
+        facet_counts({})
+        with self.assertNumQueries(1):
+            facet_counts({})
+        content = TeacherSubjectContent.objects.get(subject='Compilers')
+        content.approval_status = 'approved'
+        content.save()
+        self.assertIn(('Compilers', 1), facet_counts({})['subject'])
+        content.delete()
+        self.assertNotIn('Compilers', dict(facet_counts({})['subject']))
+
+
+class KeysetPaginationTests(TestCase):
+    def test_cursor_round_trip(self):
+        content = TeacherSubjectContent(id=42, uploaded_at=datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc))
+        self.assertEqual(decode_cursor(encode_cursor(content)), (content.uploaded_at, 42))
+
+    def test_malformed_cursors(self):
+        for cursor in (None, '', 'abc', '1.2.3', '12', 'x.5', '9' * 400 + '.1'):
+            self.assertIsNone(decode_cursor(cursor), cursor)
+
+    def test_pages_cover_ties_once(self):
+        user = User.objects.create(id=1, username='teacher')
+        moment = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        # Several rows share a timestamp, so the id must break ties
+        ids = [make_content(user, uploaded_at=moment - timedelta(days=i // 3)).id for i in range(8)]
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(TeacherSubjectContent.objects.all(), cursor, size=3)
+            seen += [row.id for row in rows]
+            if cursor is None:
+                break
+        # Newest first, ties broken by the higher id, every row exactly once
+        expected = list(TeacherSubjectContent.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(sorted(seen), sorted(ids))
+
+
+def essay(seed, words=200):
+    rng = np.random.default_rng(seed)
+    return ' '.join(f'word{n}' for n in rng.integers(0, 5000, words))
+
+
+class NearDuplicateTests(TestCase):
+    def setUp(self):
+        self.text = essay(1)
+        words = self.text.split()
+        words[100] = 'changed'
+        self.edited = ' '.join(words)
+        self.user = User.objects.create(username='teacher')
+
+    def test_signature_estimates_jaccard(self):
+        a, b = shingles(self.text), shingles(self.edited)
+        jaccard = len(np.intersect1d(a, b)) / len(np.union1d(a, b))
+        sig_a, sig_b = (from_bytes(document_signature(text)[0]) for text in (self.text, self.edited))
+        self.assertAlmostEqual(similarity(sig_a, sig_b), jaccard, delta=0.1)
+        self.assertEqual(similarity(sig_a, from_bytes(document_signature(self.text.upper())[0])), 1.0)
+        self.assertLess(similarity(sig_a, from_bytes(document_signature(essay(2))[0])), 0.1)
+
+    def test_short_texts_are_not_signed(self):
+        self.assertIsNone(document_signature(' '.join(['word'] * (MIN_SHINGLES + SHINGLE_WORDS - 2))))
+        self.assertEqual(len(shingles('too few words')), 0)
+
+    def test_bands_differ_for_identical_values(self):
+        keys = band_keys(np.zeros(128, dtype=np.uint32))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_upload_is_flagged_against_earlier_content(self):
+        original, copy, other = (make_content(self.user) for _ in range(3))
+        self.assertEqual(check_content(original.id, document_signature(self.text)), [])
+        matches = check_content(copy.id, document_signature(self.edited))
+        self.assertEqual([content_id for content_id, _ in matches], [original.id])
+        check_content(other.id, document_signature(essay(2)))
+        copy.refresh_from_db()
+        self.assertEqual(copy.duplicate_of, original)
+        self.assertGreaterEqual(copy.duplicate_similarity, 0.8)
+        original.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIsNone(original.duplicate_of)
+        self.assertIsNone(other.duplicate_of)
+        # A replaced file too short to sign clears the flag
+        check_content(copy.id, None)
+        copy.refresh_from_db()
+        self.assertIsNone(copy.duplicate_of)
+
+    def test_cluster_corpus(self):
+        first, second, third, lone = (make_content(self.user) for _ in range(4))
+        for content, text in ((first, self.text), (second, self.edited), (third, self.text), (lone, essay(2))):
+            check_content(content.id, document_signature(text))
+        TeacherSubjectContent.objects.filter(id=lone.id).update(duplicate_of=first)
+        self.assertEqual(cluster_corpus(), [[first.id, second.id, third.id]])
+        self.assertEqual(dict(TeacherSubjectContent.objects.values_list('id', 'duplicate_of')),
+                         {first.id: None, second.id: first.id, third.id: first.id, lone.id: None})
+
+
+class PlagiarismTests(TestCase):
+    ESSAY = ('normalisation removes redundancy from a relational schema by splitting tables so that every '
+             'non key attribute depends on the key the whole key and nothing but the key')
+
+    def test_winnowing_ignores_case_and_punctuation(self):
+        original = winnowing.fingerprints(self.ESSAY)
+        disguised = winnowing.fingerprints(self.ESSAY.upper().replace(' ', ',  '))
+        self.assertGreater(len(original), 0)
+        np.testing.assert_array_equal(original, disguised)
+        self.assertEqual(len(winnowing.fingerprints('too short')), 0)
+
+    def test_shared_run_gives_common_fingerprint(self):
+        run = ' '.join(self.ESSAY.split()[:winnowing.WINDOW + winnowing.K - 1])
+        first = winnowing.fingerprints(f'completely different opening words here {run} and another ending')
+        second = winnowing.fingerprints(f'{run} followed by text nobody else wrote at all')
+        self.assertTrue(len(np.intersect1d(first, second)))
+
+    def test_find_similar_pairs(self):
+        copied = winnowing.fingerprints(self.ESSAY)
+        own = winnowing.fingerprints('a completely independent answer about transactions locking and '
+                                     'recovery written in the student own words with no overlap whatsoever')
+        pairs = find_similar_pairs({1: copied, 2: copied.copy(), 3: own})
+        self.assertEqual([(first, second) for first, second, _, _ in pairs], [(1, 2)])
+        self.assertEqual(pairs[0][3], 1.0)
+        # Fingerprints from the question paper don't count
+        self.assertEqual(find_similar_pairs({1: copied, 2: copied.copy()}, ignore=copied), [])
+
+class PlagiarismCheckTests(MediaTestCase):
+    def setUp(self):
+        # Fingerprinting runs on a thread here instead of a spawned worker process
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        self.enterContext(mock.patch('myapp.plagiarism._pool', return_value=pool))
+        teacher = User.objects.create(username='teacher')
+        self.assignment = Assignment.objects.create(user=teacher, description='Essay', topic='Normalisation')
+        self.copied = essay(1)
+        self.students = iter(User.objects.create(username=f'student{n}') for n in range(10))
+
+    def submit(self, text):
+        name = default_storage.save('submissions/essay.txt', ContentFile(text.encode()))
+        return Submission.objects.create(assignment=self.assignment, student=next(self.students), file=name)
+
+    def test_copied_submissions_are_reported(self):
+        first, second, _ = self.submit(self.copied), self.submit(self.copied), self.submit(essay(2))
+        self.assertEqual(check_assignment(self.assignment.id), 1)
+        pair = similarity_report(self.assignment).get()
+        self.assertEqual((pair.first_id, pair.second_id, pair.similarity), (first.id, second.id, 1.0))
+        self.assertEqual(SubmissionFingerprint.objects.count(), 3)
+        self.assignment.refresh_from_db()
+        self.assertIsNotNone(self.assignment.similarity_checked_at)
+
+    def test_only_new_files_are_fingerprinted(self):
+        for seed in (1, 2, 3):
+            self.submit(essay(seed))
+        check_assignment(self.assignment.id)
+        self.submit(self.copied)
+        with mock.patch('myapp.plagiarism._fingerprint_inline', wraps=_fingerprint_inline) as inline, \
+                mock.patch('myapp.plagiarism._pool') as pool:
+            self.assertEqual(check_assignment(self.assignment.id), 1)
+        # A single new file is done inline, without the pool
+        self.assertEqual(len(inline.call_args.args[0]), 1)
+        pool.assert_not_called()
+
+    def test_question_text_is_ignored(self):
+        replace_file_chunks('assignment', self.assignment.id, chunk_text(self.copied))
+        self.submit(self.copied)
+        self.submit(self.copied)
+        self.assertEqual(check_assignment(self.assignment.id), 0)
+
+    def test_dead_worker_leaves_submission_for_next_check(self):
+        for seed in (1, 2, 3):
+            self.submit(essay(seed))
+        broken = Future()
+        broken.set_exception(BrokenProcessPool())
+        with mock.patch('myapp.plagiarism._pool') as pool, mock.patch('myapp.plagiarism._discard_pool') as discard, \
+                self.assertLogs('myapp.plagiarism', 'WARNING'):
+            pool.return_value.submit.return_value = broken
+            check_assignment(self.assignment.id)
+        discard.assert_called()
+        self.assertFalse(SubmissionFingerprint.objects.exists())
+        check_assignment(self.assignment.id)
+        self.assertEqual(SubmissionFingerprint.objects.count(), 3)
+
+    def test_pool_is_kept_between_checks(self):
+        with mock.patch.dict('myapp.plagiarism._pools', clear=True), \
+                mock.patch('myapp.plagiarism.ProcessPoolExecutor') as executor:
+            self.assertIs(_pool(2), _pool(2))
+            executor.assert_called_once()
+            _discard_pool(2)
+            executor.return_value.shutdown.assert_called_once()
+            _pool(2)
+            self.assertEqual(executor.call_count, 2)
+
+    def test_schedule_check_queues_once(self):
+        with mock.patch.object(plagiarism_checker, 'enqueue') as enqueue, \
+                mock.patch('myapp.plagiarism.check_assignment'):
+            schedule_check(self.assignment.id)
+            schedule_check(self.assignment.id)
+            enqueue.assert_called_once_with(self.assignment.id)
+            # Once the check starts, new submissions queue another
+            _run_check(self.assignment.id)
+            schedule_check(self.assignment.id)
+            self.assertEqual(enqueue.call_count, 2)
+
+
+class FakeFile:
+    """Just enough of a FieldFile for ZipStream."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def open(self, mode='rb'):
+        return io.BytesIO(self.data)
+
+
+class ZipStreamTests(TestCase):
+    def setUp(self):
+        moment = datetime(2026, 3, 1, 10, 0, tzinfo=dt_timezone.utc)
+        self.files = {'DBMS/unit1.pdf': b'%PDF unit one' * 1000, 'OS/notes.txt': b'', 'OS/lab.txt': b'lab'}
+        self.archive = ZipStream([
+            ZipEntry(name, FakeFile(name, data), len(data), zlib.crc32(data), moment)
+            for name, data in self.files.items()
+        ])
+        self.body = b''.join(self.archive.stream())
+
+    def test_whole_archive(self):
+        self.assertEqual(len(self.body), self.archive.size)
+        archive = zipfile.ZipFile(io.BytesIO(self.body))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual({name: archive.read(name) for name in archive.namelist()}, self.files)
+
+    def test_ranges(self):
+        size = self.archive.size
+        for start, end in ((0, 0), (0, 99), (30, 5000), (size - 10, size - 1), (0, size - 1)):
+            self.assertEqual(b''.join(self.archive.stream(start, end)), self.body[start:end + 1], (start, end))
+        # Pieces resumed one after another give the whole archive
+        pieces = [b''.join(self.archive.stream(start, min(start + 999, size - 1))) for start in range(0, size, 1000)]
+        self.assertEqual(b''.join(pieces), self.body)
+
+    def test_etag_changes_with_content(self):
+        name = 'OS/lab.txt'
+        changed = ZipStream([entry if entry.name != name else entry._replace(crc32=entry.crc32 + 1)
+                             for entry in self.archive.entries])
+        self.assertNotEqual(changed.etag, self.archive.etag)
+
+class SemesterBundleTests(MediaTestCase):
+    def setUp(self):
+        teacher = User.objects.create(username='teacher')
+        self.client.force_login(User.objects.create(username='student'))
+        self.first = make_content(teacher, file=SimpleUploadedFile('unit1.txt', b'normal forms'))
+        # Same file name in another folder of storage
+        name = default_storage.save('older/unit1.txt', ContentFile(b'transactions'))
+        self.second = make_content(teacher, file=name)
+        self.odd = make_content(teacher, subject='..', file=SimpleUploadedFile('lab.txt', b'lab'))
+        make_content(teacher, approval_status='pending', file=SimpleUploadedFile('draft.txt', b'draft'))
+        make_content(teacher, semester='4', file=SimpleUploadedFile('next.txt', b'next term'))
+        self.url = reverse('semester_bundle') + '?department=CSE&semester=3'
+
+    def download(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        return response, b''.join(response.streaming_content)
+
+    def test_bundle(self):
+        response, body = self.download()
+        self.assertEqual(int(response['Content-Length']), len(body))
+        archive = zipfile.ZipFile(io.BytesIO(body))
+        # Same-named files are numbered, and a subject that isn't a usable folder name goes under Other
+        self.assertEqual({name: archive.read(name) for name in archive.namelist()},
+                         {'DBMS/unit1.txt': b'normal forms', 'DBMS/unit1 (2).txt': b'transactions',
+                          'Other/lab.txt': b'lab'})
+
+    def test_range_resumes_only_the_same_bundle(self):
+        _, body = self.download()
+        etag = self.client.get(self.url)['ETag']
+        response, part = self.download(Range='bytes=10-99', If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-99/{len(body)}')
+        self.assertEqual(part, body[10:100])
+        response, whole = self.download(Range='bytes=10-99', If_Range='"stale"')
+        self.assertEqual((response.status_code, whole), (200, body))
+
+    def test_missing_crc_is_filled_in_the_background(self):
+        TeacherSubjectContent.objects.filter(id=self.second.id).update(file_crc32=None)
+        with mock.patch.object(crc_worker, 'enqueue') as enqueue:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        enqueue.assert_called_once_with('myapp.TeacherSubjectContent', [self.second.id])
+        _fill_rows(*enqueue.call_args.args)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.file_crc32, zlib.crc32(b'transactions'))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
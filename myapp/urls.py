@@ -8,6 +8,7 @@ urlpatterns = [
     path('student/dashboard/', views.student_dashboard, name='student_dashboard'),
 
     path('student/semister-content/', views.student_semister_content, name='student_semister_content'),
+    path('student/semister-content/download/', views.semester_bundle, name='semester_bundle'),
     path('student/semester-progress/', views.semester_progress, name='semester_progress'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('logout/', views.logout_view, name='logout'),
@@ -18,17 +19,27 @@ urlpatterns = [
     path('course/<int:course_id>/notes/', views.course_notes, name='course_notes'),
     path('course/<int:course_id>/notes/add/', views.add_note_to_course, name='add_note_to_course'),
     path('note/<int:note_id>/download-pdf/', views.download_note_html_as_pdf, name='download_note_html_as_pdf'),
+    path('note/<int:note_id>/extraction-status/', views.note_extraction_status, name='note_extraction_status'),
     path('upload_image/', views.upload_image, name='upload_image'),
+    path('upload/chunked/', views.chunked_upload_init, name='chunked_upload_init'),
+    path('upload/chunked/<str:upload_id>/', views.chunked_upload_status, name='chunked_upload_status'),
+    path('upload/chunked/<str:upload_id>/<int:index>/', views.chunked_upload_chunk, name='chunked_upload_chunk'),
     path('course/edit/<int:course_id>/', views.edit_course, name='edit_course'),
     path('course/delete/<int:course_id>/', views.delete_course, name='delete_course'),
     path('quiz/add/', views.add_quiz, name='add_quiz'),
     path('quiz/edit/<int:quiz_id>/', views.edit_quiz, name='edit_quiz'),
     path('quiz/delete/<int:quiz_id>/', views.delete_quiz, name='delete_quiz'),
+    path('quiz/<int:quiz_id>/import-questions/', views.import_quiz_questions, name='import_quiz_questions'),
+    path('quiz/<int:quiz_id>/item-analysis/', views.quiz_item_analysis, name='quiz_item_analysis'),
     path('question/add/', views.add_question, name='add_question'),
     path('quiz/attempt/<int:quiz_id>/', views.attempt_quiz, name='attempt_quiz'),
+    path('quiz/attempt/<int:quiz_id>/autosave/', views.autosave_quiz, name='autosave_quiz'),
     path('quiz/results/', views.view_results, name='view_results'),
     path('scoreboard/', views.scoreboard, name='scoreboard'),
 
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('search/status/', views.search_index_status, name='search_index_status'),
     path('courses/', views.courses, name='courses'),
     path('assignments/', views.assignments, name='assignments'),
     path('assignment/<int:assignment_id>/', views.assignment_detail, name='assignment_detail'),
@@ -59,6 +70,7 @@ urlpatterns = [
     path('teacher/subject-content/', views.teacher_subject_content, name='teacher_subject_content'),
     path('teacher/content/delete/<int:content_id>/', views.delete_teacher_content, name='delete_teacher_content'),
     path('teacher/content/edit/<int:content_id>/', views.edit_teacher_content, name='edit_teacher_content'),
+    path('teacher/content/download/<int:content_id>/', views.download_teacher_content, name='download_teacher_content'),
     path('documents/', views.documents, name='documents'),
     path('documents/set-pin/', views.set_pin, name='set_pin'),
     path('documents/verify-pin/', views.verify_pin, name='verify_pin'),
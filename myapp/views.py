@@ -1,27 +1,56 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.template.loader import render_to_string
-from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404, FileResponse, HttpResponseNotModified
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
-from .models import Course, Question, StudentProfile, Assignment, Note, Quiz, QuizAttempt, Category, Submission, TeacherProfile, ResearchPaper, UserAnswer, TeacherSubjectContent, PasswordResetToken, StudentDocument, TeacherDocument
+from .models import Course, Question, StudentProfile, Assignment, Note, Quiz, QuizAttempt, Category, Submission, TeacherProfile, ResearchPaper, TeacherSubjectContent, PasswordResetToken, StudentDocument, TeacherDocument, StudentRecommendation, ContentDownload, ContentRecommendation, ChunkedUpload
 from .forms import CourseForm, NoteForm, AssignmentForm, CategoryForm, TeacherForm, StudentForm, TeacherSubjectContentForm
 from .utils import classifier
+from .grading import get_answer_key, collect_answers, score_answers
+from .autosave import (
+    answer_buffer, issue_attempt_token, read_attempt_token, saved_answers,
+    elapsed_seconds, is_expired, AUTOSAVE_INTERVAL,
+)
+from .ingest import SubmissionPending, submission_ingestor
+from .answer_sheets import pack_answers
+from .item_analysis import item_analysis, flag_items
+from .question_import import QuestionImportError, iter_file_rows, iter_json_rows, validate_rows, save_questions
+from .extraction import is_extractable, note_extractor
+from .pdf_cache import note_pdf_key, open_note_pdf
+from .media import can_access, file_response, parse_range
+from .previews import attach_previews
+from .images import image_worker
+from .search import FACETS, search as search_index
+from .file_index import index_stats
+from .autocomplete import SOURCES as AUTOCOMPLETE_FIELDS, suggest
+from .facets import facet_counts
+from .pagination import keyset_page
+from .plagiarism import schedule_check, similarity_report
+from .zip_stream import ZipEntry, ZipStream, schedule_crc32
+from .chunked_upload import (
+    ChunkedUploadError, chunked_upload_files, finish_upload, release_upload, start_upload, upload_state, write_chunk,
+)
 import logging
-import fitz  # PyMuPDF
-from docx import Document
-from weasyprint import HTML
-from io import BytesIO
 from django.utils import timezone
-from django.core.files.storage import FileSystemStorage
+from django.utils.text import get_valid_filename, slugify
+from django.db import DatabaseError, transaction
+from django.db.models import Q, Sum
+from django.core.files.storage import default_storage
 from django.conf import settings
 import json
 import requests
 import secrets
 from django.core.mail import send_mail
 from datetime import timedelta
+import os
+import posixpath
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
 
 
 @login_required
@@ -59,14 +88,14 @@ def student_dashboard(request):
     }
 
     # Recent Quiz Results
-    recent_attempts = QuizAttempt.objects.filter(student=request.user).order_by('-attempted_at')[:5]
+    recent_attempts = QuizAttempt.objects.filter(student=request.user).select_related('quiz__course').order_by('-attempted_at')[:5]
     quizzes = []
     for attempt in recent_attempts:
         quiz = attempt.quiz
         quizzes.append({
             'title': quiz.title,
             'course': quiz.course.title if quiz.course else 'General',
-            'score': round((attempt.score / attempt.total_questions) * 100) if attempt.total_questions > 0 else 0
+            'score': attempt.score_percentage
         })
 
     # Upcoming Deadlines - using Assignments as example
@@ -80,12 +109,17 @@ def student_dashboard(request):
             'due_in': due_in
         })
 
-    # AI Recommendations - static for now
-    recommendations = [
-        'Complete your first course to unlock advanced features.',
-        'Try attempting a quiz to test your knowledge.',
-        'Explore the resources section for additional materials.'
-    ]
+    # AI Recommendations - precomputed nightly by compute_recommendations
+    recommendations = StudentRecommendation.objects.filter(student=request.user).values_list('recommendations', flat=True).first()
+    if not recommendations:
+        recommendations = [
+            'Complete your first course to unlock advanced features.',
+            'Try attempting a quiz to test your knowledge.',
+            'Explore the resources section for additional materials.'
+        ]
+
+    # Students like you also used - precomputed by compute_content_recommendations
+    similar_items = ContentRecommendation.objects.filter(user=request.user).values_list('items', flat=True).first() or []
 
     context = {
         "courses": courses,
@@ -94,7 +128,8 @@ def student_dashboard(request):
         "progress_list": progress_list,
         "quizzes": quizzes,
         "deadlines": deadlines,
-        "recommendations": recommendations
+        "recommendations": recommendations,
+        "similar_items": similar_items
     }
     return render(request, "student_dashboard.html", context)
 
@@ -155,9 +190,7 @@ def add_course(request):
             course = Course.objects.create(title=course_name, description=description, category=category, duration=duration)
             if course_file:
                 # Assuming Course model has file field, but it doesn't; for now, just save file to media
-                from django.core.files.storage import FileSystemStorage
-                fs = FileSystemStorage()
-                filename = fs.save(f'courses/{course_file.name}', course_file)
+                filename = default_storage.save(f'courses/{course_file.name}', course_file)
                 # Note: Course model needs file field to store this; add later if needed
             messages.success(request, 'Course added successfully!')
             return redirect("admin_dashboard")  # success ke baad admin dashboard par bhej do
@@ -488,7 +521,8 @@ def teacher_subject_content(request):
         return redirect('student_dashboard')
 
     if request.method == 'POST':
-        form = TeacherSubjectContentForm(request.POST, request.FILES, initial={'teacher_name': teacher_profile.name})
+        files, chunked = chunked_upload_files(request)
+        form = TeacherSubjectContentForm(request.POST, files, initial={'teacher_name': teacher_profile.name})
         if form.is_valid():
             content = form.save(commit=False)
             content.user = request.user
@@ -498,9 +532,11 @@ def teacher_subject_content(request):
                 content.profile_photo.save(teacher_profile.image.name, teacher_profile.image.file, save=False)
             content.approval_status = 'pending'  # Set to pending for admin approval
             content.save()
+            finish_upload(chunked, files)
             messages.success(request, 'Content uploaded successfully and is pending approval!')
             return redirect('teacher_subject_content')
         else:
+            release_upload(chunked, files)
             messages.error(request, 'Please fill all required fields and select a file.')
     else:
         form = TeacherSubjectContentForm()
@@ -560,6 +596,15 @@ def delete_teacher_content(request, content_id):
         return redirect('teacher_subject_content')
     return render(request, 'confirm_delete.html', {'object': content, 'type': 'content'})
 
+@login_required
+def download_teacher_content(request, content_id):
+    # Record the download for recommendations, then hand over to the file itself
+    content = get_object_or_404(TeacherSubjectContent, id=content_id, approval_status='approved')
+    if not content.file:
+        raise Http404("No file available for download.")
+    ContentDownload.objects.create(user=request.user, item_type='content', object_id=content.id)
+    return redirect(content.file.url)
+
 @login_required
 @csrf_protect
 def edit_teacher_content(request, content_id):
@@ -637,6 +682,7 @@ def add_quiz(request):
         time_limit = request.POST.get('time_limit')
         course_id = request.POST.get('course')
         questions_data = request.POST.get('questions')
+        questions_file = request.FILES.get('questions_file')
 
         if title and description and course_id:
             course = get_object_or_404(Course, id=course_id)
@@ -645,34 +691,33 @@ def add_quiz(request):
                 messages.error(request, 'You do not have permission to add quiz to this course.')
                 return render(request, "add_quiz_form.html", {"courses": courses})
 
-            quiz = Quiz.objects.create(
-                title=title,
-                description=description,
-                course=course,
-                time_limit=time_limit or 0,
-                marks_per_question=total_marks or 1,
-                total_questions=0
-            )
+            # Validate every question before anything is written, so a bad row
+            # is reported instead of silently dropping the whole bank
+            questions = []
+            import_errors = []
+            try:
+                if questions_file:
+                    questions, import_errors = validate_rows(iter_file_rows(questions_file))
+                elif questions_data:
+                    questions, import_errors = validate_rows(iter_json_rows(questions_data))
+            except QuestionImportError as e:
+                import_errors = [(None, str(e))]
+            if import_errors:
+                messages.error(request, 'Quiz was not saved. Fix the questions below and try again.')
+                return render(request, "add_quiz_form.html", {"courses": courses, "import_errors": import_errors})
+
+            with transaction.atomic():
+                quiz = Quiz.objects.create(
+                    title=title,
+                    description=description,
+                    course=course,
+                    time_limit=time_limit or 0,
+                    marks_per_question=total_marks or 1,
+                    total_questions=0
+                )
+                save_questions(quiz, questions)
 
-            if questions_data:
-                try:
-                    questions = json.loads(questions_data)
-                    for q in questions:
-                        Question.objects.create(
-                            quiz=quiz,
-                            text=q['text'],
-                            option_a=q['options']['A'],
-                            option_b=q['options']['B'],
-                            option_c=q['options']['C'],
-                            option_d=q['options']['D'],
-                            correct_answer=q['correct']
-                        )
-                    quiz.total_questions = len(questions)
-                    quiz.save()
-                except json.JSONDecodeError:
-                    pass  # Handle error if needed
-
-            messages.success(request, 'Quiz added successfully!')
+            messages.success(request, f'Quiz added successfully with {len(questions)} questions!')
             # Redirect based on user role
             if request.user.is_staff:
                 return redirect("admin_dashboard")
@@ -682,6 +727,29 @@ def add_quiz(request):
             messages.error(request, 'Please fill all required fields.')
     return render(request, "add_quiz_form.html", {"courses": courses})
 
+@login_required
+@csrf_protect
+def import_quiz_questions(request, quiz_id):
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    if not request.user.is_staff and not TeacherProfile.objects.filter(user=request.user, courses=quiz.course).exists():
+        return JsonResponse({'success': False, 'message': 'You do not have permission to edit this quiz.'}, status=403)
+    if request.method != "POST" or not request.FILES.get('questions_file'):
+        return JsonResponse({'success': False, 'message': 'Upload a .json, .csv or .xlsx file.'}, status=400)
+
+    try:
+        questions, import_errors = validate_rows(iter_file_rows(request.FILES['questions_file']))
+    except QuestionImportError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if import_errors:
+        return JsonResponse({
+            'success': False,
+            'message': 'No questions were imported.',
+            'errors': [{'row': row, 'error': error} for row, error in import_errors],
+        }, status=400)
+
+    created = save_questions(quiz, questions)
+    return JsonResponse({'success': True, 'created': created, 'total_questions': quiz.total_questions})
+
 @login_required
 @csrf_protect
 def edit_quiz(request, quiz_id):
@@ -705,35 +773,117 @@ def delete_quiz(request, quiz_id):
 @csrf_protect
 def attempt_quiz(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id)
-    questions = quiz.questions.all()
+    session_key = f'quiz_attempt_{quiz.id}'
     if request.method == "POST":
-        score = 0
-        total = questions.count()
-        user_answers = []
-        for question in questions:
-            selected = request.POST.get(f'question_{question.id}')
-            is_correct = selected == question.correct_answer if selected else False
-            if is_correct:
-                score += 1
-            user_answers.append(UserAnswer(
-                user=request.user,
-                quiz=quiz,
-                question=question,
-                answer=selected if selected else None,
-                is_correct=is_correct
-            ))
-        # Calculate time taken (assuming quiz started at page load, but for simplicity, set to time_limit)
-        time_taken = quiz.time_limit * 60  # in seconds
-        attempt = QuizAttempt.objects.create(student=request.user, quiz=quiz, score=score, total_questions=total, time_taken=time_taken)
-        for ua in user_answers:
-            ua.attempt = attempt
-        UserAnswer.objects.bulk_create(user_answers)
+        # Grade against the cached answer key; the attempt is written in a
+        # single batched transaction.
+        answer_key = get_answer_key(quiz)
+        payload = read_attempt_token(request.POST.get('attempt_token'), request.user.id, quiz.id)
+        if payload is None:
+            messages.error(request, "This quiz attempt could not be verified. Please start the quiz again.")
+            return redirect('attempt_quiz', quiz_id=quiz.id)
+        # Start from the autosaved answers; the posted form wins where both exist,
+        # but past the deadline only the answers autosaved in time count
+        submitted = {f'question_{question_id}': option for question_id, option in saved_answers(payload).items()}
+        if not is_expired(payload, quiz.time_limit):
+            submitted.update((name, value) for name, value in request.POST.items() if value)
+        answers = collect_answers(submitted, answer_key)
+        score, results = score_answers(quiz, answer_key, answers)
+        # Time is measured on the server from the signed start token
+        time_taken = min(elapsed_seconds(payload), quiz.time_limit * 60)
+        # Answers are packed into the attempt row instead of one UserAnswer row per question
+        attempt = QuizAttempt(
+            student=request.user,
+            quiz=quiz,
+            score=score,
+            total_questions=len(answer_key),
+            time_taken=time_taken,
+            attempt_key=payload['n'],
+            **pack_answers(results)
+        )
+        # Written together with other submits arriving at the same moment; returns once committed
+        try:
+            submission_ingestor.submit(attempt)
+        except (SubmissionPending, DatabaseError) as e:
+            # The attempt key makes sending the same form again safe: it is saved at most once
+            resubmit = [(name, value) for name, value in request.POST.items() if name != 'csrfmiddlewaretoken']
+            return render(request, "quiz_submission_pending.html", {
+                "quiz": quiz,
+                "failed": isinstance(e, DatabaseError),
+                "resubmit": resubmit,
+            }, status=202 if isinstance(e, SubmissionPending) else 503)
+        answer_buffer.discard(payload)
+        request.session.pop(session_key, None)
         return redirect("scoreboard")
-    return render(request, "attempt_quiz.html", {"quiz": quiz, "questions": questions})
+
+    # Resume an unfinished attempt (e.g. after a dropped connection) instead of restarting the clock
+    token = request.session.get(session_key)
+    payload = read_attempt_token(token, request.user.id, quiz.id)
+    if payload is None or is_expired(payload, quiz.time_limit):
+        token = issue_attempt_token(request.user.id, quiz.id)
+        request.session[session_key] = token
+        payload = read_attempt_token(token, request.user.id, quiz.id)
+        answers = {}
+    else:
+        answers = saved_answers(payload)
+    questions = quiz.questions.all()
+    context = {
+        "quiz": quiz,
+        "questions": questions,
+        "attempt_token": token,
+        "saved_answers": answers,
+        "time_left": max(0, quiz.time_limit * 60 - elapsed_seconds(payload)),
+        "autosave_interval": AUTOSAVE_INTERVAL,
+    }
+    return render(request, "attempt_quiz.html", context)
+
+
+@login_required
+@csrf_protect
+def autosave_quiz(request, quiz_id):
+    if request.method != "POST":
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    payload = read_attempt_token(data.get('attempt_token'), request.user.id, quiz.id)
+    if payload is None:
+        return JsonResponse({'error': 'Invalid attempt token'}, status=403)
+    if is_expired(payload, quiz.time_limit):
+        return JsonResponse({'error': 'Time is up', 'time_left': 0}, status=409)
+
+    answer_key = get_answer_key(quiz)
+    answers = {}
+    for question_id, option in (data.get('answers') or {}).items():
+        if str(question_id).isdigit() and int(question_id) in answer_key and option in ('A', 'B', 'C', 'D'):
+            answers[str(question_id)] = option
+    answer_buffer.add(payload, answers)
+    return JsonResponse({
+        'saved': len(answers),
+        'time_left': max(0, quiz.time_limit * 60 - elapsed_seconds(payload)),
+    })
+
+@login_required
+def quiz_item_analysis(request, quiz_id):
+    quiz = get_object_or_404(Quiz, id=quiz_id)
+    if not request.user.is_staff and not TeacherProfile.objects.filter(user=request.user, courses=quiz.course).exists():
+        return redirect('student_dashboard')
+
+    items = flag_items(item_analysis(quiz.id), get_answer_key(quiz))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'quiz': quiz.id, 'items': items})
+
+    question_texts = dict(quiz.questions.values_list('id', 'text'))
+    for item in items:
+        item['text'] = question_texts.get(item['question_id'], '(deleted question)')
+    return render(request, 'quiz_item_analysis.html', {'quiz': quiz, 'items': items})
 
 @login_required
 def scoreboard(request):
-    attempts = QuizAttempt.objects.filter(student=request.user).order_by('-attempted_at')
+    attempts = QuizAttempt.objects.filter(student=request.user).select_related('quiz').order_by('-attempted_at')
     return render(request, "scoreboard.html", {"attempts": attempts})
 
 @login_required
@@ -779,11 +929,20 @@ def assignment_detail(request, assignment_id):
     submissions = Submission.objects.filter(assignment=assignment, student=request.user)
     has_submitted = submissions.exists()
     submission = submissions.first() if has_submitted else None
+    # The uploading teacher (or staff) sees the plagiarism screening report
+    can_review = request.user.is_staff or assignment.user_id == request.user.id
+
+    if request.method == "POST" and can_review and 'check_similarity' in request.POST:
+        schedule_check(assignment.id)
+        messages.success(request, 'Similarity check started. Refresh in a few minutes for the report.')
+        return redirect('assignment_detail', assignment_id=assignment_id)
 
     if request.method == "POST" and not has_submitted:
-        file = request.FILES.get('file')
+        files, chunked = chunked_upload_files(request)
+        file = files.get('file')
         if file:
             Submission.objects.create(assignment=assignment, student=request.user, file=file)
+            finish_upload(chunked, files)
             messages.success(request, 'Assignment submitted successfully!')
             return redirect('assignment_detail', assignment_id=assignment_id)
 
@@ -791,7 +950,11 @@ def assignment_detail(request, assignment_id):
         'assignment': assignment,
         'submission': submission,
         'has_submitted': has_submitted,
+        'can_review': can_review,
     }
+    if can_review:
+        context['similarity_report'] = similarity_report(assignment)
+        context['submission_count'] = assignment.submissions.count()
     return render(request, "assignment_detail.html", context)
 
 @login_required
@@ -1069,34 +1232,23 @@ def add_note_to_course(request, course_id):
 
         if topic:
             try:
-                # If no content_html provided, try to extract from file
-                if not content_html and file:
-                    file_name = file.name.lower()
-                    if file_name.endswith('.pdf'):
-                        # Extract text from PDF and convert to HTML
-                        doc = fitz.open(stream=file.read(), filetype="pdf")
-                        html_content = ""
-                        for page in doc:
-                            html_content += page.get_text("html")
-                        content_html = html_content
-                        doc.close()
-                    elif file_name.endswith('.docx'):
-                        # Extract text from DOCX and wrap in basic HTML
-                        doc = Document(file)
-                        text_content = ""
-                        for para in doc.paragraphs:
-                            text_content += para.text + "\n"
-                        content_html = f"<p>{text_content.replace('\n', '</p><p>')}</p>"
-                    # Reset file pointer for saving
-                    file.seek(0)
-
+                # Without content_html, extract it from the file in the background
+                extract = not content_html and file and is_extractable(file.name)
                 note = Note.objects.create(
                     course=course,
                     user=request.user,
                     topic=topic,
                     content_html=content_html or '',  # Store HTML content in content_html
-                    file=file
+                    file=file,
+                    extraction_status='pending' if extract else '',
                 )
+                if extract:
+                    transaction.on_commit(lambda: note_extractor.enqueue(note.id))
+                    return JsonResponse({
+                        'success': True,
+                        'message': 'Note added! Text is being extracted in the background.',
+                        'status_url': reverse('note_extraction_status', args=[note.id]),
+                    })
                 return JsonResponse({'success': True, 'message': 'Note added successfully!'})
             except Exception as e:
                 return JsonResponse({'success': False, 'message': f'Error creating note: {str(e)}'})
@@ -1107,14 +1259,24 @@ def add_note_to_course(request, course_id):
     return render(request, "add_note_to_course.html", {"form": form, "course": course})
 
 
+@login_required
+def note_extraction_status(request, note_id):
+    note = get_object_or_404(Note.objects.only('id', 'extraction_status', 'extraction_progress', 'extraction_error'), id=note_id)
+    return JsonResponse({
+        'status': note.extraction_status,
+        'progress': note.extraction_progress,
+        'error': note.extraction_error,
+    })
+
+
 @login_required
 @csrf_exempt
 def upload_image(request):
     if request.method == 'POST' and request.FILES.get('image'):
         image = request.FILES['image']
-        fs = FileSystemStorage()
-        filename = fs.save(f'notes/{image.name}', image)
-        image_url = fs.url(filename)
+        filename = default_storage.save(f'notes/{image.name}', image)
+        image_url = default_storage.url(filename)
+        image_worker.enqueue(filename)
         return JsonResponse({'url': image_url})
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
@@ -1124,37 +1286,35 @@ def download_note_html_as_pdf(request, note_id):
     if not note.content_html:
         return HttpResponse("No content available for download.", status=404)
 
-    # Generate PDF from HTML content
-    html_string = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{note.topic}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            h1 {{ color: #333; }}
-            p {{ line-height: 1.6; }}
-        </style>
-    </head>
-    <body>
-        <h1>{note.topic}</h1>
-        {note.content_html}
-    </body>
-    </html>
-    """
-
-    # Create PDF
-    pdf_buffer = BytesIO()
-    HTML(string=html_string).write_pdf(pdf_buffer)
-    pdf_buffer.seek(0)
-
-    # Return PDF as response
-    response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{note.topic}.pdf"'
-    pdf_buffer.close()
+    # The content hash is the ETag, so a revalidation never touches the renderer
+    etag = f'"{note_pdf_key(note)}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        pdf, _ = open_note_pdf(note)
+        response = FileResponse(pdf, as_attachment=True, filename=f'{note.topic}.pdf', content_type='application/pdf')
+        # Only a real download counts for recommendations, not a revalidation
+        ContentDownload.objects.create(user=request.user, item_type='note', object_id=note.id)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 
+def protected_media(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    if name.startswith('..') or name == '.':
+        raise Http404("File not found.")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+    if not can_access(request, name):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return HttpResponse("You don't have access to this file.", status=403)
+    return file_response(request, name, full_path)
 
 
 @login_required
@@ -1338,7 +1498,9 @@ def documents(request):
 
     context = {
         'user_type': user_type,
-        'documents': documents,
+        'documents': attach_previews(documents),
+        # One SUM over the stored sizes instead of a stat per file
+        'storage_used': documents.aggregate(total=Sum('file_size'))['total'] or 0,
         'profile': profile,
         'pin_verified': request.session.get('pin_verified', False),
     }
@@ -1497,13 +1659,16 @@ def upload_student_document(request):
     from .forms import StudentDocumentForm
 
     if request.method == 'POST':
-        form = StudentDocumentForm(request.POST, request.FILES)
+        files, chunked = chunked_upload_files(request)
+        form = StudentDocumentForm(request.POST, files)
         if form.is_valid():
             document = form.save(commit=False)
             document.user = request.user
             document.save()
+            finish_upload(chunked, files)
             messages.success(request, 'Document uploaded successfully!')
             return redirect('documents')
+        release_upload(chunked, files)
     else:
         form = StudentDocumentForm()
 
@@ -1515,19 +1680,57 @@ def upload_teacher_document(request):
     from .forms import TeacherDocumentForm
 
     if request.method == 'POST':
-        form = TeacherDocumentForm(request.POST, request.FILES)
+        files, chunked = chunked_upload_files(request)
+        form = TeacherDocumentForm(request.POST, files)
         if form.is_valid():
             document = form.save(commit=False)
             document.user = request.user
             document.save()
+            finish_upload(chunked, files)
             messages.success(request, 'Document uploaded successfully!')
             return redirect('documents')
+        release_upload(chunked, files)
     else:
         form = TeacherDocumentForm()
 
     return render(request, 'upload_teacher_document.html', {'form': form})
 
 
+@login_required
+def chunked_upload_init(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid file size.'}, status=400)
+    try:
+        upload = start_upload(request.user, request.POST.get('filename', ''), size, request.POST.get('fingerprint', ''))
+    except ChunkedUploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(upload_state(upload))
+
+
+@login_required
+def chunked_upload_status(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, user=request.user)
+    return JsonResponse(upload_state(upload))
+
+
+@login_required
+def chunked_upload_chunk(request, upload_id, index):
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, user=request.user)
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        # Read the body as a stream so a chunk is never held in memory
+        write_chunk(upload, index, request, length, request.headers.get('X-Chunk-SHA256'))
+    except ChunkedUploadError as e:
+        return JsonResponse({'error': str(e), **upload_state(upload)}, status=e.status)
+    return JsonResponse(upload_state(upload))
+
+
 @login_required
 @csrf_exempt
 def predict(request):
@@ -1685,6 +1888,44 @@ def reset_password(request, token):
         messages.error(request, 'Invalid reset link.')
         return redirect('login')
 
+@login_required
+def search(request):
+    query = request.GET.get('q', '').strip()
+    filters = {facet: request.GET.get(facet, '') for facet in FACETS}
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    found = search_index(query, filters, page)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse(found)
+
+    context = {'query': query, 'filters': filters, **found}
+    # (value, count, selected) for highlighting the active filter
+    context['facets'] = {
+        facet: [(value, count, filters[facet] == value) for value, count in counts]
+        for facet, counts in found['facets'].items()
+    }
+    return render(request, 'search.html', context)
+
+@login_required
+def autocomplete(request):
+    field = request.GET.get('field', '')
+    if field not in AUTOCOMPLETE_FIELDS:
+        return JsonResponse({'error': 'Unknown field'}, status=400)
+    query = request.GET.get('q', '').strip()
+    results = [{'value': value, 'score': score} for value, score in suggest(field, query)] if query else []
+    return JsonResponse({'results': results})
+
+
+@login_required
+def search_index_status(request):
+    # File text indexing backlog and throughput, for monitoring
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return JsonResponse(index_stats())
+
 @login_required
 def img_to_text_ocr(request):
     return render(request, 'img_to_text_ocr.html')
@@ -1707,8 +1948,8 @@ def student_semister_content(request):
     subject_filter = request.GET.get('subject', '')
     content_type_filter = request.GET.get('content_type', '')
 
-    # Filter TeacherSubjectContent based on filters
-    contents = TeacherSubjectContent.objects.all()
+    # Filter TeacherSubjectContent based on filters; students only see approved content
+    contents = TeacherSubjectContent.objects.filter(approval_status='approved')
 
     if department_filter:
         contents = contents.filter(department=department_filter)
@@ -1718,37 +1959,134 @@ def student_semister_content(request):
         contents = contents.filter(section=section_filter)
     if year_filter and year_filter.isdigit():
         contents = contents.filter(year=int(year_filter))
+    subject_matches = None
     if subject_filter:
-        contents = contents.filter(subject__icontains=subject_filter)
+        # Also match subjects spelled differently ("DBMS" for "Database Management System")
+        similar = {value for value, score in suggest('subject', subject_filter)}
+        contents = contents.filter(Q(subject__icontains=subject_filter) | Q(subject__in=similar))
+        subject_matches = lambda subject: subject_filter.lower() in subject.lower() or subject in similar
     if content_type_filter:
         contents = contents.filter(content_type=content_type_filter)
 
-    # Get unique values for filter dropdowns
-    departments = TeacherSubjectContent.objects.values_list('department', flat=True).distinct()
-    semesters = TeacherSubjectContent.objects.values_list('semester', flat=True).distinct()
-    sections = TeacherSubjectContent.objects.values_list('section', flat=True).distinct()
-    years = TeacherSubjectContent.objects.values_list('year', flat=True).distinct()
-    subjects = TeacherSubjectContent.objects.values_list('subject', flat=True).distinct()
-    content_types = TeacherSubjectContent.objects.values_list('content_type', flat=True).distinct()
+    page, next_cursor = keyset_page(contents, request.GET.get('after'))
+    bundle_query = request.GET.copy()
+    # The ZIP covers the whole semester selection, not one subject or page
+    for key in ('after', 'subject'):
+        bundle_query.pop(key, None)
+    bundle_query['department'] = department_filter
+    bundle_query['semester'] = semester_filter
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_url = f'?{params.urlencode()}'
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        # Infinite scroll: just the next batch of cards
+        html = render_to_string('partials/semester_content_cards.html',
+                                {'contents': attach_previews(page), 'next_url': next_url}, request=request)
+        return HttpResponse(html)
+
+    # Dropdown values with counts, each narrowed by the other active filters
+    facets = facet_counts({
+        'department': department_filter,
+        'semester': semester_filter,
+        'section': section_filter,
+        'year': year_filter if year_filter and year_filter.isdigit() else '',
+        'content_type': content_type_filter,
+        'subject': subject_matches,
+    })
 
     context = {
         'student_profile': student_profile,
-        'contents': contents,
+        'contents': attach_previews(page),
+        'next_url': next_url,
         'department_filter': department_filter,
         'semester_filter': semester_filter,
         'section_filter': section_filter,
         'year_filter': year_filter,
         'subject_filter': subject_filter,
         'content_type_filter': content_type_filter,
-        'departments': departments,
-        'semesters': semesters,
-        'sections': sections,
-        'years': years,
-        'subjects': subjects,
-        'content_types': content_types,
+        'departments': facets['department'],
+        'semesters': facets['semester'],
+        'sections': facets['section'],
+        'years': facets['year'],
+        'subjects': facets['subject'],
+        'content_types': facets['content_type'],
+        'bundle_query': bundle_query.urlencode(),
     }
     return render(request, 'student_semister_content.html', context)
 
+@login_required
+def semester_bundle(request):
+    # All approved content for a department/semester (optionally section, year, type) as one ZIP
+    department = request.GET.get('department', '')
+    semester = request.GET.get('semester', '')
+    if not department or not semester:
+        return JsonResponse({'error': 'department and semester are required'}, status=400)
+    contents = TeacherSubjectContent.objects.filter(approval_status='approved', department=department,
+                                                    semester=semester).exclude(file='')
+    section = request.GET.get('section', '')
+    year = request.GET.get('year', '')
+    content_type = request.GET.get('content_type', '')
+    if section:
+        contents = contents.filter(section=section)
+    if year.isdigit():
+        contents = contents.filter(year=int(year))
+    if content_type:
+        contents = contents.filter(content_type=content_type)
+    contents = list(contents.order_by('subject', 'uploaded_at', 'id'))
+    if not contents:
+        raise Http404("No content to download.")
+    # Rows uploaded before CRCs were recorded have their files read in the background first
+    if schedule_crc32(contents):
+        response = JsonResponse({'status': 'preparing', 'message': 'The bundle is being prepared, try again shortly.'},
+                                status=202)
+        response['Retry-After'] = 30
+        return response
+
+    entries = []
+    used = set()
+    for content in contents:
+        try:
+            # Subjects are free text; this also rules out '..' and separators in the path
+            folder = get_valid_filename(content.subject)
+        except SuspiciousFileOperation:
+            folder = 'Other'
+        base, ext = os.path.splitext(os.path.basename(content.file.name))
+        name = f'{folder}/{base}{ext}'
+        number = 1
+        while name.lower() in used:
+            number += 1
+            name = f'{folder}/{base} ({number}){ext}'
+        used.add(name.lower())
+        entries.append(ZipEntry(name, content.file, content.file_size, content.file_crc32, content.uploaded_at))
+    archive = ZipStream(entries)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # If-Range: only resume if the bundle hasn't changed since the first part
+    if range_header and request.headers.get('If-Range', archive.etag) == archive.etag:
+        byte_range = parse_range(range_header, archive.size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{archive.size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(archive.stream(start, end), status=206, content_type='application/zip')
+        response['Content-Range'] = f'bytes {start}-{end}/{archive.size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = StreamingHttpResponse(archive.stream(), content_type='application/zip')
+        response['Content-Length'] = archive.size
+    filename = slugify(f'{department} semester {semester} {section} {year}'.strip()) or 'content'
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+    response['Cache-Control'] = 'private'
+    return response
+
 @login_required
 def available_content_view(request):
     # Show all available content: notes, assignments, quizzes, etc.
@@ -0,0 +1,187 @@
+"""
+Batch detection of each student's weak courses.
+
+Every answered question is folded into sparse student x quiz matrices of
+correct and answered counts; multiplying by a quiz x course indicator gives
+the same counts per course. Accuracy, class averages and the weakest areas
+are then computed for all students at once and stored in
+StudentRecommendation, so the dashboard reads one row per request.
+"""
+import numpy as np
+from django.db.models import Count, Q
+from django.utils import timezone
+from scipy import sparse
+
+from .answer_sheets import UNANSWERED
+from .models import Course, Quiz, QuizAttempt, StudentRecommendation, UserAnswer
+
+# A course counts as weak below this accuracy, or this far below the class average
+WEAK_ACCURACY = 0.6
+WEAK_GAP = 0.15
+# Ignore courses where the student has answered too few questions to judge
+MIN_ANSWERED = 5
+TOP_RECOMMENDATIONS = 3
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int32)
+
+
+def _packed_counts():
+    """(student_id, quiz_id, correct, answered) per packed attempt, as arrays."""
+    students, quizzes, answered, bitmaps = [], [], [], []
+    rows = (QuizAttempt.objects.exclude(question_ids='')
+            .values_list('student_id', 'quiz_id', 'answer_vector', 'correct_bitmap'))
+    for student_id, quiz_id, vector, bitmap in rows.iterator(chunk_size=2000):
+        students.append(student_id)
+        quizzes.append(quiz_id)
+        answered.append(len(vector) - vector.count(UNANSWERED))
+        bitmaps.append(bytes(bitmap))
+    if not students:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    # Popcount every bitmap in one pass: look up bits per byte, then sum per attempt
+    lengths = np.array([len(bitmap) for bitmap in bitmaps])
+    bits = _POPCOUNT[np.frombuffer(b''.join(bitmaps), dtype=np.uint8)]
+    correct = np.add.reduceat(bits, np.concatenate([[0], np.cumsum(lengths)[:-1]]))
+    return np.array(students), np.array(quizzes), correct, np.array(answered)
+
+
+def _legacy_counts():
+    """The same counts for answers that only exist as UserAnswer rows."""
+    rows = list(
+        UserAnswer.objects.filter(Q(attempt__isnull=True) | Q(attempt__question_ids=''))
+        .values_list('user_id', 'quiz_id')
+        .annotate(correct=Count('id', filter=Q(is_correct=True)), answered=Count('answer'))
+    )
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    return tuple(np.array(column) for column in zip(*rows))
+
+
+def load_course_matrices():
+    """
+    Sparse student x course matrices of correct and answered counts, plus the
+    student x quiz matrices they were built from and the id lookups for both.
+    """
+    packed, legacy = _packed_counts(), _legacy_counts()
+    student_col, quiz_col, correct, answered = (np.concatenate(pair) for pair in zip(packed, legacy))
+
+    student_ids, student_index = np.unique(student_col, return_inverse=True)
+    quiz_ids, quiz_index = np.unique(quiz_col, return_inverse=True)
+    shape = (len(student_ids), len(quiz_ids))
+    # coo -> csr sums duplicate (student, quiz) pairs, i.e. repeated attempts
+    quiz_correct = sparse.coo_matrix((correct, (student_index, quiz_index)), shape=shape).tocsr()
+    quiz_answered = sparse.coo_matrix((answered, (student_index, quiz_index)), shape=shape).tocsr()
+    # A quiz left entirely blank must not leave a zero-answered cell to divide by
+    quiz_answered.eliminate_zeros()
+
+    quiz_courses = dict(Quiz.objects.filter(id__in=quiz_ids.tolist()).values_list('id', 'course_id'))
+    course_ids, course_index = np.unique([quiz_courses[qid] for qid in quiz_ids.tolist()], return_inverse=True)
+    to_course = sparse.csr_matrix(
+        (np.ones(len(quiz_ids)), (np.arange(len(quiz_ids)), course_index)),
+        shape=(len(quiz_ids), len(course_ids)),
+    )
+    return {
+        'student_ids': student_ids,
+        'quiz_ids': quiz_ids,
+        'course_ids': course_ids,
+        'quiz_course_index': course_index,
+        'quiz_correct': quiz_correct,
+        'quiz_answered': quiz_answered,
+        'course_correct': (quiz_correct @ to_course).tocsr(),
+        'course_answered': (quiz_answered @ to_course).tocsr(),
+    }
+
+
+def _entries(correct, answered):
+    """Row, column and accuracy of every non-empty cell, aligned between the two matrices."""
+    answered = answered.tocoo()
+    correct = correct.tocsr()
+    hits = np.asarray(correct[answered.row, answered.col]).ravel()
+    return answered.row, answered.col, hits / answered.data, answered.data
+
+
+def find_weak_courses(matrices):
+    """
+    {student_id: [(course_id, accuracy, class_accuracy, weakest_quiz_id, quiz_accuracy), ...]}
+    weakest first, at most TOP_RECOMMENDATIONS per student.
+    """
+    course_correct, course_answered = matrices['course_correct'], matrices['course_answered']
+    class_accuracy = (np.asarray(course_correct.sum(axis=0)).ravel()
+                      / np.maximum(np.asarray(course_answered.sum(axis=0)).ravel(), 1))
+
+    rows, cols, accuracy, answered = _entries(course_correct, course_answered)
+    gap = class_accuracy[cols] - accuracy
+    weak = (answered >= MIN_ANSWERED) & ((accuracy < WEAK_ACCURACY) | (gap >= WEAK_GAP))
+    rows, cols, accuracy = rows[weak], cols[weak], accuracy[weak]
+    # Weakest first within each student
+    order = np.lexsort((accuracy, rows))
+    rows, cols, accuracy = rows[order], cols[order], accuracy[order]
+
+    # Each student's lowest-scoring quiz per course, to point at something concrete
+    q_rows, q_cols, q_accuracy, _ = _entries(matrices['quiz_correct'], matrices['quiz_answered'])
+    q_courses = matrices['quiz_course_index'][q_cols]
+    order = np.lexsort((q_accuracy, q_courses, q_rows))
+    q_rows, q_cols, q_courses, q_accuracy = q_rows[order], q_cols[order], q_courses[order], q_accuracy[order]
+    first = np.ones(len(q_rows), dtype=bool)
+    first[1:] = (q_rows[1:] != q_rows[:-1]) | (q_courses[1:] != q_courses[:-1])
+    weakest_quiz = {
+        (row, course): (quiz, acc)
+        for row, course, quiz, acc in zip(q_rows[first].tolist(), q_courses[first].tolist(),
+                                          q_cols[first].tolist(), q_accuracy[first].tolist())
+    }
+
+    student_ids, course_ids, quiz_ids = matrices['student_ids'], matrices['course_ids'], matrices['quiz_ids']
+    result = {}
+    for row, col, acc in zip(rows.tolist(), cols.tolist(), accuracy.tolist()):
+        student_weak = result.setdefault(int(student_ids[row]), [])
+        if len(student_weak) >= TOP_RECOMMENDATIONS:
+            continue
+        quiz, quiz_acc = weakest_quiz[(row, col)]
+        student_weak.append((int(course_ids[col]), acc, float(class_accuracy[col]), int(quiz_ids[quiz]), quiz_acc))
+    return result
+
+
+def _percent(value):
+    return round(value * 100)
+
+
+def build_recommendations():
+    """Recompute weak courses for every student who has answered anything. Returns the number of rows written."""
+    matrices = load_course_matrices()
+    weak_by_student = find_weak_courses(matrices)
+
+    course_ids = {course_id for weak in weak_by_student.values() for course_id, *_ in weak}
+    quiz_ids = {quiz_id for weak in weak_by_student.values() for *_, quiz_id, _ in weak}
+    course_titles = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'title'))
+    quiz_titles = dict(Quiz.objects.filter(id__in=quiz_ids).values_list('id', 'title'))
+
+    now = timezone.now()
+    rows = []
+    for student_id in matrices['student_ids'].tolist():
+        weak_courses = []
+        recommendations = []
+        for course_id, accuracy, class_accuracy, quiz_id, quiz_accuracy in weak_by_student.get(student_id, []):
+            title = course_titles.get(course_id, 'this course')
+            weak_courses.append({
+                'course_id': course_id,
+                'title': title,
+                'accuracy': _percent(accuracy),
+                'class_accuracy': _percent(class_accuracy),
+            })
+            recommendations.append(
+                f'Revise {title}: you are scoring {_percent(accuracy)}% on its quizzes '
+                f'(class average {_percent(class_accuracy)}%). Start by retaking '
+                f'"{quiz_titles.get(quiz_id, "your weakest quiz")}" ({_percent(quiz_accuracy)}%).'
+            )
+        if not recommendations:
+            recommendations.append('You are at or above the class average in every course you have attempted. '
+                                   'Try a quiz from a new course to keep going.')
+        rows.append(StudentRecommendation(student_id=student_id, weak_courses=weak_courses,
+                                          recommendations=recommendations, computed_at=now))
+
+    StudentRecommendation.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True, unique_fields=['student'],
+        update_fields=['weak_courses', 'recommendations', 'computed_at'],
+    )
+    return len(rows)
@@ -0,0 +1,57 @@
+"""
+Winnowing fingerprints (Schleimer, Wilkerson and Aiken) for plagiarism screening.
+
+Text is reduced to lowercase words and every K consecutive words hashed; of
+each WINDOW consecutive k-gram hashes only the smallest is kept. Any run of
+WINDOW + K - 1 words two texts share is then guaranteed to give them a
+common fingerprint, while only about 2 / (WINDOW + 1) of the k-grams are
+stored. Working on words ignores spacing, punctuation and case, the
+cheapest edits to disguise a copy.
+
+This module runs inside worker processes (see plagiarism.py), so it must not
+import Django or the app's models.
+"""
+import hashlib
+import re
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .file_text import extract_text
+
+K = 5
+WINDOW = 4
+# Odd multiplier for the polynomial k-gram hash; uint64 arithmetic wraps
+MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+WORD_RE = re.compile(r'\w+')
+
+
+def _word_hashes(words):
+    hashes = {word: int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little')
+              for word in set(words)}
+    return np.fromiter((hashes[word] for word in words), dtype=np.uint64, count=len(words))
+
+
+def fingerprints(text):
+    """Sorted distinct winnowed k-gram hashes of `text`, as uint64."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < K:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = _word_hashes(words)
+    count = len(words) - K + 1
+    kgrams = np.zeros(count, dtype=np.uint64)
+    for offset in range(K):
+        kgrams = kgrams * MULTIPLIER + word_hashes[offset:offset + count]
+    if count > WINDOW:
+        kgrams = sliding_window_view(kgrams, WINDOW).min(axis=1)
+    return np.unique(kgrams)
+
+
+def fingerprint_file(path):
+    """Fingerprints of a local file's text, as bytes; unsupported types give none."""
+    text, _ = extract_text(path)
+    return fingerprints(text).tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype=np.uint64)
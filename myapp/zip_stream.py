@@ -0,0 +1,166 @@
+"""
+ZIP archives of stored files, streamed as they are written.
+
+Entries are stored uncompressed: course material is mostly PDFs and Office
+files, which are compressed already, and fixed-size entries mean the exact
+layout and length of the archive are known before the first byte. That
+gives the response a Content-Length and lets a Range request start anywhere,
+by skipping the entries before it and seeking into the one it lands in.
+Files are read a chunk at a time straight from storage, so memory use doesn't
+depend on the bundle size and nothing is written to disk.
+
+Every entry carries ZIP64 sizes and offsets, so archives over 4 GB need no
+special case. Each file's CRC-32 goes in its local header and must be known
+up front; it's recorded with the rest of the file metadata on upload (see
+file_metadata.py), and filled in for older rows by fill_crc32 on crc_worker,
+since reading whole files has no place in a request.
+"""
+import hashlib
+import logging
+import struct
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+from django.apps import apps
+from django.utils import timezone
+
+from .background import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+VERSION = 45  # ZIP64
+UTF8_NAMES = 0x0800
+NO_ZIP32 = 0xFFFFFFFF  # "see the ZIP64 extra field"
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+LOCAL_ZIP64 = struct.Struct('<HHQQ')
+CENTRAL_ZIP64 = struct.Struct('<HHQQQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END = struct.Struct('<IHHHHIIH')
+
+
+# name is the path inside the archive; file is the FieldFile the bytes come from
+ZipEntry = namedtuple('ZipEntry', 'name file size crc32 modified')
+
+
+def _dos_time(moment):
+    moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    # DOS timestamps start in 1980 and have 2-second resolution
+    moment = max(moment.replace(tzinfo=None), datetime(1980, 1, 1))
+    return ((moment.hour << 11) | (moment.minute << 5) | (moment.second // 2),
+            ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day)
+
+
+def _local_header(entry):
+    name = entry.name.encode()
+    time, date = _dos_time(entry.modified)
+    return (LOCAL_HEADER.pack(0x04034b50, VERSION, UTF8_NAMES, 0, time, date, entry.crc32,
+                              NO_ZIP32, NO_ZIP32, len(name), LOCAL_ZIP64.size)
+            + name + LOCAL_ZIP64.pack(0x0001, 16, entry.size, entry.size))
+
+
+def _central_header(entry, offset):
+    name = entry.name.encode()
+    time, date = _dos_time(entry.modified)
+    return (CENTRAL_HEADER.pack(0x02014b50, VERSION, VERSION, UTF8_NAMES, 0, time, date, entry.crc32,
+                                NO_ZIP32, NO_ZIP32, len(name), CENTRAL_ZIP64.size, 0, 0, 0,
+                                0o100644 << 16, NO_ZIP32)
+            + name + CENTRAL_ZIP64.pack(0x0001, 24, entry.size, entry.size, offset))
+
+
+def _end_records(count, directory_offset, directory_size):
+    zip64_end_offset = directory_offset + directory_size
+    return (ZIP64_END.pack(0x06064b50, ZIP64_END.size - 12, VERSION, VERSION, 0, 0,
+                           count, count, directory_size, directory_offset)
+            + ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_end_offset, 1)
+            + END.pack(0x06054b50, 0, 0, 0xFFFF, 0xFFFF, NO_ZIP32, NO_ZIP32, 0))
+
+
+class ZipStream:
+    """The byte layout of an archive of `entries`, which can be streamed whole or from any range."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.segments = []  # bytes, or a ZipEntry whose file data goes there
+        directory = []
+        offset = 0
+        for entry in entries:
+            header = _local_header(entry)
+            directory.append(_central_header(entry, offset))
+            self.segments += [header, entry]
+            offset += len(header) + entry.size
+        directory = b''.join(directory)
+        self.segments += [directory, _end_records(len(entries), offset, len(directory))]
+        self.size = offset + len(directory) + len(self.segments[-1])
+
+    @property
+    def etag(self):
+        """Changes whenever any byte of the archive would."""
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update(f'{entry.name}\0{entry.size}\0{entry.crc32}\0{entry.modified.isoformat()}\0'.encode())
+        return f'"{digest.hexdigest()[:32]}"'
+
+    def stream(self, start=0, end=None):
+        """Yield the archive's bytes from `start` to `end` inclusive."""
+        end = self.size - 1 if end is None else end
+        offset = 0
+        for segment in self.segments:
+            length = segment.size if isinstance(segment, ZipEntry) else len(segment)
+            first, last = max(start, offset), min(end, offset + length - 1)
+            if first <= last:
+                if isinstance(segment, ZipEntry):
+                    yield from self._file_data(segment, first - offset, last - first + 1)
+                else:
+                    yield segment[first - offset:last - offset + 1]
+            offset += length
+            if offset > end:
+                return
+
+    @staticmethod
+    def _file_data(entry, skip, length):
+        with entry.file.open('rb') as f:
+            if skip:
+                f.seek(skip)
+            while length:
+                chunk = f.read(min(CHUNK_SIZE, length))
+                if not chunk:
+                    # The recorded size no longer matches storage; stop rather than send a corrupt archive
+                    logger.error('%s is shorter than its recorded size %s', entry.file.name, entry.size)
+                    raise OSError(f'{entry.file.name} changed while being archived')
+                length -= len(chunk)
+                yield chunk
+
+
+def fill_crc32(instances):
+    """Compute and save size and CRC-32 for files recorded before the CRC was stored."""
+    for instance in instances:
+        if instance.file_crc32 is not None and instance.file_size is not None:
+            continue
+        crc = 0
+        size = 0
+        with instance.file.open('rb') as f:
+            for chunk in f.chunks(CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+        instance.file_crc32, instance.file_size = crc, size
+        # update() so the save signals (search, previews, facets) don't run for this
+        type(instance).objects.filter(pk=instance.pk).update(file_crc32=crc, file_size=size)
+
+
+def _fill_rows(model_label, pks):
+    fill_crc32(apps.get_model(model_label).objects.filter(pk__in=pks))
+
+
+crc_worker = BackgroundWorker('file-crc32', _fill_rows)
+
+
+def schedule_crc32(instances):
+    """Queue fill_crc32 for the instances still missing a CRC. Returns how many that is."""
+    missing = [instance for instance in instances if instance.file_crc32 is None or instance.file_size is None]
+    if missing:
+        crc_worker.enqueue(missing[0]._meta.label, [instance.pk for instance in missing])
+    return len(missing)
@@ -76,6 +76,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL lets page loads read while quiz submissions are being written;
+            # IMMEDIATE takes the write lock up front so writers queue on the
+            # busy timeout instead of failing with "database is locked".
+            'init_command': 'PRAGMA journal_mode=WAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -105,6 +113,34 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploaded files are served by myapp.views.protected_media after an access check.
+# Set to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd) to let the
+# front-end server send the bytes; None streams them from Django.
+MEDIA_DELIVERY = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'  # nginx internal location aliased to MEDIA_ROOT
+
+# Identical uploads share one copy on disk (see myapp/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'myapp.storage.DedupFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Resumable chunked uploads (see myapp/chunked_upload.py)
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'chunked_uploads')
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24  # unfinished uploads older than this are removed by clean_chunked_uploads
+
+# Rendered note PDFs, keyed by a hash of their content (see myapp/pdf_cache.py)
+NOTE_PDF_CACHE_DIR = os.path.join(BASE_DIR, 'pdf_cache')
+# Render the PDF in the background whenever a note is saved
+NOTE_PDF_PRERENDER = False
+
+# Processes extracting text from uploaded files for search (see myapp/file_index.py)
+FILE_INDEX_WORKERS = 2
+
+# Processes fingerprinting submissions for plagiarism screening (see myapp/plagiarism.py)
+PLAGIARISM_WORKERS = 2
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -15,18 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from myapp import views
 from django.urls import include
 from django.contrib.auth import views as auth_views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('', include('myapp.urls')),           # App-level urls
     path('admin/', admin.site.urls),           # Admin panel
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded files go through an access check in every environment
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", views.protected_media, name='protected_media'),
+]
 